@@ -1,2 +1,7 @@
 from . import controllers
 from . import models
+
+
+def _post_init_headless(env):
+    env['product.template']._headless_recompute_sold_all()
+    env['product.template']._headless_sync_media_meta_all()
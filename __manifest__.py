@@ -1,6 +1,6 @@
 {
     'name': 'Gestor Avanzado de Colecciones (Headless)',
-    'version': '19.0.1.0.0',
+    'version': '19.0.1.3.0',
     'category': 'Inventory/Creative',
     'summary': 'Gestión de Colecciones Artísticas sobre Categorías Internas',
     'description': """
@@ -18,9 +18,11 @@
     ],
     'data': [
         'security/ir.model.access.csv',
+        'data/ir_cron.xml',
         'views/product_category_views.xml',
         'views/product_template_views.xml',
     ],
+    'post_init_hook': '_post_init_headless',
     'installable': True,
     'application': True,
     'license': 'OPL-1',
@@ -1,12 +1,69 @@
 # -*- coding: utf-8 -*-
 
-import base64
-import json
-import mimetypes
+import functools
+import hmac
+import os
 import re
+import secrets
+from datetime import timezone
+from pathlib import Path
 
-from odoo import http
+from werkzeug.http import http_date
+
+from odoo import api, http
 from odoo.http import request
+from odoo.tools import config, str2bool
+
+from ..models.headless_catalog import (
+    COMPRESSION_ENCODINGS,
+    DETAIL_FIELD_GROUPS,
+    DETAIL_MAX_LIMIT,
+    compress_body,
+    dump_payload,
+)
+from ..models.headless_catalog_search import SEARCH_DEFAULT_LIMIT
+from ..models.product_template import HEADLESS_VIDEO_VERSION_LENGTH, headless_video_mimetype
+from ..tools.timing import METRICS, phase, request_timer
+
+
+# Tamaño de bloque al leer videos del filestore.
+VIDEO_CHUNK_SIZE = 256 * 1024
+
+# Colecciones por petición en /api/collections/batch.
+BATCH_MAX_KEYS = 20
+
+# Longitud máxima del texto de búsqueda.
+SEARCH_MAX_QUERY_LENGTH = 200
+
+# Rangos por petición a partir de los cuales se responde el archivo completo.
+VIDEO_MAX_RANGES = 16
+
+VIDEO_RANGE_SPEC = re.compile(r'(\d*)\s*-\s*(\d*)')
+
+VIDEO_CACHE_CONTROL = 'public, max-age=86400'
+# URL versionada con el checksum (?v=): el contenido no cambia nunca.
+VIDEO_CACHE_CONTROL_IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def instrumented(route_name):
+    """
+    Mide la ruta: agrega la cabecera Server-Timing con las fases marcadas
+    con ``phase()`` y registra latencia, consultas y bytes en METRICS.
+    Va debajo de ``@http.route``.
+    """
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        def wrapper(self, *args, **kwargs):
+            with request_timer(request.env.cr) as timer:
+                response = endpoint(self, *args, **kwargs)
+
+            response.headers['Server-Timing'] = timer.server_timing()
+            response.headers['Timing-Allow-Origin'] = '*'
+            METRICS.record(route_name, timer, response.content_length or 0)
+
+            return response
+        return wrapper
+    return decorator
 
 
 class CollectionsApiController(http.Controller):
@@ -15,7 +72,11 @@ class CollectionsApiController(http.Controller):
     # HELPERS
     # -------------------------------------------------------------------------
 
-    def _json_response(self, data, status=200):
+    def _json_dumps(self, data):
+        with phase('serialize'):
+            return dump_payload(data)
+
+    def _json_response(self, data, status=200, headers=None):
         """
         Respuesta JSON estándar.
 
@@ -25,42 +86,196 @@ class CollectionsApiController(http.Controller):
         terminar enviando Access-Control-Allow-Origin duplicado y el navegador
         bloqueará la respuesta.
         """
+        return self._json_body_response(self._json_dumps(data), status=status, headers=headers)
+
+    def _json_body_response(self, body, status=200, headers=None, cache_key=None, cache_entry=None):
+        """
+        Igual que _json_response, pero con el JSON ya serializado (bytes).
+
+        Comprime con gzip o brotli según Accept-Encoding cuando el cuerpo
+        supera el umbral configurado. ``cache_entry`` es la entrada de la
+        caché de payloads (llave ``cache_key``) donde se guardan los bytes
+        comprimidos, para no recomprimir en cada acierto.
+        """
+        settings = self._get_compression_settings()
+        extra_headers = []
+
+        if len(body) >= settings['min_size']:
+            extra_headers.append(('Vary', 'Accept-Encoding'))
+
+            encoding = request.httprequest.accept_encodings.best_match(COMPRESSION_ENCODINGS)
+            if encoding:
+                encoded_key = (encoding, settings[encoding])
+                compressed = cache_entry['encoded'].get(encoded_key) if cache_entry is not None else None
+
+                if compressed is None:
+                    with phase('compress'):
+                        compressed = compress_body(body, encoding, settings[encoding])
+                    if cache_entry is not None:
+                        request.env['headless.catalog'].sudo()._set_cached_encoding(
+                            cache_key, cache_entry, encoded_key, compressed,
+                        )
+
+                body = compressed
+                extra_headers.append(('Content-Encoding', encoding))
+
         return request.make_response(
-            data=json.dumps(data, default=str, ensure_ascii=False),
+            data=body,
             headers=[
                 ('Content-Type', 'application/json; charset=utf-8'),
+                *extra_headers,
+                *(headers or []),
             ],
             status=status,
         )
 
-    def _get_product_image_url(self, base_url, product_template, field_name):
-        if getattr(product_template, field_name):
-            return f"{base_url}/web/image/product.template/{product_template.id}/{field_name}"
-        return None
+    def _get_compression_settings(self):
+        """
+        Parámetros de sistema:
+            - headless_collections.compression_min_size: bytes mínimos para
+              comprimir (por defecto 1024).
+            - headless_collections.compression_gzip_level: 1-9 (por defecto 6).
+            - headless_collections.compression_br_quality: 0-11 (por defecto 5).
+        """
+        ICP = request.env['ir.config_parameter'].sudo()
+        return {
+            'min_size': int(ICP.get_param('headless_collections.compression_min_size', 1024)),
+            'gzip': int(ICP.get_param('headless_collections.compression_gzip_level', 6)),
+            'br': int(ICP.get_param('headless_collections.compression_br_quality', 5)),
+        }
 
-    def _get_product_video_payload(self, base_url, product_template, fallback_poster=None):
+    def _cached_json_response(self, cache_key, etag, last_modified, build_payload):
         """
-        Devuelve un payload estable para el frontend.
+        Sirve el payload serializado desde la caché en memoria del worker si
+        la entrada se generó con el ETag vigente; si no, lo construye con
+        ``build_payload()`` y lo guarda.
+        """
+        Catalog = request.env['headless.catalog'].sudo()
+        Catalog._ensure_process_warmup()
+
+        entry = Catalog._get_cached_payload(cache_key, etag)
+        if entry is None:
+            with phase('payload'):
+                payload = build_payload()
+            entry = Catalog._set_cached_payload(cache_key, etag, self._json_dumps(payload))
+
+        return self._json_body_response(
+            entry['body'],
+            headers=self._get_validator_headers(etag, last_modified),
+            cache_key=cache_key,
+            cache_entry=entry,
+        )
+
+    def _iter_collection_details_json(self, category_id, base_url, field_groups, pricelist_id=None):
+        """
+        El cuerpo se consume después de que Odoo cierra el cursor de la
+        petición, así que el generador abre su propio cursor.
+        """
+        registry = request.env.registry
+        uid = request.env.uid
+        context = dict(request.env.context)
+
+        def generate():
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                yield from env['headless.catalog'].sudo()._iter_collection_details_json(
+                    env['product.category'].sudo().browse(category_id),
+                    base_url,
+                    field_groups=field_groups,
+                    pricelist=env['product.pricelist'].sudo().browse(pricelist_id) if pricelist_id else None,
+                )
+
+        return generate()
+
+    def _get_base_url(self):
+        return request.env['ir.config_parameter'].sudo().get_param('web.base.url')
 
-        Mantiene compatibilidad:
-        - Si no hay video, devuelve has_video=False.
-        - Si hay archivo subido, devuelve URL interna de streaming.
-        - Si no hay archivo, pero hay URL manual, devuelve esa URL.
+    def _parse_detail_fields(self, fields):
         """
-        if hasattr(product_template, 'get_headless_video_payload'):
-            return product_template.get_headless_video_payload(
-                base_url=base_url,
-                fallback_poster=fallback_poster,
+        Convierte ``?fields=a,b`` en una tupla ordenada de grupos válidos, o
+        None para el payload completo.
+        """
+        if not fields:
+            return None
+
+        field_groups = {field.strip() for field in fields.split(',') if field.strip()}
+        unknown = field_groups - set(DETAIL_FIELD_GROUPS)
+        if unknown:
+            raise ValueError(
+                f"Unknown fields: {', '.join(sorted(unknown))}. "
+                f"Allowed: {', '.join(DETAIL_FIELD_GROUPS)}"
             )
 
-        return {
-            'has_video': False,
-            'url': '',
-            'poster': fallback_poster or '',
-            'source': None,
-            'filename': '',
-            'mimetype': '',
-        }
+        return tuple(sorted(field_groups))
+
+    def _parse_detail_limit(self, limit):
+        if not limit:
+            return None
+
+        limit = int(limit)
+        if not 0 < limit <= DETAIL_MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {DETAIL_MAX_LIMIT}")
+
+        return limit
+
+    # -------------------------------------------------------------------------
+    # GET CONDICIONAL (ETag / Last-Modified)
+    # -------------------------------------------------------------------------
+
+    def _get_validator_headers(self, etag, last_modified):
+        """
+        Cabeceras de validación. ``no-cache`` permite que CDN y navegador
+        guarden la respuesta pero siempre revaliden con If-None-Match.
+
+        El ETag es débil porque el mismo contenido puede viajar comprimido o
+        sin comprimir.
+        """
+        headers = [
+            ('ETag', f'W/"{etag}"'),
+            ('Cache-Control', 'public, no-cache'),
+            ('Access-Control-Expose-Headers', 'ETag, Last-Modified'),
+        ]
+
+        if last_modified:
+            headers.append(('Last-Modified', http_date(last_modified.replace(tzinfo=timezone.utc))))
+
+        return headers
+
+    def _is_not_modified(self, etag, last_modified=None):
+        """
+        Evalúa If-None-Match (prioritario) e If-Modified-Since según RFC 9110.
+
+        If-Modified-Since solo se evalúa si se pasa ``last_modified``, es
+        decir, para los videos, cuyo write_date sí cambia con el contenido.
+        En los payloads del catálogo hay cambios que no mueven ninguna
+        write_date (colecciones despublicadas, productos borrados o movidos,
+        traducciones, generación de caché, stock, tarifas), así que solo el
+        ETag puede validarlos; Last-Modified se envía como dato informativo.
+        """
+        httprequest = request.httprequest
+
+        if httprequest.if_none_match:
+            return httprequest.if_none_match.contains_weak(etag)
+
+        if httprequest.if_modified_since and last_modified:
+            last_modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+            return last_modified <= httprequest.if_modified_since
+
+        return False
+
+    def _not_modified_response(self, etag, last_modified):
+        return request.make_response(
+            b'',
+            headers=self._get_validator_headers(etag, last_modified),
+            status=304,
+        )
+
+    def _get_product_video_payload(self, base_url, product_template, fallback_poster=None):
+        return request.env['headless.catalog'].sudo()._get_product_video_payload(
+            base_url=base_url,
+            product_template=product_template,
+            fallback_poster=fallback_poster,
+        )
 
     def _get_sold_map_by_template(self, product_templates):
         """
@@ -80,141 +295,314 @@ class CollectionsApiController(http.Controller):
             - draft: cotización
             - sent: cotización enviada
             - cancel: cancelado
-        """
-        sold_map = {product.id: False for product in product_templates}
 
-        if not product_templates:
-            return sold_map
+        El valor se lee de product.template.headless_is_sold, que se mantiene
+        al confirmar/cancelar órdenes y al editar sus líneas.
+        """
+        return request.env['headless.catalog'].sudo()._get_sold_map(product_templates.ids)
 
-        variants = product_templates.mapped('product_variant_ids')
-        if not variants:
-            return sold_map
+    def _get_availability_payload(self, is_sold, stock=None):
+        return request.env['headless.catalog']._get_availability_payload(is_sold, stock)
 
-        variant_to_template = {
-            variant.id: variant.product_tmpl_id.id
-            for variant in variants
-        }
+    def _safe_header_filename(self, filename):
+        filename = (filename or 'product-video.mp4').strip()
+        filename = filename.replace('"', '').replace("'", '')
+        filename = filename.replace('\n', '').replace('\r', '')
+        return filename or 'product-video.mp4'
 
-        SaleOrderLine = request.env['sale.order.line'].sudo()
+    def _get_video_mimetype(self, filename):
+        return headless_video_mimetype(filename)
 
-        grouped_lines = SaleOrderLine.read_group(
-            domain=[
-                ('product_id', 'in', variants.ids),
-                ('order_id.state', 'in', ['sale', 'done']),
-            ],
-            fields=['product_id'],
-            groupby=['product_id'],
-        )
+    def _get_video_source(self, product_template):
+        """
+        Resuelve el ir.attachment que respalda headless_video_file sin leer
+        su contenido.
 
-        for group in grouped_lines:
-            product_data = group.get('product_id')
-            if not product_data:
-                continue
+        Devuelve None si no hay video, o un diccionario:
+            {
+                'path': ruta en el filestore (None si está en base de datos),
+                'attachment': ir.attachment,
+                'size': tamaño en bytes,
+                'etag': validador fuerte (checksum SHA-1 del adjunto),
+                'last_modified': datetime de la última escritura,
+            }
+        """
+        attachment = request.env['ir.attachment'].sudo().search([
+            ('res_model', '=', 'product.template'),
+            ('res_id', '=', product_template.id),
+            ('res_field', '=', 'headless_video_file'),
+        ], limit=1)
 
-            variant_id = product_data[0]
-            template_id = variant_to_template.get(variant_id)
+        if not attachment:
+            return None
 
-            if template_id:
-                sold_map[template_id] = True
+        file_path = None
+        if attachment.store_fname:
+            file_path = attachment._full_path(attachment.store_fname)
+            if not os.path.isfile(file_path):
+                return None
 
-        return sold_map
+        size = os.path.getsize(file_path) if file_path else attachment.file_size
+        last_modified = attachment.write_date or attachment.create_date
 
-    def _get_availability_payload(self, is_sold):
         return {
-            'is_sold': bool(is_sold),
-            'availability_status': 'sold' if is_sold else 'available',
-            'sold_source': 'confirmed_sale_order' if is_sold else None,
+            'path': file_path,
+            'attachment': attachment,
+            'size': size,
+            'etag': attachment.checksum or f'{size:x}-{int(last_modified.timestamp()):x}',
+            'last_modified': last_modified,
         }
 
-    def _safe_header_filename(self, filename):
-        filename = (filename or 'product-video.mp4').strip()
-        filename = filename.replace('"', '').replace("'", '')
-        filename = filename.replace('\n', '').replace('\r', '')
-        return filename or 'product-video.mp4'
+    def _parse_byte_ranges(self, range_header, total_size):
+        """
+        Interpreta una cabecera ``Range: bytes=...`` (RFC 9110 §14.1.2).
 
-    def _get_video_mimetype(self, filename):
-        mimetype, _encoding = mimetypes.guess_type(filename or 'product-video.mp4')
-        return mimetype or 'video/mp4'
+        Devuelve la lista de rangos satisfacibles [(start, end), ...]
+        (inclusivos, ordenados y fusionados si se solapan o son contiguos).
+        Una lista vacía significa cabecera mal formada o ningún rango
+        satisfacible (416). None si la unidad no es ``bytes`` y la cabecera
+        debe ignorarse.
+        """
+        unit, _sep, specs = range_header.partition('=')
+        if unit.strip().lower() != 'bytes':
+            return None
+
+        ranges = []
+        for spec in specs.split(','):
+            match = VIDEO_RANGE_SPEC.fullmatch(spec.strip())
+            if not match:
+                return []
+
+            start_str, end_str = match.groups()
+            if not start_str:
+                if not end_str:
+                    return []
+                suffix_length = int(end_str)
+                if suffix_length and total_size:
+                    ranges.append((max(total_size - suffix_length, 0), total_size - 1))
+                continue
+
+            start = int(start_str)
+            end = int(end_str) if end_str else total_size - 1
+            if end < start:
+                return []
+            if start < total_size:
+                ranges.append((start, min(end, total_size - 1)))
+
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+
+        return merged
+
+    def _is_range_fresh(self, video_source, last_modified_header):
+        """
+        Evalúa If-Range: el rango solo se sirve si el validador coincide
+        (comparación fuerte del ETag, o fecha exacta de Last-Modified).
+        Sin If-Range siempre es True.
+        """
+        if_range = request.httprequest.headers.get('If-Range')
+        if not if_range:
+            return True
+
+        if_range = if_range.strip()
+        if if_range.startswith('"'):
+            return if_range == f'"{video_source["etag"]}"'
+
+        # Un ETag débil nunca valida If-Range; una fecha debe coincidir exacta.
+        return bool(last_modified_header) and if_range == last_modified_header
+
+    def _iter_video_range(self, video_source, start, end):
+        """
+        Generador que entrega el rango [start, end] en bloques de
+        VIDEO_CHUNK_SIZE leyendo directamente del filestore, para que la
+        memoria del worker no dependa del tamaño del video.
+        """
+        if not video_source['path']:
+            # Adjunto guardado en base de datos: no hay archivo que recorrer.
+            yield video_source['attachment'].raw[start:end + 1]
+            return
+
+        remaining = end - start + 1
+
+        with open(video_source['path'], 'rb') as video_file:
+            video_file.seek(start)
 
-    def _build_video_response(self, file_content, filename):
+            while remaining > 0:
+                chunk = video_file.read(min(VIDEO_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+
+                remaining -= len(chunk)
+                yield chunk
+
+    def _get_video_sendfile_headers(self, video_source):
         """
-        Respuesta de video con soporte básico para Range requests.
+        Cabeceras para delegar el envío al proxy (X-Sendfile para Apache /
+        lighttpd, X-Accel-Redirect para Nginx).
 
-        Esto ayuda especialmente a navegadores como Safari y a reproductores HTML5
-        que piden fragmentos del video en vez de descargarlo completo.
+        Se activa con la opción x_sendfile de Odoo o con el parámetro de
+        sistema headless_collections.video_x_sendfile. Nginx debe exponer
+        /web/filestore/ como location internal apuntando al filestore.
         """
-        total_size = len(file_content)
+        if not video_source['path']:
+            return []
+
+        x_sendfile = config.get('x_sendfile') or str2bool(
+            request.env['ir.config_parameter'].sudo().get_param('headless_collections.video_x_sendfile', 'False'),
+            default=False,
+        )
+        if not x_sendfile:
+            return []
+
+        try:
+            relative_path = Path(video_source['path']).relative_to(Path(config['data_dir'], 'filestore'))
+        except ValueError:
+            # Archivo fuera del filestore: no se puede delegar al proxy.
+            return []
+
+        return [
+            ('X-Sendfile', video_source['path']),
+            ('X-Accel-Redirect', f'/web/filestore/{relative_path.as_posix()}'),
+        ]
+
+    def _make_stream_response(self, body, headers, status):
+        response = request.make_response(body, headers=headers, status=status)
+        # Evita que werkzeug consuma el generador para calcular la respuesta.
+        response.direct_passthrough = True
+        return response
+
+    def _iter_video_multipart(self, video_source, parts, boundary):
+        for part_header, start, end in parts:
+            yield part_header
+            yield from self._iter_video_range(video_source, start, end)
+            yield b'\r\n'
+        yield f'--{boundary}--\r\n'.encode()
+
+    def _build_video_response(self, video_source, filename, immutable=False):
+        """
+        Respuesta de video con validadores fuertes y Range requests.
+
+        - ETag fuerte (checksum del adjunto) y Last-Modified, con
+          If-None-Match / If-Modified-Since (304).
+        - Range simple (206), múltiple (206 multipart/byteranges) o no
+          satisfacible (416). If-Range descarta el rango si el archivo cambió.
+
+        El contenido nunca se carga completo: cada rango se lee del filestore
+        por bloques, o se delega al proxy con X-Sendfile / X-Accel-Redirect.
+
+        ``immutable`` indica que la URL lleva la versión del archivo (?v=) y
+        puede cachearse indefinidamente.
+        """
+        total_size = video_source['size']
         filename = self._safe_header_filename(filename)
         mimetype = self._get_video_mimetype(filename)
 
         request_method = request.httprequest.method
         range_header = request.httprequest.headers.get('Range')
 
+        etag = video_source['etag']
+        last_modified = video_source['last_modified']
+        last_modified_header = http_date(last_modified.replace(tzinfo=timezone.utc)) if last_modified else None
+
+        validator_headers = [
+            ('ETag', f'"{etag}"'),
+            ('Cache-Control', VIDEO_CACHE_CONTROL_IMMUTABLE if immutable else VIDEO_CACHE_CONTROL),
+            ('Access-Control-Expose-Headers', 'Content-Length, Content-Range, Accept-Ranges, ETag, Last-Modified'),
+        ]
+        if last_modified_header:
+            validator_headers.append(('Last-Modified', last_modified_header))
+
         common_headers = [
             ('Content-Type', mimetype),
             ('Content-Disposition', f'inline; filename="{filename}"'),
             ('Accept-Ranges', 'bytes'),
-            ('Cache-Control', 'public, max-age=86400'),
-            ('Access-Control-Expose-Headers', 'Content-Length, Content-Range, Accept-Ranges'),
+            *validator_headers,
         ]
 
-        if range_header:
-            match = re.match(r'bytes=(\d*)-(\d*)', range_header)
-
-            if match:
-                start_str, end_str = match.groups()
-
-                try:
-                    if start_str == '' and end_str:
-                        suffix_length = int(end_str)
-                        start = max(total_size - suffix_length, 0)
-                        end = total_size - 1
-                    else:
-                        start = int(start_str or 0)
-                        end = int(end_str) if end_str else total_size - 1
-
-                    end = min(end, total_size - 1)
-
-                    if start >= total_size or start > end:
-                        return request.make_response(
-                            b'',
-                            headers=[
-                                ('Content-Range', f'bytes */{total_size}'),
-                                *common_headers,
-                            ],
-                            status=416,
-                        )
+        if self._is_not_modified(etag, last_modified):
+            return request.make_response(b'', headers=validator_headers, status=304)
+
+        if request_method == 'GET':
+            sendfile_headers = self._get_video_sendfile_headers(video_source)
+            if sendfile_headers:
+                # El proxy resuelve el Range y envía el archivo por sí mismo.
+                return request.make_response(
+                    b'',
+                    headers=[*common_headers, *sendfile_headers],
+                    status=200,
+                )
 
-                    chunk = file_content[start:end + 1]
-                    body = b'' if request_method == 'HEAD' else chunk
+        ranges = None
+        if range_header and self._is_range_fresh(video_source, last_modified_header):
+            ranges = self._parse_byte_ranges(range_header, total_size)
 
-                    headers = [
+            if ranges == []:
+                return request.make_response(
+                    b'',
+                    headers=[
                         *common_headers,
-                        ('Content-Range', f'bytes {start}-{end}/{total_size}'),
-                        ('Content-Length', str(len(chunk))),
-                    ]
+                        ('Content-Range', f'bytes */{total_size}'),
+                    ],
+                    status=416,
+                )
 
-                    return request.make_response(
-                        body,
-                        headers=headers,
-                        status=206,
-                    )
+            if len(ranges) > VIDEO_MAX_RANGES:
+                # Demasiados fragmentos: se envía el archivo completo.
+                ranges = None
+
+        if ranges and len(ranges) == 1:
+            start, end = ranges[0]
+            body = b'' if request_method == 'HEAD' else self._iter_video_range(video_source, start, end)
+
+            headers = [
+                *common_headers,
+                ('Content-Range', f'bytes {start}-{end}/{total_size}'),
+                ('Content-Length', str(end - start + 1)),
+            ]
+
+            return self._make_stream_response(body, headers=headers, status=206)
+
+        if ranges:
+            boundary = secrets.token_hex(16)
+            parts = [
+                (
+                    (
+                        f'--{boundary}\r\n'
+                        f'Content-Type: {mimetype}\r\n'
+                        f'Content-Range: bytes {start}-{end}/{total_size}\r\n\r\n'
+                    ).encode(),
+                    start,
+                    end,
+                )
+                for start, end in ranges
+            ]
+            content_length = sum(len(header) + end - start + 1 + 2 for header, start, end in parts)
+            content_length += len(f'--{boundary}--\r\n')
 
-                except Exception:
-                    pass
+            body = b'' if request_method == 'HEAD' else self._iter_video_multipart(video_source, parts, boundary)
 
-        body = b'' if request_method == 'HEAD' else file_content
+            headers = [
+                (name, value) for name, value in common_headers if name != 'Content-Type'
+            ]
+            headers += [
+                ('Content-Type', f'multipart/byteranges; boundary={boundary}'),
+                ('Content-Length', str(content_length)),
+            ]
+
+            return self._make_stream_response(body, headers=headers, status=206)
+
+        body = b'' if request_method == 'HEAD' or not total_size else self._iter_video_range(video_source, 0, total_size - 1)
 
         headers = [
             *common_headers,
             ('Content-Length', str(total_size)),
         ]
 
-        return request.make_response(
-            body,
-            headers=headers,
-            status=200,
-        )
+        return self._make_stream_response(body, headers=headers, status=200)
 
     # -------------------------------------------------------------------------
     # ENDPOINT VIDEO: STREAMING DE VIDEO DEL PRODUCTO
@@ -231,6 +619,7 @@ class CollectionsApiController(http.Controller):
         csrf=False,
         cors='*',
     )
+    @instrumented('product_video')
     def stream_product_video(self, product_template_id, filename=None, **kw):
         """
         Sirve el video subido en product.template.headless_video_file.
@@ -244,15 +633,17 @@ class CollectionsApiController(http.Controller):
                 b'',
                 headers=[
                     ('Access-Control-Allow-Methods', 'GET, HEAD, OPTIONS'),
-                    ('Access-Control-Allow-Headers', 'Range, Content-Type'),
-                    ('Access-Control-Expose-Headers', 'Content-Length, Content-Range, Accept-Ranges'),
+                    ('Access-Control-Allow-Headers', 'Range, If-Range, If-None-Match, If-Modified-Since, Content-Type'),
+                    ('Access-Control-Expose-Headers', 'Content-Length, Content-Range, Accept-Ranges, ETag, Last-Modified'),
                 ],
                 status=200,
             )
 
-        product = request.env['product.template'].sudo().browse(product_template_id)
+        with phase('video_lookup'):
+            product = request.env['product.template'].sudo().browse(product_template_id)
+            video_source = self._get_video_source(product) if product.exists() else None
 
-        if not product.exists() or not product.headless_video_file:
+        if not video_source:
             return request.make_response(
                 'Video not found',
                 headers=[('Content-Type', 'text/plain; charset=utf-8')],
@@ -260,12 +651,12 @@ class CollectionsApiController(http.Controller):
             )
 
         try:
-            file_content = base64.b64decode(product.headless_video_file)
             real_filename = filename or product.headless_video_filename or 'product-video.mp4'
 
             return self._build_video_response(
-                file_content=file_content,
+                video_source=video_source,
                 filename=real_filename,
+                immutable=kw.get('v') == video_source['etag'][:HEADLESS_VIDEO_VERSION_LENGTH],
             )
 
         except Exception as error:
@@ -287,73 +678,179 @@ class CollectionsApiController(http.Controller):
         csrf=False,
         cors='*',
     )
+    @instrumented('collections_data')
     def get_collections_json(self):
         if request.httprequest.method == 'OPTIONS':
             return self._json_response({}, status=200)
 
-        Category = request.env['product.category'].sudo()
-        ProductTemplate = request.env['product.template'].sudo()
+        Catalog = request.env['headless.catalog'].sudo()
+        base_url = self._get_base_url()
 
-        categories = Category.search([
-            ('is_collection', '=', True),
-        ])
+        etag, last_modified = Catalog._get_payload_version('collections_data', base_url)
+        if self._is_not_modified(etag):
+            return self._not_modified_response(etag, last_modified)
 
-        base_url = request.env['ir.config_parameter'].sudo().get_param('web.base.url')
+        return self._cached_json_response(
+            Catalog._get_payload_cache_key('collections_data', None, base_url),
+            etag,
+            last_modified,
+            lambda: Catalog._build_collections_data(base_url),
+        )
 
-        data = {}
+    # -------------------------------------------------------------------------
+    # ENDPOINT ÁRBOL: JERARQUÍA DE COLECCIONES PARA MENÚS
+    # -------------------------------------------------------------------------
 
-        for cat in categories:
-            key = cat.collection_key or cat.name.lower().replace(" ", "-")
+    @http.route(
+        '/api/collections/tree',
+        type='http',
+        auth='public',
+        methods=['GET', 'OPTIONS'],
+        csrf=False,
+        cors='*',
+    )
+    @instrumented('collections_tree')
+    def get_collections_tree(self, **kw):
+        if request.httprequest.method == 'OPTIONS':
+            return self._json_response({}, status=200)
 
-            parent_key = None
-            if cat.parent_id and cat.parent_id.is_collection:
-                parent_key = cat.parent_id.collection_key or cat.parent_id.name.lower().replace(" ", "-")
+        Catalog = request.env['headless.catalog'].sudo()
+        base_url = self._get_base_url()
 
-            products = ProductTemplate.search([
-                ('categ_id', 'child_of', cat.id),
-                ('sale_ok', '=', True),
-            ], limit=10)
+        etag, last_modified = Catalog._get_payload_version('collections_tree', base_url)
+        if self._is_not_modified(etag):
+            return self._not_modified_response(etag, last_modified)
 
-            sold_map = self._get_sold_map_by_template(products)
+        return self._cached_json_response(
+            Catalog._get_payload_cache_key('collections_tree', None, base_url),
+            etag,
+            last_modified,
+            Catalog._build_collections_tree,
+        )
 
-            product_preview = []
+    # -------------------------------------------------------------------------
+    # ENDPOINT BÚSQUEDA: TEXTO, FILTROS Y FACETAS
+    # -------------------------------------------------------------------------
 
-            for product in products:
-                slug = product.headless_slug or str(product.id)
-                img_url = f"{base_url}/web/image/product.template/{product.id}/image_1920"
-                is_sold = sold_map.get(product.id, False)
-                video_payload = self._get_product_video_payload(
-                    base_url=base_url,
-                    product_template=product,
-                    fallback_poster=img_url,
-                )
+    @http.route(
+        '/api/collections/search',
+        type='http',
+        auth='public',
+        methods=['GET', 'OPTIONS'],
+        csrf=False,
+        cors='*',
+    )
+    @instrumented('collections_search')
+    def get_collections_search(self, q=None, collection=None, material=None, availability=None,
+                               price_min=None, price_max=None, limit=None, offset=None, fields=None, **kw):
+        """
+        Parámetros opcionales:
+            - q: texto en nombre, descripción corta, material y keyword SEO.
+            - collection: limita la búsqueda a una colección (collection_key).
+            - material: uno o varios materiales separados por coma.
+            - availability: ``available`` o ``sold``.
+            - price_min / price_max: rango de precio.
+            - limit / offset: paginación (limit por defecto 24).
+            - fields: grupos como en /api/collection/<collection_key>.
+        """
+        if request.httprequest.method == 'OPTIONS':
+            return self._json_response({}, status=200)
 
-                product_preview.append({
-                    'id': product.id,
-                    'name': product.name,
-                    'slug': slug,
-
-                    # Compatibilidad anterior
-                    'image': img_url,
-
-                    # Nuevo soporte multimedia
-                    'media_type': 'video' if video_payload.get('has_video') else 'image',
-                    'has_video': video_payload.get('has_video'),
-                    'video_url': video_payload.get('url'),
-                    'video': video_payload,
-
-                    **self._get_availability_payload(is_sold),
-                })
-
-            data[key] = {
-                'id': cat.id,
-                'title': cat.collection_title_display or cat.name,
-                'description': cat.collection_description or '',
-                'parent': parent_key,
-                'products_preview': product_preview,
-            }
+        try:
+            query = (q or '').strip()
+            if len(query) > SEARCH_MAX_QUERY_LENGTH:
+                raise ValueError(f"q must be at most {SEARCH_MAX_QUERY_LENGTH} characters")
+            materials = tuple(sorted({value.strip() for value in (material or '').split(',') if value.strip()}))
+            if availability and availability not in ('available', 'sold'):
+                raise ValueError("availability must be 'available' or 'sold'")
+            price_min = float(price_min) if price_min else None
+            price_max = float(price_max) if price_max else None
+            field_groups = self._parse_detail_fields(fields)
+            limit = self._parse_detail_limit(limit) or SEARCH_DEFAULT_LIMIT
+            offset = int(offset or 0)
+            if offset < 0:
+                raise ValueError("offset must be a positive integer")
+        except ValueError as error:
+            return self._json_response({'error': str(error)}, status=400)
+
+        Category = request.env['product.category'].sudo()
+        Catalog = request.env['headless.catalog'].sudo()
+
+        base_url = self._get_base_url()
+
+        with phase('category_lookup'):
+            category_domain = [('is_collection', '=', True)]
+            if collection:
+                category_domain.append(('collection_key', '=', collection))
+            categories = Category.search(category_domain)
+
+        if collection and not categories:
+            return self._json_response(
+                {'error': 'Collection not found'},
+                status=404,
+            )
+
+        variant = (query, materials, availability, price_min, price_max, limit, offset, field_groups)
+
+        etag, last_modified = Catalog._get_payload_version(
+            f'search:{collection or ""}',
+            base_url,
+            category_ids=categories.ids if collection else None,
+            extra=variant,
+        )
+        if self._is_not_modified(etag):
+            return self._not_modified_response(etag, last_modified)
+
+        return self._cached_json_response(
+            Catalog._get_payload_cache_key('search', collection or None, base_url, extra=variant),
+            etag,
+            last_modified,
+            lambda: Catalog._build_search_results(
+                base_url,
+                categories,
+                query=query,
+                materials=materials,
+                availability=availability,
+                price_min=price_min,
+                price_max=price_max,
+                field_groups=field_groups,
+                limit=limit,
+                offset=offset,
+            ),
+        )
+
+    # -------------------------------------------------------------------------
+    # ENDPOINT CAMBIOS: FEED INCREMENTAL PARA EL FRONTEND
+    # -------------------------------------------------------------------------
+
+    @http.route(
+        '/api/collections/changes',
+        type='http',
+        auth='public',
+        methods=['GET', 'OPTIONS'],
+        csrf=False,
+        cors='*',
+    )
+    @instrumented('collections_changes')
+    def get_collections_changes(self, since=None, after=None, **kw):
+        """
+        Productos y colecciones que cambiaron desde ``since``.
+
+        El frontend guarda ``watermark`` de la respuesta y lo envía como
+        ``since`` en la siguiente sincronización. Sin ``since`` se devuelve
+        el estado de todo el catálogo. Los productos van paginados: mientras
+        ``pagination.has_more``, se repite la llamada con el mismo ``since`` y
+        ``after=pagination.next_cursor``.
+        """
+        if request.httprequest.method == 'OPTIONS':
+            return self._json_response({}, status=200)
 
-        return self._json_response(data)
+        try:
+            data = request.env['headless.catalog'].sudo()._get_changes(since=since, after=after)
+        except ValueError as error:
+            return self._json_response({'error': str(error)}, status=400)
+
+        return self._json_response(data, headers=[('Cache-Control', 'no-store')])
 
     # -------------------------------------------------------------------------
     # ENDPOINT 2: DETALLE COMPLETO DE COLECCIÓN
@@ -367,19 +864,44 @@ class CollectionsApiController(http.Controller):
         csrf=False,
         cors='*',
     )
-    def get_collection_details(self, collection_key):
+    @instrumented('collection_details')
+    def get_collection_details(self, collection_key, limit=None, after=None, fields=None, stream=None,
+                               pricelist=None, currency=None, **kw):
+        """
+        Parámetros opcionales:
+            - limit: tamaño de página (paginación por keyset).
+            - after: cursor ``pagination.next_cursor`` de la página anterior.
+            - fields: grupos separados por coma, p. ej.
+              ``fields=id,name,slug,image,availability``.
+            - stream=1: sin paginación, envía la respuesta por partes a
+              medida que se leen los productos (colecciones muy grandes).
+            - pricelist: id de una tarifa pública
+              (headless_collections.public_pricelist_ids); ``price`` y
+              ``currency`` salen de ella.
+            - currency: código ISO; sin ``pricelist`` usa la primera tarifa
+              pública en esa moneda.
+        """
         if request.httprequest.method == 'OPTIONS':
             return self._json_response({}, status=200)
 
-        Category = request.env['product.category'].sudo()
-        ProductTemplate = request.env['product.template'].sudo()
+        try:
+            field_groups = self._parse_detail_fields(fields)
+            limit = self._parse_detail_limit(limit)
+            if after:
+                request.env['headless.catalog']._decode_cursor(after)
+            pricelist = request.env['headless.catalog'].sudo()._get_pricelist(pricelist, currency)
+        except ValueError as error:
+            return self._json_response({'error': str(error)}, status=400)
 
-        base_url = request.env['ir.config_parameter'].sudo().get_param('web.base.url')
+        Catalog = request.env['headless.catalog'].sudo()
 
-        category = Category.search([
-            ('collection_key', '=', collection_key),
-            ('is_collection', '=', True),
-        ], limit=1)
+        base_url = self._get_base_url()
+
+        with phase('category_lookup'):
+            category = Catalog._search_shape('collection', [
+                ('collection_key', '=', collection_key),
+                ('is_collection', '=', True),
+            ], limit=1)
 
         if not category:
             return self._json_response(
@@ -387,91 +909,225 @@ class CollectionsApiController(http.Controller):
                 status=404,
             )
 
-        products = ProductTemplate.search([
-            ('categ_id', 'child_of', category.id),
-            ('sale_ok', '=', True),
-        ])
+        variant = (limit, after, field_groups, Catalog._get_pricelist_version(pricelist))
 
-        sold_map = self._get_sold_map_by_template(products)
+        etag, last_modified = Catalog._get_payload_version(
+            f'collection:{collection_key}',
+            base_url,
+            category_ids=category.ids,
+            extra=variant,
+        )
+        if self._is_not_modified(etag):
+            return self._not_modified_response(etag, last_modified)
+
+        # Solo cuentan las respuestas con cuerpo: un 304 no necesita caché.
+        Catalog._record_collection_hit(collection_key)
+
+        if str2bool(stream or '0', default=False) and not (limit or after):
+            return self._make_stream_response(
+                self._iter_collection_details_json(
+                    category.id,
+                    base_url,
+                    field_groups,
+                    pricelist_id=pricelist.id if pricelist else None,
+                ),
+                headers=[
+                    ('Content-Type', 'application/json; charset=utf-8'),
+                    *self._get_validator_headers(etag, last_modified),
+                ],
+                status=200,
+            )
 
-        products_data = []
+        return self._cached_json_response(
+            Catalog._get_payload_cache_key('collection', collection_key, base_url, extra=variant),
+            etag,
+            last_modified,
+            lambda: Catalog._build_collection_details(
+                category,
+                base_url,
+                field_groups=field_groups,
+                limit=limit,
+                after=after,
+                pricelist=pricelist,
+            ),
+        )
 
-        for product in products:
-            main_image = f"{base_url}/web/image/product.template/{product.id}/image_1920"
+    # -------------------------------------------------------------------------
+    # ENDPOINT BATCH: VARIAS COLECCIONES EN UNA PETICIÓN
+    # -------------------------------------------------------------------------
 
-            gallery_urls = {
-                'image_1': self._get_product_image_url(base_url, product, 'headless_image_1'),
-                'image_2': self._get_product_image_url(base_url, product, 'headless_image_2'),
-                'image_3': self._get_product_image_url(base_url, product, 'headless_image_3'),
-                'image_4': self._get_product_image_url(base_url, product, 'headless_image_4'),
-            }
+    @http.route(
+        '/api/collections/batch',
+        type='http',
+        auth='public',
+        methods=['GET', 'OPTIONS'],
+        csrf=False,
+        cors='*',
+    )
+    @instrumented('collections_batch')
+    def get_collections_batch(self, keys=None, limit=None, fields=None, **kw):
+        """
+        Detalle de varias colecciones en una sola petición:
+            /api/collections/batch?keys=sofas,mesas,sillas
+
+        Parámetros opcionales:
+            - limit: productos por colección (los primeros según el orden
+              del catálogo). Sin limit se devuelven todos.
+            - fields: grupos como en /api/collection/<collection_key>.
 
-            video_payload = self._get_product_video_payload(
-                base_url=base_url,
-                product_template=product,
-                fallback_poster=main_image,
+        Las claves que no existen se listan en ``missing``.
+        """
+        if request.httprequest.method == 'OPTIONS':
+            return self._json_response({}, status=200)
+
+        try:
+            collection_keys = list(dict.fromkeys(key.strip() for key in (keys or '').split(',') if key.strip()))
+            if not collection_keys:
+                raise ValueError("keys is required")
+            if len(collection_keys) > BATCH_MAX_KEYS:
+                raise ValueError(f"keys accepts at most {BATCH_MAX_KEYS} collections")
+            field_groups = self._parse_detail_fields(fields)
+            limit = self._parse_detail_limit(limit)
+        except ValueError as error:
+            return self._json_response({'error': str(error)}, status=400)
+
+        Catalog = request.env['headless.catalog'].sudo()
+
+        base_url = self._get_base_url()
+
+        with phase('category_lookup'):
+            categories = Catalog._search_shape('collection', [
+                ('collection_key', 'in', collection_keys),
+                ('is_collection', '=', True),
+            ])
+
+        if not categories:
+            return self._json_response(
+                {'error': 'Collections not found'},
+                status=404,
             )
 
-            is_sold = sold_map.get(product.id, False)
-
-            product_obj = {
-                'id': product.id,
-                'name': product.name,
-                'slug': product.headless_slug or str(product.id),
-                'price': product.list_price,
-                'currency': product.currency_id.symbol,
-
-                **self._get_availability_payload(is_sold),
-
-                'short_description': product.headless_short_description or '',
-                'long_description': product.headless_long_description or '',
-
-                'material': product.headless_material or '',
-                'specs': {
-                    'weight_kg': product.weight,
-                    'volume_m3': product.volume,
-                    'dimensions': {
-                        'length': product.dim_length,
-                        'width': product.dim_width,
-                        'height': product.dim_height,
-                        'display': f"{product.dim_length}x{product.dim_width}x{product.dim_height} cm",
-                    },
-                },
-
-                # Compatibilidad anterior
-                'images': {
-                    'main': main_image,
-                    **gallery_urls,
-                },
-
-                # Nuevo soporte multimedia
-                'media_type': 'video' if video_payload.get('has_video') else 'image',
-                'has_video': video_payload.get('has_video'),
-                'video_url': video_payload.get('url'),
-                'video': video_payload,
-                'media': {
-                    'type': 'video' if video_payload.get('has_video') else 'image',
-                    'image': main_image,
-                    'video': video_payload,
-                },
-
-                'seo': {
-                    'keyword': product.headless_seo_keyword or '',
-                    'meta_title': product.headless_meta_title or product.name,
-                    'meta_description': product.headless_meta_description or product.headless_short_description or '',
-                },
-            }
+        # Mismo orden que en la petición.
+        position = {key: index for index, key in enumerate(collection_keys)}
+        categories = categories.sorted(lambda category: position[category.collection_key])
+        found_keys = set(categories.mapped('collection_key'))
+        missing = [key for key in collection_keys if key not in found_keys]
 
-            products_data.append(product_obj)
+        variant = (tuple(collection_keys), limit, field_groups)
 
-        response_data = {
-            'collection_info': {
-                'title': category.collection_title_display or category.name,
-                'description': category.collection_description or '',
-                'subtitle': category.collection_subtitle or '',
-                'key': category.collection_key,
+        etag, last_modified = Catalog._get_payload_version(
+            'collections_batch',
+            base_url,
+            category_ids=categories.ids,
+            extra=variant,
+        )
+        if self._is_not_modified(etag):
+            return self._not_modified_response(etag, last_modified)
+
+        for key in found_keys:
+            Catalog._record_collection_hit(key)
+
+        return self._cached_json_response(
+            Catalog._get_payload_cache_key('collections_batch', None, base_url, extra=variant),
+            etag,
+            last_modified,
+            lambda: {
+                **Catalog._build_collections_batch(
+                    categories,
+                    base_url,
+                    field_groups=field_groups,
+                    limit=limit,
+                ),
+                'missing': missing,
             },
-            'products': products_data,
-        }
+        )
 
-        return self._json_response(response_data)
\ No newline at end of file
+    # -------------------------------------------------------------------------
+    # ENDPOINT 3: DETALLE DE PRODUCTO
+    # -------------------------------------------------------------------------
+
+    @http.route(
+        '/api/product/<string:slug>',
+        type='http',
+        auth='public',
+        methods=['GET', 'OPTIONS'],
+        csrf=False,
+        cors='*',
+    )
+    @instrumented('product_details')
+    def get_product_details(self, slug, fields=None, **kw):
+        """
+        Un solo producto por headless_slug (o id), sin cargar su colección.
+
+        Acepta el mismo parámetro ``fields`` que /api/collection/<key>.
+        """
+        if request.httprequest.method == 'OPTIONS':
+            return self._json_response({}, status=200)
+
+        try:
+            field_groups = self._parse_detail_fields(fields)
+        except ValueError as error:
+            return self._json_response({'error': str(error)}, status=400)
+
+        Catalog = request.env['headless.catalog'].sudo()
+        base_url = self._get_base_url()
+
+        product = Catalog._find_product(slug)
+        if not product:
+            return self._json_response(
+                {'error': 'Product not found'},
+                status=404,
+            )
+
+        etag, last_modified = Catalog._get_product_version(product, base_url, extra=(field_groups,))
+        if self._is_not_modified(etag):
+            return self._not_modified_response(etag, last_modified)
+
+        return self._cached_json_response(
+            Catalog._get_payload_cache_key('product', None, base_url, extra=(product.id, field_groups)),
+            etag,
+            last_modified,
+            lambda: Catalog._build_product_details(product, base_url, field_groups=field_groups),
+        )
+
+    # -------------------------------------------------------------------------
+    # ENDPOINT MÉTRICAS (PROMETHEUS)
+    # -------------------------------------------------------------------------
+
+    @http.route(
+        '/api/collections/metrics',
+        type='http',
+        auth='public',
+        methods=['GET'],
+        csrf=False,
+    )
+    def get_collections_metrics(self, token=None, **kw):
+        """
+        Métricas del proceso en formato de texto de Prometheus.
+
+        Requiere el parámetro de sistema headless_collections.metrics_token;
+        el token se envía como ``Authorization: Bearer <token>`` o
+        ``?token=<token>``. Sin token configurado la ruta responde 404.
+        """
+        expected_token = request.env['ir.config_parameter'].sudo().get_param('headless_collections.metrics_token')
+        if not expected_token:
+            return request.not_found()
+
+        authorization = request.httprequest.headers.get('Authorization', '')
+        if authorization.startswith('Bearer '):
+            token = authorization[len('Bearer '):]
+
+        if not token or not hmac.compare_digest(token.encode(), expected_token.encode()):
+            return request.make_response(
+                'Forbidden',
+                headers=[('Content-Type', 'text/plain; charset=utf-8')],
+                status=403,
+            )
+
+        return request.make_response(
+            METRICS.render(),
+            headers=[
+                ('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),
+                ('Cache-Control', 'no-store'),
+            ],
+        )
@@ -1,2 +1,13 @@
 from . import product_category
 from . import product_template
+from . import headless_catalog
+from . import sale_order
+from . import product_pricelist
+from . import product_product
+from . import headless_catalog_tombstone
+from . import headless_catalog_snapshot
+from . import headless_catalog_search
+from . import headless_catalog_hit
+from . import headless_catalog_warmup
+from . import headless_catalog_outbox
+from . import headless_catalog_pricing
@@ -0,0 +1,1673 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import binascii
+import gzip
+import hashlib
+import json
+import logging
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from odoo import api, fields, models
+from odoo.tools import SQL, ormcache, split_every, str2bool
+
+from ..tools.timing import phase, timed
+from .product_template import HEADLESS_VIDEO_PAYLOAD_FIELDS
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_logger = logging.getLogger(__name__)
+
+
+# Estados de sale.order que marcan un producto como vendido.
+SOLD_ORDER_STATES = ('sale', 'done')
+
+# Productos de muestra por colección en /api/collections_data.
+PREVIEW_LIMIT = 10
+
+# Grupos seleccionables con ?fields= en /api/collection/<collection_key> y
+# las columnas de product.template que cada uno necesita.
+DETAIL_FIELD_GROUPS = {
+    'id': [],
+    'name': ['name'],
+    'slug': ['headless_slug'],
+    'price': ['list_price'],
+    'currency': ['currency_id'],
+    'availability': ['headless_is_sold'],
+    'short_description': ['headless_short_description'],
+    'long_description': ['headless_long_description'],
+    'material': ['headless_material'],
+    'specs': ['weight', 'volume', 'dim_length', 'dim_width', 'dim_height'],
+    'image': [],
+    'images': ['headless_media_meta'],
+    'video': list(HEADLESS_VIDEO_PAYLOAD_FIELDS),
+    'media': list(HEADLESS_VIDEO_PAYLOAD_FIELDS),
+    'seo': [
+        'name', 'headless_seo_keyword', 'headless_meta_title',
+        'headless_meta_description', 'headless_short_description',
+    ],
+}
+
+# Capa de acceso a datos: columnas que lee cada forma de payload. Los
+# builders leen siempre con search_fetch/fetch y estas listas, para que el
+# prefetch del ORM no cargue columnas que el payload no usa (HTML, jsonb
+# traducidos, metadatos SEO...). La forma 'detail' depende de los grupos
+# pedidos (ver _get_detail_field_names).
+PAYLOAD_SHAPES = {
+    'collection': ('product.category', [
+        'name', 'parent_path', 'collection_key', 'collection_title_display',
+        'collection_description', 'collection_subtitle',
+    ]),
+    'card': ('product.template', [
+        'name', 'headless_slug', 'headless_is_sold', *HEADLESS_VIDEO_PAYLOAD_FIELDS,
+    ]),
+    'detail': ('product.template', None),
+}
+
+# Payload completo (compatible con versiones anteriores). 'image' solo
+# existe como selección explícita para tarjetas de listado.
+DETAIL_DEFAULT_FIELDS = tuple(group for group in DETAIL_FIELD_GROUPS if group != 'image')
+
+# Tamaño máximo de página en /api/collection/<collection_key>.
+DETAIL_MAX_LIMIT = 200
+
+# Margen hacia atrás del feed de cambios (ver _get_changes).
+CHANGES_OVERLAP_SECONDS = 60
+
+# Productos por página del feed de cambios.
+CHANGES_PAGE_SIZE = 1000
+
+# Productos leídos y codificados por bloque en el modo streaming.
+STREAM_BATCH_SIZE = 200
+
+# Parámetros de sistema de la disponibilidad por stock:
+# - stock_availability: activa las cantidades y stock_status en los payloads.
+# - stock_warehouse_ids: ids de almacén separados por coma (vacío = todos).
+# - stock_include_moves: suma entradas y resta salidas pendientes (previsto).
+# - low_stock_threshold: cantidad a partir de la cual se informa low_stock.
+STOCK_AVAILABILITY_PARAM = 'headless_collections.stock_availability'
+STOCK_WAREHOUSES_PARAM = 'headless_collections.stock_warehouse_ids'
+STOCK_INCLUDE_MOVES_PARAM = 'headless_collections.stock_include_moves'
+STOCK_LOW_THRESHOLD_PARAM = 'headless_collections.low_stock_threshold'
+STOCK_DEFAULT_LOW_THRESHOLD = 3
+
+# Estados de stock.move que cuentan para la cantidad prevista.
+STOCK_PENDING_MOVE_STATES = ('confirmed', 'waiting', 'partially_available', 'assigned')
+
+# Entradas máximas de la caché de payloads, por base de datos y worker.
+PAYLOAD_CACHE_SIZE = 256
+
+# Parámetro de sistema con el máximo de bytes de la caché de payloads por
+# base de datos y worker (cuerpos más sus copias comprimidas).
+PAYLOAD_CACHE_MAX_BYTES_PARAM = 'headless_collections.payload_cache_max_bytes'
+PAYLOAD_CACHE_DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Rutas con caché propia: (entradas, bytes). Las búsquedas dependen de texto
+# libre enviado por cualquiera; en su propia LRU no desalojan los payloads
+# de colecciones.
+PAYLOAD_CACHE_PARTITIONS = {
+    'search': (64, 8 * 1024 * 1024),
+}
+
+# Parámetro de sistema que invalida la caché de todos los workers para
+# cambios que no mueven write_date (p. ej. traducciones).
+CACHE_GENERATION_PARAM = 'headless_collections.cache_generation'
+
+
+# Codificaciones que la API puede negociar, en orden de preferencia.
+COMPRESSION_ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+
+def _replace_non_finite(data):
+    """Copia de ``data`` con NaN e infinitos como None, igual que orjson."""
+    if isinstance(data, float):
+        return data if math.isfinite(data) else None
+    if isinstance(data, dict):
+        return {key: _replace_non_finite(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_replace_non_finite(value) for value in data]
+    return data
+
+
+def dump_payload(data):
+    """
+    Serialización JSON común a la API y a los snapshots estáticos. Usa
+    orjson si está instalado y la librería estándar en caso contrario; las
+    dos ramas producen el mismo JSON: compacto en UTF-8, fechas con str()
+    ('2026-10-18 08:48:02.123456'), llaves no str convertidas a str y NaN /
+    infinitos como null. Los bytes coinciden salvo en floats con exponente,
+    que cada librería escribe a su manera (1e-6 / 1e-06).
+    """
+    if orjson:
+        return orjson.dumps(
+            data,
+            default=str,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+    try:
+        body = json.dumps(data, default=str, ensure_ascii=False, separators=(',', ':'), allow_nan=False)
+    except ValueError:
+        # NaN / infinito: JSON no los admite. Se recorre el payload solo en
+        # ese caso para no pagar la copia en cada respuesta.
+        body = json.dumps(
+            _replace_non_finite(data), default=str, ensure_ascii=False, separators=(',', ':'), allow_nan=False,
+        )
+    return body.encode('utf-8')
+
+
+def compress_body(body, encoding, level=None):
+    """
+    Comprime ``body`` con 'gzip' o 'br'. Devuelve None si la codificación no
+    está disponible (brotli es opcional).
+    """
+    if encoding == 'gzip':
+        # mtime=0 para que el mismo payload produzca siempre los mismos bytes.
+        return gzip.compress(body, compresslevel=9 if level is None else level, mtime=0)
+
+    if encoding == 'br' and brotli:
+        return brotli.compress(body, quality=11 if level is None else level)
+
+    return None
+
+
+class PayloadCache:
+    """
+    LRU acotada y thread-safe con los payloads JSON serializados.
+
+    Se acota por número de entradas (``size``) y, si se indica, por bytes
+    (``max_bytes``): cada entrada declara su tamaño al guardarse y lo amplía
+    con ``grow`` cuando se le añaden copias comprimidas.
+
+    Cada entrada guarda el ETag con el que se generó; quien la lee debe
+    compararlo con el ETag vigente, así que un worker nunca sirve una entrada
+    obsoleta aunque la invalidación haya ocurrido en otro proceso.
+    """
+
+    def __init__(self, size, max_bytes=None):
+        self.size = size
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, nbytes=0):
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = entry
+            self._sizes[key] = nbytes
+            self._bytes += nbytes
+            self._evict()
+
+    def grow(self, key, entry, nbytes):
+        """Suma ``nbytes`` a ``key`` si sigue guardando ``entry``."""
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                return
+            self._sizes[key] += nbytes
+            self._bytes += nbytes
+            self._evict()
+
+    def discard(self, predicate):
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def _pop(self, key):
+        if key in self._entries:
+            del self._entries[key]
+            self._bytes -= self._sizes.pop(key)
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.size
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            self._pop(next(iter(self._entries)))
+
+
+_payload_caches = {}
+_payload_caches_lock = threading.Lock()
+
+
+class HeadlessCatalog(models.AbstractModel):
+    """
+    Capa de ensamblado de los payloads de la API headless.
+
+    Agrupa las consultas por lote (colecciones, productos y estado de venta)
+    para que los endpoints no ejecuten una búsqueda por categoría.
+    """
+    _name = 'headless.catalog'
+    _description = 'Catálogo Headless (API de Colecciones)'
+
+    # -------------------------------------------------------------------------
+    # HELPERS
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _get_collection_key(self, category):
+        return category.collection_key or category.name.lower().replace(" ", "-")
+
+    @api.model
+    def _get_availability_payload(self, is_sold, stock=None):
+        """
+        ``stock`` es la entrada de _get_stock_map del producto; sin ella
+        (stock desactivado) el payload solo refleja las órdenes de venta.
+        """
+        payload = {
+            'is_sold': bool(is_sold),
+            'availability_status': 'sold' if is_sold else 'available',
+            'sold_source': 'confirmed_sale_order' if is_sold else None,
+        }
+
+        if stock is not None:
+            payload.update({
+                'stock_status': self._get_stock_status(is_sold, stock),
+                'quantity_on_hand': stock['on_hand'],
+                'quantity_forecast': stock['forecast'],
+            })
+
+        return payload
+
+    @api.model
+    def _get_product_image_url(self, base_url, product_template, field_name):
+        if product_template._headless_has_media(field_name):
+            return f"{base_url}/web/image/product.template/{product_template.id}/{field_name}"
+        return None
+
+    @api.model
+    def _get_product_video_payload(self, base_url, product_template, fallback_poster=None):
+        """
+        Devuelve un payload estable para el frontend.
+
+        Mantiene compatibilidad:
+        - Si no hay video, devuelve has_video=False.
+        - Si hay archivo subido, devuelve URL interna de streaming.
+        - Si no hay archivo, pero hay URL manual, devuelve esa URL.
+        """
+        if hasattr(product_template, 'get_headless_video_payload'):
+            return product_template.get_headless_video_payload(
+                base_url=base_url,
+                fallback_poster=fallback_poster,
+            )
+
+        return {
+            'has_video': False,
+            'url': '',
+            'poster': fallback_poster or '',
+            'source': None,
+            'filename': '',
+            'mimetype': '',
+        }
+
+    @api.model
+    @timed('video_payload')
+    def _get_product_video_payloads(self, base_url, products):
+        """
+        Payloads de video de todo ``products`` en una pasada, con la imagen
+        principal de cada producto como poster de respaldo.
+        """
+        return products.get_headless_video_payloads(
+            base_url=base_url,
+            fallback_posters={
+                product.id: f"{base_url}/web/image/product.template/{product.id}/image_1920"
+                for product in products
+            },
+        )
+
+    # -------------------------------------------------------------------------
+    # ACCESO A DATOS POR FORMA DE PAYLOAD
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _get_shape_fields(self, shape, field_groups=None):
+        """Columnas que lee la forma ``shape`` (ver PAYLOAD_SHAPES)."""
+        if shape == 'detail':
+            return self._get_detail_field_names(field_groups or DETAIL_DEFAULT_FIELDS)
+        return PAYLOAD_SHAPES[shape][1]
+
+    @api.model
+    def _search_shape(self, shape, domain, field_groups=None, **kwargs):
+        """
+        search_fetch del modelo de ``shape`` leyendo solo sus columnas. Pasa
+        por el ORM, así que respeta reglas de registro e idioma del entorno.
+        """
+        model_name = PAYLOAD_SHAPES[shape][0]
+        return self.env[model_name].search_fetch(
+            domain,
+            self._get_shape_fields(shape, field_groups),
+            **kwargs,
+        )
+
+    @api.model
+    def _fetch_shape(self, records, shape, field_groups=None):
+        """Carga en lote las columnas de ``shape`` de ``records``."""
+        records.fetch(self._get_shape_fields(shape, field_groups))
+        return records
+
+    # -------------------------------------------------------------------------
+    # CONSULTAS POR LOTE
+    # -------------------------------------------------------------------------
+
+    @api.model
+    @timed('sold_map')
+    def _get_sold_map(self, template_ids):
+        """
+        Devuelve {product_template_id: True / False} leyendo la columna
+        almacenada product.template.headless_is_sold.
+        """
+        template_ids = list(template_ids)
+
+        if not template_ids:
+            return {}
+
+        templates = self.env['product.template'].with_context(active_test=False).browse(template_ids)
+        templates.fetch(['headless_is_sold'])
+
+        return {template.id: template.headless_is_sold for template in templates}
+
+    @api.model
+    def _get_stock_settings(self):
+        """
+        Configuración de stock vigente, o None si la disponibilidad por
+        stock está desactivada:
+            {'warehouse_ids': [...], 'include_moves': bool, 'low_threshold': float}
+
+        Solo depende de ir.config_parameter, cuya escritura ya vacía el
+        ormcache en todos los workers. Las ubicaciones de los almacenes se
+        resuelven en SQL (ver _get_stock_locations_query), así que crear o
+        mover ubicaciones no invalida nada.
+        """
+        settings = self._get_stock_settings_cached()
+        if not settings:
+            return None
+        # Copia con lista: psycopg2 adapta las listas (no las tuplas) a int[].
+        return dict(settings, warehouse_ids=list(settings['warehouse_ids']))
+
+    @api.model
+    @ormcache()
+    def _get_stock_settings_cached(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        if not str2bool(ICP.get_param(STOCK_AVAILABILITY_PARAM, 'False'), default=False):
+            return None
+
+        warehouse_ids = [int(value) for value in (ICP.get_param(STOCK_WAREHOUSES_PARAM) or '').split(',') if value.strip()]
+        if warehouse_ids and not self.env['stock.warehouse'].sudo().search_count([('id', 'in', warehouse_ids)], limit=1):
+            # Sin ubicaciones todo producto almacenable saldría como vendido.
+            _logger.warning(
+                "%s=%r matches no active warehouse; using every internal location",
+                STOCK_WAREHOUSES_PARAM, ICP.get_param(STOCK_WAREHOUSES_PARAM),
+            )
+
+        return {
+            'warehouse_ids': tuple(warehouse_ids),
+            'include_moves': str2bool(ICP.get_param(STOCK_INCLUDE_MOVES_PARAM, 'False'), default=False),
+            'low_threshold': float(ICP.get_param(STOCK_LOW_THRESHOLD_PARAM, STOCK_DEFAULT_LOW_THRESHOLD)),
+        }
+
+    @api.model
+    def _get_stock_locations_query(self, settings):
+        """
+        Subconsulta con las ubicaciones internas de los almacenes activos
+        configurados (todos si no hay ids). Si los ids no coinciden con
+        ningún almacén activo se usan todas las ubicaciones internas.
+        """
+        self.env['stock.location'].flush_model(['usage', 'parent_path'])
+        self.env['stock.warehouse'].flush_model(['active', 'view_location_id'])
+
+        warehouse_filter = SQL("TRUE")
+        if settings['warehouse_ids']:
+            warehouse_filter = SQL("warehouse.id = ANY(%s::int[])", settings['warehouse_ids'])
+
+        return SQL(
+            """
+            SELECT location.id
+              FROM stock_location location
+             WHERE location.usage = 'internal'
+               AND (
+                    NOT EXISTS (
+                        SELECT 1
+                          FROM stock_warehouse warehouse
+                         WHERE warehouse.active AND %(warehouse_filter)s
+                    )
+                    OR EXISTS (
+                        SELECT 1
+                          FROM stock_warehouse warehouse
+                          JOIN stock_location view ON view.id = warehouse.view_location_id
+                         WHERE warehouse.active AND %(warehouse_filter)s
+                           AND location.parent_path LIKE view.parent_path || '%%'
+                    )
+               )
+            """,
+            warehouse_filter=warehouse_filter,
+        )
+
+    @api.model
+    def _get_stock_status(self, is_sold, stock):
+        """
+        'sold' si hay una orden confirmada o no queda cantidad, 'low_stock'
+        hasta el umbral configurado e 'in_stock' en el resto. Los productos
+        no almacenables (cantidades None) solo dependen de las ventas.
+        """
+        quantity = stock['forecast'] if stock['forecast'] is not None else stock['on_hand']
+
+        if is_sold or (quantity is not None and quantity <= 0):
+            return 'sold'
+        if quantity is not None and quantity <= stock['low_threshold']:
+            return 'low_stock'
+        return 'in_stock'
+
+    @api.model
+    @timed('stock_map')
+    def _get_stock_map(self, template_ids):
+        """
+        Cantidades en los almacenes configurados de todas las plantillas,
+        agregadas por plantilla en una sola consulta sobre stock_quant (y
+        stock_move pendientes si stock_include_moves está activo):
+
+            {product_template_id: {'on_hand', 'forecast', 'low_threshold'}}
+
+        Las plantillas no almacenables tienen cantidades None. Devuelve {} si
+        la disponibilidad por stock está desactivada.
+        """
+        template_ids = list(template_ids)
+        settings = self._get_stock_settings()
+        if not template_ids or settings is None:
+            return {}
+
+        self.env['product.template'].flush_model(['is_storable'])
+        self.env['product.product'].flush_model(['product_tmpl_id'])
+        self.env['stock.quant'].flush_model(['product_id', 'location_id', 'quantity'])
+
+        moves = SQL()
+        if settings['include_moves']:
+            self.env['stock.move'].flush_model(['product_id', 'location_id', 'location_dest_id', 'product_qty', 'state'])
+            moves = SQL(
+                """
+                UNION ALL
+                SELECT move.product_id,
+                       0,
+                       CASE WHEN move.location_dest_id IN (SELECT id FROM location)
+                            THEN move.product_qty ELSE -move.product_qty END
+                  FROM stock_move move
+                 WHERE move.state IN %(states)s
+                   AND move.product_id IN (SELECT id FROM variant)
+                   AND (move.location_dest_id IN (SELECT id FROM location)) <> (move.location_id IN (SELECT id FROM location))
+                """,
+                states=STOCK_PENDING_MOVE_STATES,
+            )
+
+        self.env.cr.execute(SQL(
+            """
+            WITH location AS (
+                %(locations)s
+            ),
+            variant AS (
+                SELECT product.id, product.product_tmpl_id
+                  FROM product_product product
+                  JOIN product_template template
+                    ON template.id = product.product_tmpl_id
+                 WHERE template.id = ANY(%(template_ids)s::int[])
+                   AND template.is_storable
+            ),
+            stock AS (
+                SELECT quant.product_id,
+                       quant.quantity AS on_hand,
+                       quant.quantity AS forecast
+                  FROM stock_quant quant
+                 WHERE quant.location_id IN (SELECT id FROM location)
+                   AND quant.product_id IN (SELECT id FROM variant)
+                %(moves)s
+            )
+            SELECT variant.product_tmpl_id,
+                   COALESCE(SUM(stock.on_hand), 0)::float,
+                   COALESCE(SUM(stock.forecast), 0)::float
+              FROM variant
+         LEFT JOIN stock ON stock.product_id = variant.id
+          GROUP BY variant.product_tmpl_id
+            """,
+            template_ids=template_ids,
+            locations=self._get_stock_locations_query(settings),
+            moves=moves,
+        ))
+
+        low_threshold = settings['low_threshold']
+        stock_map = dict.fromkeys(template_ids)
+        for template_id, on_hand, forecast in self.env.cr.fetchall():
+            stock_map[template_id] = {
+                'on_hand': on_hand,
+                'forecast': forecast if settings['include_moves'] else None,
+                'low_threshold': low_threshold,
+            }
+
+        return {
+            template_id: stock or {'on_hand': None, 'forecast': None, 'low_threshold': low_threshold}
+            for template_id, stock in stock_map.items()
+        }
+
+    @api.model
+    def _get_stock_version(self):
+        """
+        Token barato del estado de stock para los ETags: número, suma y
+        última escritura de los quants (y movimientos pendientes) de los
+        almacenes configurados. None si el stock está desactivado.
+        """
+        settings = self._get_stock_settings()
+        if settings is None:
+            return None
+
+        locations = self._get_stock_locations_query(settings)
+        self.env['stock.quant'].flush_model(['location_id', 'quantity'])
+        self.env.cr.execute(SQL(
+            """
+            SELECT COUNT(*), SUM(quantity), MAX(write_date)
+              FROM stock_quant
+             WHERE location_id IN (%s)
+            """,
+            locations,
+        ))
+        version = self.env.cr.fetchone()
+
+        if settings['include_moves']:
+            self.env['stock.move'].flush_model(['location_id', 'location_dest_id', 'product_qty', 'state'])
+            self.env.cr.execute(SQL(
+                """
+                SELECT COUNT(*), SUM(product_qty), MAX(write_date)
+                  FROM stock_move
+                 WHERE state IN %(states)s
+                   AND (location_id IN (%(locations)s) OR location_dest_id IN (%(locations)s))
+                """,
+                states=STOCK_PENDING_MOVE_STATES,
+                locations=locations,
+            ))
+            version += self.env.cr.fetchone()
+
+        return repr((settings['low_threshold'], *version))
+
+    @api.model
+    def _compute_sold_map_from_orders(self, template_ids):
+        """
+        Devuelve {product_template_id: True / False} con una sola consulta
+        agregada sobre las líneas de venta de todas las plantillas recibidas.
+
+        Un producto se considera vendido si alguna de sus variantes aparece en
+        una línea de venta cuya orden esté en SOLD_ORDER_STATES. Se usa para
+        mantener product.template.headless_is_sold, no en cada petición.
+        """
+        template_ids = list(template_ids)
+        sold_map = dict.fromkeys(template_ids, False)
+
+        if not template_ids:
+            return sold_map
+
+        self.env['sale.order.line'].flush_model(['order_id', 'product_id'])
+        self.env['sale.order'].flush_model(['state'])
+        self.env['product.product'].flush_model(['product_tmpl_id'])
+
+        self.env.cr.execute(SQL(
+            """
+            SELECT DISTINCT variant.product_tmpl_id
+              FROM sale_order_line line
+              JOIN sale_order sale_order ON sale_order.id = line.order_id
+              JOIN product_product variant ON variant.id = line.product_id
+             WHERE variant.product_tmpl_id = ANY(%s)
+               AND sale_order.state IN %s
+            """,
+            template_ids,
+            SOLD_ORDER_STATES,
+        ))
+
+        for (template_id,) in self.env.cr.fetchall():
+            sold_map[template_id] = True
+
+        return sold_map
+
+    @api.model
+    @timed('product_search')
+    def _get_collection_preview_ids(self, categories, limit=PREVIEW_LIMIT):
+        """
+        Devuelve {category_id: [product_template_id, ...]} con los primeros
+        ``limit`` productos vendibles de cada colección (incluyendo
+        subcategorías), resueltos en una sola consulta con ventana.
+
+        Las subcategorías se obtienen de ``parent_path`` y el orden replica el
+        ``_order`` de product.template (favoritos primero, luego nombre).
+        """
+        preview_ids = {category.id: [] for category in categories}
+
+        if not categories:
+            return preview_ids
+
+        self.env['product.category'].flush_model(['parent_path'])
+        self.env['product.template'].flush_model([
+            'active', 'categ_id', 'is_favorite', 'name', 'sale_ok',
+        ])
+
+        self.env.cr.execute(SQL(
+            """
+            SELECT ranked.collection_id, ranked.template_id
+              FROM (
+                    SELECT collection.id AS collection_id,
+                           template.id AS template_id,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY collection.id
+                               ORDER BY COALESCE(template.is_favorite, FALSE) DESC,
+                                        COALESCE(template.name->>%(lang)s, template.name->>'en_US'),
+                                        template.id
+                           ) AS position
+                      FROM product_category collection
+                      JOIN product_category descendant
+                        ON descendant.parent_path LIKE collection.parent_path || '%%'
+                      JOIN product_template template
+                        ON template.categ_id = descendant.id
+                     WHERE collection.id = ANY(%(category_ids)s)
+                       AND template.sale_ok
+                       AND template.active
+                   ) ranked
+             WHERE ranked.position <= %(limit)s
+          ORDER BY ranked.collection_id, ranked.position
+            """,
+            lang=self.env.lang or 'en_US',
+            category_ids=categories.ids,
+            limit=limit,
+        ))
+
+        for category_id, template_id in self.env.cr.fetchall():
+            preview_ids[category_id].append(template_id)
+
+        return preview_ids
+
+    @api.model
+    @timed('sold_map')
+    def _get_collection_counts(self):
+        """
+        Devuelve {category_id: (productos, vendidos)} para todas las
+        colecciones públicas, contando los productos vendibles de toda su
+        descendencia, con una sola consulta agrupada.
+        """
+        self.env['product.category'].flush_model(['is_collection', 'parent_path'])
+        self.env['product.template'].flush_model(['active', 'categ_id', 'headless_is_sold', 'sale_ok'])
+
+        self.env.cr.execute(SQL(
+            """
+            SELECT collection.id,
+                   COUNT(template.id),
+                   COUNT(template.id) FILTER (WHERE template.headless_is_sold)
+              FROM product_category collection
+              JOIN product_category descendant
+                ON descendant.parent_path LIKE collection.parent_path || '%%'
+              JOIN product_template template
+                ON template.categ_id = descendant.id
+             WHERE collection.is_collection
+               AND template.sale_ok
+               AND template.active
+          GROUP BY collection.id
+            """
+        ))
+
+        return {
+            category_id: (product_count, sold_count)
+            for category_id, product_count, sold_count in self.env.cr.fetchall()
+        }
+
+    # -------------------------------------------------------------------------
+    # CACHÉ DE PAYLOADS
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _get_payload_cache(self, partition=None):
+        """
+        LRU del worker para la base de datos actual. ``partition`` es una
+        ruta de PAYLOAD_CACHE_PARTITIONS con caché propia; None es la caché
+        general, limitada por PAYLOAD_CACHE_MAX_BYTES_PARAM.
+        """
+        dbname = self.env.cr.dbname
+        with _payload_caches_lock:
+            if (dbname, partition) not in _payload_caches:
+                if partition:
+                    size, max_bytes = PAYLOAD_CACHE_PARTITIONS[partition]
+                    _payload_caches[dbname, partition] = PayloadCache(size, max_bytes)
+                else:
+                    _payload_caches[dbname, partition] = PayloadCache(PAYLOAD_CACHE_SIZE)
+            cache = _payload_caches[dbname, partition]
+
+        if not partition:
+            # El límite se relee en cada uso para aplicar cambios sin reiniciar.
+            cache.max_bytes = int(self.env['ir.config_parameter'].sudo().get_param(
+                PAYLOAD_CACHE_MAX_BYTES_PARAM,
+                PAYLOAD_CACHE_DEFAULT_MAX_BYTES,
+            ))
+        return cache
+
+    @api.model
+    def _get_payload_cache_for_key(self, cache_key):
+        route = cache_key[0]
+        return self._get_payload_cache(route if route in PAYLOAD_CACHE_PARTITIONS else None)
+
+    @api.model
+    def _get_payload_cache_key(self, route, collection_key, base_url, extra=()):
+        """
+        Llave de caché. ``collection_key=None`` identifica payloads que
+        abarcan todas las colecciones (p. ej. /api/collections_data).
+        ``extra`` distingue variantes del mismo payload (página, campos).
+        """
+        return (route, collection_key, self.env.lang, base_url, *extra)
+
+    @api.model
+    def _get_cached_payload(self, cache_key, etag):
+        """
+        Devuelve la entrada vigente para ``etag`` o None:
+            {
+                'etag': ...,
+                'body': JSON serializado (bytes),
+                'encoded': {(codificación, nivel): bytes comprimidos},
+            }
+        """
+        entry = self._get_payload_cache_for_key(cache_key).get(cache_key)
+        if entry and entry['etag'] == etag:
+            return entry
+        return None
+
+    @api.model
+    def _set_cached_payload(self, cache_key, etag, body):
+        entry = {
+            'etag': etag,
+            'body': body,
+            'encoded': {},
+        }
+        self._get_payload_cache_for_key(cache_key).set(cache_key, entry, len(body))
+        return entry
+
+    @api.model
+    def _set_cached_encoding(self, cache_key, entry, encoded_key, compressed):
+        """Guarda una copia comprimida de ``entry`` y la cuenta en el límite de bytes."""
+        entry['encoded'][encoded_key] = compressed
+        self._get_payload_cache_for_key(cache_key).grow(cache_key, entry, len(compressed))
+
+    @api.model
+    def _invalidate_payload_cache(self, collection_keys=None):
+        """
+        Descarta las entradas de las colecciones indicadas y las que abarcan
+        todas las colecciones. Sin ``collection_keys`` vacía la caché.
+        """
+        caches = [self._get_payload_cache(partition) for partition in (None, *PAYLOAD_CACHE_PARTITIONS)]
+
+        if collection_keys is None:
+            for cache in caches:
+                cache.clear()
+            return
+
+        collection_keys = set(collection_keys)
+        for cache in caches:
+            cache.discard(lambda key: key[1] is None or key[1] in collection_keys)
+
+    @api.model
+    def _get_collection_keys_by_category(self, categories):
+        """
+        Devuelve {category_id: [collection_key, ...]} con las colecciones que
+        contienen cada categoría (ella misma o sus ancestros), resueltas desde
+        parent_path con una sola lectura de las colecciones involucradas.
+        """
+        categories = categories.sudo()
+        path_ids = {
+            category.id: [int(category_id) for category_id in (category.parent_path or '').split('/') if category_id]
+            for category in categories
+        }
+
+        all_ids = {category_id for ids in path_ids.values() for category_id in ids}
+        collections = self.env['product.category'].sudo().browse(all_ids).filtered('is_collection')
+        key_by_collection = {collection.id: self._get_collection_key(collection) for collection in collections}
+
+        return {
+            category_id: [key_by_collection[path_id] for path_id in ids if path_id in key_by_collection]
+            for category_id, ids in path_ids.items()
+        }
+
+    @api.model
+    def _get_affected_collection_keys(self, categories):
+        """
+        Keys de las colecciones que contienen a ``categories`` (ellas mismas
+        o cualquiera de sus ancestros), resueltas desde parent_path.
+        """
+        keys_by_category = self._get_collection_keys_by_category(categories)
+        return {key for keys in keys_by_category.values() for key in keys}
+
+    @api.model
+    def _invalidate_payload_cache_for_categories(self, categories):
+        if categories:
+            self._invalidate_payload_cache(self._get_affected_collection_keys(categories))
+
+    @api.model
+    def _get_cache_generation(self):
+        return self.env['ir.config_parameter'].sudo().get_param(CACHE_GENERATION_PARAM, '0')
+
+    @api.model
+    def _bump_cache_generation(self):
+        """
+        Invalida los payloads de todos los workers.
+
+        set_param limpia la caché del registro, y esa limpieza se señaliza a
+        los demás workers, que leen la nueva generación en su siguiente
+        petición y con ella obtienen ETags distintos.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        ICP.set_param(CACHE_GENERATION_PARAM, str(int(ICP.get_param(CACHE_GENERATION_PARAM, '0')) + 1))
+        self._invalidate_payload_cache()
+
+    # -------------------------------------------------------------------------
+    # VERSIONES (ETag / Last-Modified)
+    # -------------------------------------------------------------------------
+
+    @api.model
+    @timed('version')
+    def _get_payload_version(self, scope, base_url, category_ids=None, extra=()):
+        """
+        Token de versión barato para un payload, calculado con una sola
+        consulta agregada y sin cargar productos.
+
+        Se construye con:
+        - número y max(write_date) de las colecciones involucradas,
+        - número, max(write_date) y número de vendidos de las plantillas que
+          cuelgan de ellas (headless_is_sold se escribe por ORM, así que un
+          cambio de estado de venta también mueve write_date),
+        - el alcance del payload, idioma, base_url y parámetros extra,
+        - la generación de caché (CACHE_GENERATION_PARAM).
+
+        ``category_ids=None`` abarca todas las colecciones públicas.
+
+        Devuelve (etag, last_modified) donde last_modified es un datetime UTC
+        naive o None.
+        """
+        self.env['product.category'].flush_model(['is_collection', 'parent_path'])
+        self.env['product.template'].flush_model(['categ_id', 'headless_is_sold'])
+
+        category_filter = SQL()
+        if category_ids is not None:
+            category_filter = SQL("AND id = ANY(%s)", list(category_ids))
+
+        self.env.cr.execute(SQL(
+            """
+            WITH collection AS (
+                SELECT id, parent_path, write_date
+                  FROM product_category
+                 WHERE is_collection
+                   %(category_filter)s
+            ),
+            template AS (
+                SELECT DISTINCT template.id, template.write_date, template.headless_is_sold
+                  FROM collection
+                  JOIN product_category descendant
+                    ON descendant.parent_path LIKE collection.parent_path || '%%'
+                  JOIN product_template template
+                    ON template.categ_id = descendant.id
+            )
+            SELECT (SELECT COUNT(*) FROM collection),
+                   (SELECT MAX(write_date) FROM collection),
+                   COUNT(*),
+                   MAX(write_date),
+                   COUNT(*) FILTER (WHERE headless_is_sold)
+              FROM template
+            """,
+            category_filter=category_filter,
+        ))
+        category_count, category_date, template_count, template_date, sold_count = self.env.cr.fetchone()
+
+        version_source = repr((
+            scope,
+            self._get_cache_generation(),
+            self.env.lang,
+            base_url,
+            tuple(extra),
+            self._get_stock_version(),
+            category_count,
+            category_date and category_date.isoformat(),
+            template_count,
+            template_date and template_date.isoformat(),
+            sold_count,
+        ))
+        etag = hashlib.sha1(version_source.encode()).hexdigest()
+
+        dates = [date for date in (category_date, template_date) if date]
+        last_modified = max(dates) if dates else None
+
+        return etag, last_modified
+
+    @api.model
+    @timed('version')
+    def _get_product_version(self, product, base_url, extra=()):
+        """
+        Token de versión del payload de un producto: su write_date y el de
+        las categorías de su ruta (de ellas salen las colecciones a las que
+        pertenece), más idioma, base_url y generación de caché.
+        """
+        path_ids = [int(category_id) for category_id in (product.categ_id.parent_path or '').split('/') if category_id]
+        categories = self.env['product.category'].browse(path_ids)
+
+        version_source = repr((
+            'product',
+            self._get_cache_generation(),
+            self.env.lang,
+            base_url,
+            tuple(extra),
+            self._get_stock_version(),
+            product.id,
+            product.write_date.isoformat(),
+            tuple(date.isoformat() for date in categories.mapped('write_date')),
+        ))
+        etag = hashlib.sha1(version_source.encode()).hexdigest()
+
+        return etag, max([product.write_date, *categories.mapped('write_date')])
+
+    # -------------------------------------------------------------------------
+    # FEED DE CAMBIOS
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _encode_watermark(self, moment):
+        raw = fields.Datetime.to_string(moment) + f".{moment.microsecond:06d}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @api.model
+    def _decode_watermark(self, token):
+        """
+        Devuelve el datetime UTC de un token ``since``. Lanza ValueError si
+        el token no es válido.
+        """
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+            return datetime.strptime(raw, '%Y-%m-%d %H:%M:%S.%f')
+        except (TypeError, UnicodeDecodeError, binascii.Error) as error:
+            raise ValueError(f"Invalid since token: {token}") from error
+
+    @api.model
+    def _encode_changes_cursor(self, watermark, write_date, template_id):
+        raw = f"{self._encode_watermark(watermark)}:{self._encode_watermark(write_date)}:{template_id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @api.model
+    def _decode_changes_cursor(self, cursor):
+        """
+        Devuelve (watermark, write_date, id) de un cursor ``after`` del feed
+        de cambios. Lanza ValueError si el cursor no es válido.
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            watermark, write_date, template_id = raw.split(':')
+            return self._decode_watermark(watermark), self._decode_watermark(write_date), int(template_id)
+        except (TypeError, UnicodeDecodeError, binascii.Error) as error:
+            raise ValueError(f"Invalid cursor: {cursor}") from error
+
+    @api.model
+    def _get_changed_template_ids(self, threshold, after=None, limit=CHANGES_PAGE_SIZE):
+        """
+        Página de plantillas modificadas después de ``threshold``, ordenadas
+        por (write_date, id) y a partir de ``after`` = (write_date, id).
+        Compara en SQL con la precisión completa de write_date y usa el
+        índice product_template_headless_write_date_idx.
+
+        Devuelve [(id, write_date)] con hasta ``limit + 1`` filas.
+        """
+        self.env['product.template'].flush_model(['write_date'])
+
+        conditions = [SQL("TRUE")]
+        if threshold:
+            conditions.append(SQL("write_date > %s", threshold))
+        if after:
+            conditions.append(SQL("(write_date, id) > (%s, %s)", *after))
+
+        self.env.cr.execute(SQL(
+            """
+            SELECT id, write_date
+              FROM product_template
+             WHERE %s
+             ORDER BY write_date, id
+             LIMIT %s
+            """,
+            SQL(" AND ").join(conditions),
+            limit + 1,
+        ))
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _get_changes(self, since=None, after=None, limit=CHANGES_PAGE_SIZE):
+        """
+        Cambios del catálogo desde el token ``since`` (o todo el catálogo si
+        no se indica): productos y colecciones creados, modificados,
+        despublicados o eliminados, incluyendo cambios de estado de venta
+        (headless_is_sold se escribe por ORM y mueve write_date).
+
+        write_date es la hora de inicio de la transacción que escribió, así
+        que una transacción larga puede confirmar filas con write_date menor
+        al watermark ya entregado. Por eso la consulta retrocede
+        CHANGES_OVERLAP_SECONDS: el cliente puede recibir un elemento dos
+        veces, pero nunca perderlo.
+
+        Los productos se paginan de ``limit`` en ``limit``: si
+        ``pagination.has_more``, se pide la siguiente página con el mismo
+        ``since`` y ``after=pagination.next_cursor``. Las colecciones y los
+        borrados van solo en la primera página, y todas las páginas devuelven
+        el watermark de la primera.
+        """
+        watermark = self.env.cr.now()
+        after_key = None
+        if after:
+            watermark, *after_key = self._decode_changes_cursor(after)
+
+        threshold = None
+        if since:
+            threshold = self._decode_watermark(since) - timedelta(seconds=CHANGES_OVERLAP_SECONDS)
+
+        date_domain = [('write_date', '>', threshold)] if threshold else []
+
+        ProductTemplate = self.env['product.template'].with_context(active_test=False)
+        Category = self.env['product.category']
+        Tombstone = self.env['headless.catalog.tombstone'].sudo()
+
+        rows = self._get_changed_template_ids(threshold, after=after_key, limit=limit)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        templates = ProductTemplate.browse([template_id for template_id, _write_date in rows])
+        templates.fetch(['headless_slug', 'categ_id', 'sale_ok', 'active', 'headless_is_sold', 'write_date'])
+
+        if after:
+            categories = Category.browse()
+            tombstones = Tombstone.browse()
+        else:
+            categories = Category.search_fetch(
+                date_domain + ['|', ('is_collection', '=', True), ('collection_key', '!=', False)],
+                ['name', 'collection_key', 'is_collection', 'parent_id', 'write_date'],
+                order='write_date, id',
+            )
+            tombstones = Tombstone.search_fetch(
+                [('deleted_at', '>', threshold)] if threshold else [],
+                ['res_model', 'res_id', 'key', 'collection_keys', 'deleted_at'],
+            )
+
+        keys_by_category = self._get_collection_keys_by_category(templates.categ_id | categories)
+
+        products_data = []
+        for template in templates:
+            collection_keys = keys_by_category.get(template.categ_id.id, [])
+            published = template.sale_ok and template.active and bool(collection_keys)
+
+            products_data.append({
+                'id': template.id,
+                'slug': template.headless_slug or str(template.id),
+                'status': 'published' if published else 'unpublished',
+                'collections': collection_keys,
+                **self._get_availability_payload(template.headless_is_sold),
+                'updated_at': template.write_date,
+            })
+
+        collections_data = []
+        for category in categories:
+            parent_keys = keys_by_category.get(category.id, [])
+            if category.is_collection:
+                parent_keys = parent_keys[:-1]
+
+            collections_data.append({
+                'id': category.id,
+                'key': self._get_collection_key(category),
+                'status': 'published' if category.is_collection else 'unpublished',
+                'parent': parent_keys[-1] if parent_keys else None,
+                'updated_at': category.write_date,
+            })
+
+        for tombstone in tombstones:
+            deleted_entry = {
+                'id': tombstone.res_id,
+                'status': 'deleted',
+                'updated_at': tombstone.deleted_at,
+            }
+
+            if tombstone.res_model == 'product.template':
+                products_data.append({
+                    **deleted_entry,
+                    'slug': tombstone.key,
+                    'collections': tombstone.collection_keys or [],
+                })
+            else:
+                collections_data.append({
+                    **deleted_entry,
+                    'key': tombstone.key,
+                })
+
+        next_cursor = None
+        if has_more:
+            last_id, last_write_date = rows[-1]
+            next_cursor = self._encode_changes_cursor(watermark, last_write_date, last_id)
+
+        return {
+            'since': since or None,
+            'watermark': self._encode_watermark(watermark),
+            'collections': collections_data,
+            'products': products_data,
+            'pagination': {
+                'limit': limit,
+                'has_more': has_more,
+                'next_cursor': next_cursor,
+            },
+        }
+
+    # -------------------------------------------------------------------------
+    # PAYLOADS
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _build_collections_data(self, base_url, preview_limit=PREVIEW_LIMIT):
+        """
+        Payload de /api/collections_data ensamblado por lote:
+
+        1. Todas las colecciones públicas en una búsqueda.
+        2. Los productos de muestra de todas ellas en una consulta con ventana.
+        3. El estado de venta de todos esos productos desde headless_is_sold
+           y, si está activo, su stock en una consulta agrupada.
+        4. Un único recordset de productos con las columnas de la forma
+           'card', leídas en una sola consulta.
+        """
+        ProductTemplate = self.env['product.template']
+
+        categories = self._search_shape('collection', [
+            ('is_collection', '=', True),
+        ])
+        keys_by_id = {cat.id: self._get_collection_key(cat) for cat in categories}
+
+        preview_ids = self._get_collection_preview_ids(categories, limit=preview_limit)
+        all_template_ids = list({
+            template_id
+            for template_ids in preview_ids.values()
+            for template_id in template_ids
+        })
+
+        products = self._fetch_shape(ProductTemplate.browse(all_template_ids), 'card')
+        sold_map = self._get_sold_map(all_template_ids)
+        stock_map = self._get_stock_map(all_template_ids)
+        products_by_id = {product.id: product for product in products}
+        video_payloads = self._get_product_video_payloads(base_url, products)
+
+        data = {}
+
+        for cat in categories:
+            key = keys_by_id[cat.id]
+
+            # El padre directo es una colección si está en el mismo listado.
+            parent_ids = [int(category_id) for category_id in cat.parent_path.split('/') if category_id]
+            parent_key = keys_by_id.get(parent_ids[-2]) if len(parent_ids) > 1 else None
+
+            product_preview = []
+
+            for template_id in preview_ids[cat.id]:
+                product = products_by_id[template_id]
+                slug = product.headless_slug or str(product.id)
+                img_url = f"{base_url}/web/image/product.template/{product.id}/image_1920"
+                is_sold = sold_map.get(product.id, False)
+                video_payload = video_payloads[product.id]
+
+                product_preview.append({
+                    'id': product.id,
+                    'name': product.name,
+                    'slug': slug,
+
+                    # Compatibilidad anterior
+                    'image': img_url,
+
+                    # Nuevo soporte multimedia
+                    'media_type': 'video' if video_payload.get('has_video') else 'image',
+                    'has_video': video_payload.get('has_video'),
+                    'video_url': video_payload.get('url'),
+                    'video': video_payload,
+
+                    **self._get_availability_payload(is_sold, stock_map.get(product.id)),
+                })
+
+            data[key] = {
+                'id': cat.id,
+                'title': cat.collection_title_display or cat.name,
+                'description': cat.collection_description or '',
+                'parent': parent_key,
+                'products_preview': product_preview,
+            }
+
+        return data
+
+    @api.model
+    def _build_collections_tree(self):
+        """
+        Payload de /api/collections/tree: jerarquía anidada de colecciones.
+
+        El padre de cada nodo es la colección más cercana en su parent_path,
+        así que las categorías intermedias no públicas se saltan. Los
+        conteos incluyen toda la descendencia.
+        """
+        categories = self._search_shape('collection', [('is_collection', '=', True)])
+        counts = self._get_collection_counts()
+
+        nodes = {}
+        for category in categories:
+            product_count, sold_count = counts.get(category.id, (0, 0))
+            nodes[category.id] = {
+                'id': category.id,
+                'key': self._get_collection_key(category),
+                'title': category.collection_title_display or category.name,
+                'description': category.collection_description or '',
+                'product_count': product_count,
+                'sold_count': sold_count,
+                'available_count': product_count - sold_count,
+                'children': [],
+            }
+
+        roots = []
+        for category in categories:
+            ancestor_ids = [int(category_id) for category_id in category.parent_path.split('/') if category_id][:-1]
+            parent_id = next((ancestor_id for ancestor_id in reversed(ancestor_ids) if ancestor_id in nodes), None)
+
+            if parent_id:
+                nodes[parent_id]['children'].append(nodes[category.id])
+            else:
+                roots.append(nodes[category.id])
+
+        return {'collections': roots}
+
+    @api.model
+    def _encode_cursor(self, product):
+        raw = f"{product.sequence}:{product.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @api.model
+    def _decode_cursor(self, cursor):
+        """
+        Devuelve (sequence, id) de un cursor ``after``. Lanza ValueError si
+        el cursor no es válido.
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            sequence, template_id = raw.split(':')
+            return int(sequence), int(template_id)
+        except (TypeError, UnicodeDecodeError, binascii.Error) as error:
+            raise ValueError(f"Invalid cursor: {cursor}") from error
+
+    @api.model
+    def _get_detail_field_names(self, field_groups):
+        """Columnas de product.template que necesitan los grupos pedidos."""
+        field_names = {'sequence'}
+        for group in field_groups:
+            field_names.update(DETAIL_FIELD_GROUPS[group])
+        return sorted(field_names)
+
+    @api.model
+    def _build_detail_product(self, product, base_url, field_groups, video_payload=None, stock=None,
+                              pricelist=None, price=None):
+        """
+        Payload de un producto en el detalle de colección, limitado a
+        ``field_groups`` (ver DETAIL_FIELD_GROUPS). ``video_payload`` viene
+        de _get_product_video_payloads cuando se pide 'video' o 'media', y
+        ``stock`` de _get_stock_map cuando se pide 'availability'. Con
+        ``pricelist``, ``price`` es el precio de _get_product_prices y la
+        moneda es la de la tarifa.
+        """
+        main_image = f"{base_url}/web/image/product.template/{product.id}/image_1920"
+
+        product_obj = {'id': product.id}
+
+        if 'name' in field_groups:
+            product_obj['name'] = product.name
+        if 'slug' in field_groups:
+            product_obj['slug'] = product.headless_slug or str(product.id)
+        if 'price' in field_groups:
+            product_obj['price'] = price if pricelist else product.list_price
+        if 'currency' in field_groups:
+            product_obj['currency'] = (pricelist or product).currency_id.symbol
+        if 'availability' in field_groups:
+            product_obj.update(self._get_availability_payload(product.headless_is_sold, stock))
+        if 'short_description' in field_groups:
+            product_obj['short_description'] = product.headless_short_description or ''
+        if 'long_description' in field_groups:
+            product_obj['long_description'] = product.headless_long_description or ''
+        if 'material' in field_groups:
+            product_obj['material'] = product.headless_material or ''
+        if 'specs' in field_groups:
+            product_obj['specs'] = {
+                'weight_kg': product.weight,
+                'volume_m3': product.volume,
+                'dimensions': {
+                    'length': product.dim_length,
+                    'width': product.dim_width,
+                    'height': product.dim_height,
+                    'display': f"{product.dim_length}x{product.dim_width}x{product.dim_height} cm",
+                },
+            }
+        if 'image' in field_groups:
+            product_obj['image'] = main_image
+        if 'images' in field_groups:
+            # Compatibilidad anterior
+            product_obj['images'] = {
+                'main': main_image,
+                'image_1': self._get_product_image_url(base_url, product, 'headless_image_1'),
+                'image_2': self._get_product_image_url(base_url, product, 'headless_image_2'),
+                'image_3': self._get_product_image_url(base_url, product, 'headless_image_3'),
+                'image_4': self._get_product_image_url(base_url, product, 'headless_image_4'),
+            }
+        if 'video' in field_groups:
+            # Nuevo soporte multimedia
+            product_obj.update({
+                'media_type': 'video' if video_payload.get('has_video') else 'image',
+                'has_video': video_payload.get('has_video'),
+                'video_url': video_payload.get('url'),
+                'video': video_payload,
+            })
+        if 'media' in field_groups:
+            product_obj['media'] = {
+                'type': 'video' if video_payload.get('has_video') else 'image',
+                'image': main_image,
+                'video': video_payload,
+            }
+        if 'seo' in field_groups:
+            product_obj['seo'] = {
+                'keyword': product.headless_seo_keyword or '',
+                'meta_title': product.headless_meta_title or product.name,
+                'meta_description': product.headless_meta_description or product.headless_short_description or '',
+            }
+
+        return product_obj
+
+    @api.model
+    def _get_collection_info(self, category):
+        return {
+            'title': category.collection_title_display or category.name,
+            'description': category.collection_description or '',
+            'subtitle': category.collection_subtitle or '',
+            'key': category.collection_key,
+        }
+
+    @api.model
+    def _iter_collection_details_json(self, category, base_url, field_groups=None, batch_size=STREAM_BATCH_SIZE,
+                                      pricelist=None):
+        """
+        Variante en streaming de _build_collection_details: genera el JSON
+        por partes, leyendo y codificando los productos en bloques de
+        ``batch_size``. Solo un bloque vive en memoria a la vez.
+        """
+        field_groups = set(field_groups or DETAIL_DEFAULT_FIELDS)
+        ProductTemplate = self.env['product.template']
+
+        yield b'{"collection_info":' + dump_payload(self._get_collection_info(category))
+        if pricelist:
+            yield b',"pricelist":' + dump_payload(self._get_pricelist_info(pricelist))
+        yield b',"products":['
+
+        with phase('product_search'):
+            product_ids = ProductTemplate.search([
+                ('categ_id', 'child_of', category.id),
+                ('sale_ok', '=', True),
+            ]).ids
+
+        separator = b''
+        for products in split_every(batch_size, product_ids, ProductTemplate.browse):
+            self._fetch_shape(products, 'detail', field_groups)
+
+            video_payloads = {}
+            if 'video' in field_groups or 'media' in field_groups:
+                video_payloads = self._get_product_video_payloads(base_url, products)
+            stock_map = self._get_stock_map(products.ids) if 'availability' in field_groups else {}
+            prices = self._get_product_prices(pricelist, products) if pricelist and 'price' in field_groups else {}
+
+            chunk = b','.join(
+                dump_payload(self._build_detail_product(
+                    product,
+                    base_url,
+                    field_groups,
+                    video_payload=video_payloads.get(product.id),
+                    stock=stock_map.get(product.id),
+                    pricelist=pricelist,
+                    price=prices.get(product.id),
+                ))
+                for product in products
+            )
+            yield separator + chunk
+            separator = b','
+
+            products.invalidate_recordset()
+
+        yield b']}'
+
+    @api.model
+    def _build_collection_details(self, category, base_url, field_groups=None, limit=None, after=None,
+                                  pricelist=None):
+        """
+        Payload de /api/collection/<collection_key> para una colección.
+
+        - ``field_groups``: grupos de DETAIL_FIELD_GROUPS a incluir; solo se
+          leen de la base de datos las columnas que esos grupos necesitan.
+          Por defecto, el payload completo.
+        - ``limit`` / ``after``: paginación por keyset sobre (sequence, id).
+          ``after`` es el ``next_cursor`` de la página anterior. Cuando se
+          pagina, la respuesta incluye el bloque ``pagination``.
+        - ``pricelist``: precios y moneda de esa tarifa, calculados para toda
+          la página a la vez (ver _get_product_prices). La respuesta incluye
+          el bloque ``pricelist``.
+        """
+        field_groups = set(field_groups or DETAIL_DEFAULT_FIELDS)
+        paginated = bool(limit or after)
+
+        domain = [
+            ('categ_id', 'child_of', category.id),
+            ('sale_ok', '=', True),
+        ]
+        order = None
+
+        if paginated:
+            order = 'sequence, id'
+            limit = limit or DETAIL_MAX_LIMIT
+
+            if after:
+                sequence, template_id = self._decode_cursor(after)
+                domain += [
+                    '|',
+                    ('sequence', '>', sequence),
+                    '&', ('sequence', '=', sequence), ('id', '>', template_id),
+                ]
+
+        with phase('product_search'):
+            products = self._search_shape(
+                'detail',
+                domain,
+                field_groups=field_groups,
+                order=order,
+                limit=limit + 1 if paginated else None,
+            )
+
+        has_more = paginated and len(products) > limit
+        if has_more:
+            products = products[:limit]
+
+        video_payloads = {}
+        if 'video' in field_groups or 'media' in field_groups:
+            video_payloads = self._get_product_video_payloads(base_url, products)
+        stock_map = self._get_stock_map(products.ids) if 'availability' in field_groups else {}
+        prices = self._get_product_prices(pricelist, products) if pricelist and 'price' in field_groups else {}
+
+        products_data = [
+            self._build_detail_product(
+                product,
+                base_url,
+                field_groups,
+                video_payload=video_payloads.get(product.id),
+                stock=stock_map.get(product.id),
+                pricelist=pricelist,
+                price=prices.get(product.id),
+            )
+            for product in products
+        ]
+
+        response_data = {
+            'collection_info': self._get_collection_info(category),
+            'products': products_data,
+        }
+
+        if pricelist:
+            response_data['pricelist'] = self._get_pricelist_info(pricelist)
+
+        if paginated:
+            response_data['pagination'] = {
+                'limit': limit,
+                'has_more': has_more,
+                'next_cursor': self._encode_cursor(products[-1]) if has_more else None,
+            }
+
+        return response_data
+
+    @api.model
+    def _build_collections_batch(self, categories, base_url, field_groups=None, limit=None):
+        """
+        Payload de /api/collections/batch: el detalle de varias colecciones
+        resuelto en conjunto.
+
+        Los productos de todas las colecciones se leen con una sola búsqueda
+        (o con la consulta de ventana de _get_collection_preview_ids si hay
+        ``limit`` por colección), y el estado de venta y los videos se
+        resuelven una vez para todos. Un producto presente en varias
+        colecciones anidadas se serializa una sola vez.
+
+        Devuelve {'collections': {collection_key: {'collection_info',
+        'products'}}} en el orden de ``categories``.
+        """
+        field_groups = set(field_groups or DETAIL_DEFAULT_FIELDS)
+        ProductTemplate = self.env['product.template']
+        self._fetch_shape(categories, 'collection')
+
+        with phase('product_search'):
+            if limit:
+                ids_by_category = self._get_collection_preview_ids(categories, limit)
+                products = self._fetch_shape(ProductTemplate.browse(sorted({
+                    product_id for product_ids in ids_by_category.values() for product_id in product_ids
+                })), 'detail', field_groups)
+            else:
+                products = ProductTemplate.search_fetch(
+                    [
+                        ('categ_id', 'child_of', categories.ids),
+                        ('sale_ok', '=', True),
+                    ],
+                    [*self._get_shape_fields('detail', field_groups), 'categ_id'],
+                )
+                products.categ_id.fetch(['parent_path'])
+
+                ids_by_category = {category.id: [] for category in categories}
+                for product in products:
+                    product_path = product.categ_id.parent_path
+                    for category in categories:
+                        if product_path.startswith(category.parent_path):
+                            ids_by_category[category.id].append(product.id)
+
+        video_payloads = {}
+        if 'video' in field_groups or 'media' in field_groups:
+            video_payloads = self._get_product_video_payloads(base_url, products)
+        stock_map = self._get_stock_map(products.ids) if 'availability' in field_groups else {}
+
+        products_data = {
+            product.id: self._build_detail_product(
+                product,
+                base_url,
+                field_groups,
+                video_payload=video_payloads.get(product.id),
+                stock=stock_map.get(product.id),
+            )
+            for product in products
+        }
+
+        return {
+            'collections': {
+                category.collection_key: {
+                    'collection_info': self._get_collection_info(category),
+                    'products': [products_data[product_id] for product_id in ids_by_category[category.id]],
+                }
+                for category in categories
+            },
+        }
+
+    @api.model
+    @timed('product_search')
+    def _find_product(self, slug):
+        """
+        Producto publicado por headless_slug, o por id si el slug es numérico
+        (los payloads usan el id como slug cuando headless_slug está vacío).
+        Devuelve un recordset vacío si no existe o no pertenece a ninguna
+        colección pública.
+        """
+        ProductTemplate = self.env['product.template']
+        fields_to_fetch = ['categ_id', 'headless_slug', 'write_date']
+
+        product = ProductTemplate.search_fetch([
+            ('headless_slug', '=', slug),
+            ('sale_ok', '=', True),
+        ], fields_to_fetch, limit=1)
+
+        # isascii: isdigit() acepta dígitos Unicode ('²') que int() rechaza.
+        if not product and slug.isascii() and slug.isdigit():
+            product = ProductTemplate.search_fetch([
+                ('id', '=', int(slug)),
+                ('sale_ok', '=', True),
+            ], fields_to_fetch, limit=1)
+
+        if product and not self._get_collection_keys_by_category(product.categ_id).get(product.categ_id.id):
+            return ProductTemplate
+
+        return product
+
+    @api.model
+    def _build_product_details(self, product, base_url, field_groups=None):
+        """
+        Payload de /api/product/<slug>: el mismo objeto de producto que el
+        detalle de colección, más las colecciones que lo contienen (de la
+        raíz a la más específica).
+        """
+        field_groups = set(field_groups or DETAIL_DEFAULT_FIELDS)
+
+        self._fetch_shape(product, 'detail', field_groups)
+
+        video_payload = None
+        if 'video' in field_groups or 'media' in field_groups:
+            video_payload = self._get_product_video_payloads(base_url, product)[product.id]
+
+        stock = None
+        if 'availability' in field_groups:
+            stock = self._get_stock_map(product.ids).get(product.id)
+
+        return {
+            'product': self._build_detail_product(
+                product,
+                base_url,
+                field_groups,
+                video_payload=video_payload,
+                stock=stock,
+            ),
+            'collections': self._get_collection_keys_by_category(product.categ_id).get(product.categ_id.id, []),
+        }
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+
+class HeadlessCatalogHit(models.Model):
+    """
+    Peticiones acumuladas por colección en /api/collection/<key>. Sirve para
+    elegir qué colecciones precalentar (ver _warm_payload_cache).
+
+    Los workers cuentan en memoria y vuelcan aquí cada cierto tiempo; el
+    autovacuum diario divide los contadores a la mitad para que pesen más
+    las peticiones recientes.
+    """
+    _name = 'headless.catalog.hit'
+    _description = 'Peticiones por Colección Headless'
+    _order = 'hits desc, id'
+
+    collection_key = fields.Char(string="Key", required=True)
+    hits = fields.Integer(string="Peticiones", default=0)
+    last_hit = fields.Datetime(string="Última petición")
+
+    _sql_constraints = [
+        ('collection_key_unique', 'unique(collection_key)', 'Solo puede haber un contador por colección.')
+    ]
+
+    @api.model
+    def _add_hits(self, counts):
+        """Suma ``counts`` ({collection_key: n}) con un único UPSERT."""
+        if not counts:
+            return
+
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO headless_catalog_hit (collection_key, hits, last_hit, create_date, write_date)
+            SELECT key, hits, %(now)s, %(now)s, %(now)s
+              FROM unnest(%(keys)s::varchar[], %(hits)s::int[]) AS counts(key, hits)
+                ON CONFLICT (collection_key) DO UPDATE
+               SET hits = headless_catalog_hit.hits + EXCLUDED.hits,
+                   last_hit = EXCLUDED.last_hit,
+                   write_date = EXCLUDED.write_date
+            """,
+            now=self.env.cr.now(),
+            keys=list(counts),
+            hits=list(counts.values()),
+        ))
+        self.invalidate_model()
+
+    @api.model
+    def _get_top_keys(self, limit):
+        return self.sudo().search_fetch([('hits', '>', 0)], ['collection_key'], limit=limit).mapped('collection_key')
+
+    @api.autovacuum
+    def _gc_hits(self):
+        self.env.cr.execute("UPDATE headless_catalog_hit SET hits = hits / 2")
+        self.env.cr.execute("DELETE FROM headless_catalog_hit WHERE hits = 0")
+        self.invalidate_model()
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import hmac
+import logging
+from datetime import timedelta
+
+import requests
+
+from odoo import api, fields, models
+
+from .headless_catalog import dump_payload
+
+_logger = logging.getLogger(__name__)
+
+
+# Parámetros de sistema del webhook de revalidación.
+REVALIDATION_URL_PARAM = 'headless_collections.revalidation_url'
+REVALIDATION_SECRET_PARAM = 'headless_collections.revalidation_secret'
+REVALIDATION_WINDOW_PARAM = 'headless_collections.revalidation_window'
+
+# Segundos que se acumulan cambios antes de enviar un lote.
+REVALIDATION_DEFAULT_WINDOW = 30
+
+REVALIDATION_TIMEOUT = 10
+
+# Reintentos: 1, 2, 4, 8... minutos, hasta 1 hora; tras el último intento
+# el lote queda en estado 'failed'.
+REVALIDATION_BACKOFF_BASE = 60
+REVALIDATION_BACKOFF_MAX = 3600
+REVALIDATION_MAX_ATTEMPTS = 8
+
+# Días que se conservan los lotes fallidos.
+REVALIDATION_FAILED_RETENTION_DAYS = 7
+
+
+class HeadlessCatalogOutbox(models.Model):
+    """
+    Outbox de revalidación del frontend headless.
+
+    Cada transacción que modifica productos o colecciones deja una fila con
+    las collection_key y slugs afectados. El cron agrupa las filas
+    pendientes cuando la más antigua supera la ventana configurada y envía
+    un único POST al webhook:
+
+        {
+            "collections": ["sofas", "sofas-cuero"],
+            "products": ["sofa-milano", "123"],
+            "all": false
+        }
+
+    firmado con HMAC-SHA256 del cuerpo en ``X-Headless-Signature`` si hay
+    secreto configurado. ``all`` indica que hay que revalidar todo (p. ej.
+    tras cambiar traducciones).
+    """
+    _name = 'headless.catalog.outbox'
+    _description = 'Revalidación Pendiente del Frontend Headless'
+    _order = 'id'
+
+    collection_keys = fields.Json(string="Colecciones")
+    product_slugs = fields.Json(string="Productos")
+    revalidate_all = fields.Boolean(string="Revalidar todo")
+    state = fields.Selection(
+        selection=[
+            ('pending', 'Pendiente'),
+            ('failed', 'Fallido'),
+        ],
+        string="Estado",
+        default='pending',
+        required=True,
+        index=True,
+    )
+    attempts = fields.Integer(string="Intentos", default=0)
+    next_attempt_at = fields.Datetime(string="Próximo intento")
+    last_error = fields.Char(string="Último error")
+
+    @api.model
+    def _is_enabled(self):
+        return bool(self.env['ir.config_parameter'].sudo().get_param(REVALIDATION_URL_PARAM))
+
+    @api.model
+    def _get_window(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            REVALIDATION_WINDOW_PARAM,
+            REVALIDATION_DEFAULT_WINDOW,
+        ))
+
+    @api.model
+    def _get_cron(self):
+        return self.env.ref(f'{self._original_module}.ir_cron_headless_revalidation').sudo()
+
+    @api.model
+    def _enqueue(self, collection_keys=(), product_slugs=(), revalidate_all=False):
+        """
+        Acumula claves afectadas en la transacción actual. Se escribe una
+        sola fila por transacción, justo antes del commit.
+        """
+        if not self._is_enabled():
+            return
+
+        precommit = self.env.cr.precommit
+        pending = precommit.data.get('headless_outbox')
+        if pending is None:
+            pending = precommit.data['headless_outbox'] = {'all': False, 'collections': set(), 'products': set()}
+            precommit.add(lambda: self._create_pending(pending))
+
+        pending['all'] |= revalidate_all
+        pending['collections'].update(collection_keys)
+        pending['products'].update(product_slugs)
+
+    @api.model
+    def _create_pending(self, pending):
+        if not (pending['all'] or pending['collections'] or pending['products']):
+            return
+
+        self.sudo().create({
+            'collection_keys': sorted(pending['collections']),
+            'product_slugs': sorted(pending['products']),
+            'revalidate_all': pending['all'],
+        })
+        self._get_cron()._trigger(self.env.cr.now() + timedelta(seconds=self._get_window()))
+
+    @api.model
+    def _get_backoff(self, attempts):
+        return min(REVALIDATION_BACKOFF_BASE * 2 ** (attempts - 1), REVALIDATION_BACKOFF_MAX)
+
+    @api.model
+    def _build_payload(self, entries):
+        revalidate_all = any(entries.mapped('revalidate_all'))
+        return {
+            'collections': [] if revalidate_all else sorted({
+                key for entry in entries for key in entry.collection_keys or []
+            }),
+            'products': [] if revalidate_all else sorted({
+                slug for entry in entries for slug in entry.product_slugs or []
+            }),
+            'all': revalidate_all,
+        }
+
+    @api.model
+    def _send(self, url, body):
+        headers = {'Content-Type': 'application/json'}
+
+        secret = self.env['ir.config_parameter'].sudo().get_param(REVALIDATION_SECRET_PARAM)
+        if secret:
+            signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+            headers['X-Headless-Signature'] = f'sha256={signature}'
+
+        response = requests.post(url, data=body, headers=headers, timeout=REVALIDATION_TIMEOUT)
+        response.raise_for_status()
+
+    @api.model
+    def _cron_send_revalidation(self):
+        """
+        Envía como un solo lote todas las filas pendientes cuya espera o
+        reintento ya venció, si la más antigua supera la ventana. Si falla,
+        reprograma el lote con backoff exponencial.
+        """
+        url = self.env['ir.config_parameter'].sudo().get_param(REVALIDATION_URL_PARAM)
+        if not url:
+            return
+
+        now = self.env.cr.now()
+        cron = self._get_cron()
+
+        entries = self.sudo().search([
+            ('state', '=', 'pending'),
+            '|', ('next_attempt_at', '=', False), ('next_attempt_at', '<=', now),
+        ])
+        if not entries:
+            return
+
+        window_end = min(entries.mapped('create_date')) + timedelta(seconds=self._get_window())
+        if window_end > now:
+            cron._trigger(window_end)
+            return
+
+        body = dump_payload(self._build_payload(entries))
+
+        try:
+            self._send(url, body)
+        except requests.RequestException as error:
+            attempts = max(entries.mapped('attempts')) + 1
+            vals = {'attempts': attempts, 'last_error': str(error)[:250]}
+
+            if attempts >= REVALIDATION_MAX_ATTEMPTS:
+                vals['state'] = 'failed'
+                _logger.error("Headless revalidation webhook failed %s times, giving up: %s", attempts, error)
+            else:
+                vals['next_attempt_at'] = now + timedelta(seconds=self._get_backoff(attempts))
+                cron._trigger(vals['next_attempt_at'])
+                _logger.warning("Headless revalidation webhook failed (attempt %s): %s", attempts, error)
+
+            entries.write(vals)
+            return
+
+        _logger.info("Headless revalidation sent for %s outbox entries", len(entries))
+        entries.unlink()
+
+    @api.autovacuum
+    def _gc_failed(self):
+        limit_date = fields.Datetime.now() - timedelta(days=REVALIDATION_FAILED_RETENTION_DAYS)
+        self.sudo().search([('state', '=', 'failed'), ('write_date', '<', limit_date)]).unlink()
+
+
+class HeadlessCatalog(models.AbstractModel):
+    _inherit = 'headless.catalog'
+
+    @api.model
+    def _invalidate_payload_cache(self, collection_keys=None):
+        # Lo que invalida la caché local también se revalida en el frontend.
+        super()._invalidate_payload_cache(collection_keys)
+        self.env['headless.catalog.outbox']._enqueue(
+            collection_keys=collection_keys or (),
+            revalidate_all=collection_keys is None,
+        )
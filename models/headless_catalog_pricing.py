@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+from odoo import api, fields, models
+
+from ..tools.timing import timed
+from .headless_catalog import PayloadCache
+
+
+# Parámetro de sistema que invalida los precios memorizados de todos los
+# workers al cambiar reglas de tarifa.
+PRICELIST_GENERATION_PARAM = 'headless_collections.pricelist_generation'
+
+# Parámetro de sistema que cambia al escribir el costo (standard_price) de
+# una variante; forma parte del ETag y de la llave de los precios.
+COST_GENERATION_PARAM = 'headless_collections.cost_generation'
+
+# Parámetro de sistema: ids de tarifa (separados por coma) que se pueden
+# pedir desde la API pública. Sin valor no se expone ninguna.
+PUBLIC_PRICELISTS_PARAM = 'headless_collections.public_pricelist_ids'
+
+# Precios memorizados por base de datos y worker.
+PRICE_MEMO_SIZE = 20000
+
+_price_memos = {}
+_price_memos_lock = threading.Lock()
+
+
+class HeadlessCatalog(models.AbstractModel):
+    """
+    Precios por tarifa (?pricelist= / ?currency= en el detalle de colección).
+
+    Los precios de todos los productos de un payload se calculan con una
+    sola llamada a product.pricelist._get_products_price, que resuelve las
+    reglas aplicables de todo el recordset a la vez. El resultado se memoriza
+    por (tarifa, producto, día) en el proceso; la llave incluye la generación
+    de tarifas, que se incrementa al crear, modificar o borrar reglas, la
+    generación de costos, que se incrementa al escribir standard_price, el
+    write_date del producto (precio de lista) y el último cambio de tasas de
+    las monedas implicadas.
+
+    Solo se sirven las tarifas listadas en PUBLIC_PRICELISTS_PARAM.
+
+    Las reglas se evalúan con la fecha del día: una regla que empieza a media
+    jornada se aplica a partir del día siguiente.
+    """
+    _inherit = 'headless.catalog'
+
+    @api.model
+    def _get_public_pricelist_ids(self):
+        value = self.env['ir.config_parameter'].sudo().get_param(PUBLIC_PRICELISTS_PARAM) or ''
+        return [int(part) for part in value.split(',') if part.strip().isascii() and part.strip().isdigit()]
+
+    @api.model
+    def _get_pricelist(self, pricelist_id=None, currency_code=None):
+        """
+        Tarifa pedida con ``?pricelist=<id>`` o, con solo ``?currency=<ISO>``,
+        la primera tarifa pública (por secuencia) en esa moneda. None si no
+        se pide ninguna. Lanza ValueError si no existe, no es pública o no
+        coinciden.
+        """
+        if not pricelist_id and not currency_code:
+            return None
+
+        public_ids = self._get_public_pricelist_ids()
+        Pricelist = self.env['product.pricelist'].sudo()
+
+        if pricelist_id:
+            pricelist_id = int(pricelist_id)
+            if pricelist_id not in public_ids:
+                raise ValueError("Pricelist not found")
+            pricelist = Pricelist.browse(pricelist_id).exists()
+            if not pricelist.active:
+                raise ValueError("Pricelist not found")
+            if currency_code and pricelist.currency_id.name != currency_code.upper():
+                raise ValueError(f"Pricelist {pricelist.id} is not in {currency_code.upper()}")
+            return pricelist
+
+        pricelist = Pricelist.search([
+            ('id', 'in', public_ids),
+            ('currency_id.name', '=', currency_code.upper()),
+        ], order='sequence, id', limit=1)
+        if not pricelist:
+            raise ValueError(f"No pricelist for currency {currency_code.upper()}")
+        return pricelist
+
+    @api.model
+    def _get_pricelist_generation(self):
+        return self.env['ir.config_parameter'].sudo().get_param(PRICELIST_GENERATION_PARAM, '0')
+
+    @api.model
+    def _bump_pricelist_generation(self):
+        """
+        Invalida los precios memorizados de todos los workers. Como la
+        generación forma parte de _get_pricelist_version, también cambia el
+        ETag de los payloads con tarifa.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        ICP.set_param(PRICELIST_GENERATION_PARAM, str(int(ICP.get_param(PRICELIST_GENERATION_PARAM, '0')) + 1))
+        self._get_price_memo().clear()
+
+    @api.model
+    def _get_currency_rates_version(self, pricelist):
+        """
+        Último write_date de las tasas de la moneda de ``pricelist`` y de la
+        moneda de la compañía, entre las que convierte la tarifa.
+        """
+        currencies = pricelist.currency_id | self.env.company.currency_id
+        [(last_write,)] = self.env['res.currency.rate'].sudo()._read_group(
+            [('currency_id', 'in', currencies.ids)],
+            aggregates=['write_date:max'],
+        )
+        return last_write and last_write.isoformat()
+
+    @api.model
+    def _get_cost_generation(self):
+        return self.env['ir.config_parameter'].sudo().get_param(COST_GENERATION_PARAM, '0')
+
+    @api.model
+    def _bump_cost_generation(self):
+        """
+        El costo vive en product.product y no mueve el write_date de la
+        plantilla; las tarifas basadas en costo dependen de esta generación.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        ICP.set_param(COST_GENERATION_PARAM, str(int(ICP.get_param(COST_GENERATION_PARAM, '0')) + 1))
+
+    @api.model
+    def _get_pricelist_version(self, pricelist):
+        """
+        Variante de caché y ETag de un payload con ``pricelist``: la tarifa,
+        la generación de tarifas, las tasas de cambio, los costos y el día.
+        None sin tarifa.
+        """
+        if not pricelist:
+            return None
+        return (
+            pricelist.id,
+            self._get_pricelist_generation(),
+            self._get_currency_rates_version(pricelist),
+            self._get_cost_generation(),
+            fields.Date.today().isoformat(),
+        )
+
+    @api.model
+    def _get_price_memo(self):
+        dbname = self.env.cr.dbname
+        with _price_memos_lock:
+            if dbname not in _price_memos:
+                _price_memos[dbname] = PayloadCache(PRICE_MEMO_SIZE)
+            return _price_memos[dbname]
+
+    @api.model
+    @timed('pricelist')
+    def _get_product_prices(self, pricelist, products):
+        """
+        Devuelve {product_template_id: precio} con ``pricelist`` para todo
+        ``products``. Solo los productos sin precio memorizado pasan por el
+        cálculo de la tarifa, todos juntos en una llamada.
+        """
+        if not products:
+            return {}
+
+        products.fetch(['write_date'])
+        memo = self._get_price_memo()
+        generation = self._get_pricelist_generation()
+        cost_generation = self._get_cost_generation()
+        rates_version = self._get_currency_rates_version(pricelist)
+        today = fields.Date.today()
+
+        def memo_key(product):
+            return (generation, cost_generation, pricelist.id, rates_version, product.id, product.write_date, today)
+
+        prices = {}
+        missing_ids = []
+        for product in products:
+            price = memo.get(memo_key(product))
+            if price is None:
+                missing_ids.append(product.id)
+            else:
+                prices[product.id] = price
+
+        if missing_ids:
+            missing = products.browse(missing_ids)
+            computed = pricelist._get_products_price(missing, 1.0, date=today)
+            for product in missing:
+                prices[product.id] = computed[product.id]
+                memo.set(memo_key(product), computed[product.id])
+
+        return prices
+
+    @api.model
+    def _get_pricelist_info(self, pricelist):
+        return {
+            'id': pricelist.id,
+            'name': pricelist.name,
+            'currency': pricelist.currency_id.name,
+        }
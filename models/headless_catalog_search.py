@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models
+from odoo.tools import SQL
+
+from ..tools.timing import phase, timed
+
+
+# Tamaño de página por defecto en /api/collections/search.
+SEARCH_DEFAULT_LIMIT = 24
+
+# Grupos de DETAIL_FIELD_GROUPS de cada resultado si no se pide ``fields``.
+SEARCH_DEFAULT_FIELDS = ('availability', 'currency', 'image', 'material', 'name', 'price', 'slug')
+
+# Columnas de texto en las que se busca (además de name, traducible).
+SEARCH_TEXT_FIELDS = ('headless_short_description', 'headless_material', 'headless_seo_keyword')
+
+# Valores distintos de material devueltos como faceta.
+SEARCH_MATERIAL_FACET_SIZE = 50
+
+# Parámetro de sistema con los límites de los tramos de precio, p. ej.
+# "0,100,250,500,1000". El último tramo queda abierto por arriba.
+SEARCH_PRICE_BUCKETS_PARAM = 'headless_collections.search_price_buckets'
+SEARCH_DEFAULT_PRICE_BUCKETS = '0,100,250,500,1000,2500'
+
+
+class HeadlessCatalog(models.AbstractModel):
+    """
+    Búsqueda y facetas del catálogo (/api/collections/search).
+
+    El texto se compara con ILIKE sobre name, headless_short_description,
+    headless_material y headless_seo_keyword. Con pg_trgm esos ILIKE usan
+    índices GIN de trigramas (ver product.template.init) y los resultados se
+    ordenan por relevancia con word_similarity().
+    """
+    _inherit = 'headless.catalog'
+
+    @api.model
+    def _get_search_price_buckets(self):
+        value = self.env['ir.config_parameter'].sudo().get_param(
+            SEARCH_PRICE_BUCKETS_PARAM,
+            SEARCH_DEFAULT_PRICE_BUCKETS,
+        )
+        try:
+            return sorted({float(bound) for bound in value.split(',') if bound.strip()})
+        except ValueError:
+            return [float(bound) for bound in SEARCH_DEFAULT_PRICE_BUCKETS.split(',')]
+
+    @api.model
+    def _get_search_domain(self, categories, query=None, materials=None, availability=None,
+                           price_min=None, price_max=None):
+        domain = [
+            ('categ_id', 'child_of', categories.ids),
+            ('sale_ok', '=', True),
+        ]
+
+        if query:
+            domain += ['|'] * len(SEARCH_TEXT_FIELDS)
+            domain.append(('name', 'ilike', query))
+            domain += [(field_name, 'ilike', query) for field_name in SEARCH_TEXT_FIELDS]
+        if materials:
+            domain.append(('headless_material', 'in', list(materials)))
+        if availability:
+            domain.append(('headless_is_sold', '=', availability == 'sold'))
+        if price_min is not None:
+            domain.append(('list_price', '>=', price_min))
+        if price_max is not None:
+            domain.append(('list_price', '<=', price_max))
+
+        return domain
+
+    @api.model
+    def _get_search_relevance(self, query):
+        """Expresión de orden por relevancia, o None sin pg_trgm."""
+        ProductTemplate = self.env['product.template']
+        if not query or not ProductTemplate._headless_has_trigram():
+            return None
+
+        table = ProductTemplate._table
+        texts = [
+            SQL(
+                "COALESCE(%(name)s->>%(lang)s, %(name)s->>'en_US', '')",
+                name=SQL.identifier(table, 'name'),
+                lang=self.env.lang or 'en_US',
+            ),
+            *(
+                SQL("COALESCE(%s, '')", SQL.identifier(table, field_name))
+                for field_name in SEARCH_TEXT_FIELDS
+            ),
+        ]
+        return SQL("GREATEST(%s)", SQL(", ").join(
+            SQL("word_similarity(%s, %s)", query, text) for text in texts
+        ))
+
+    @api.model
+    @timed('search_facets')
+    def _get_search_facets(self, subquery):
+        """
+        Facetas y total de la búsqueda en una sola consulta agregada con
+        GROUPING SETS: material, disponibilidad, tramos de precio y, en el
+        conjunto vacío, el total y los rangos de precio y dimensiones.
+        """
+        thresholds = self._get_search_price_buckets()
+        self.env['product.template'].flush_model([
+            'headless_material', 'headless_is_sold', 'list_price',
+            'dim_length', 'dim_width', 'dim_height',
+        ])
+
+        self.env.cr.execute(SQL(
+            """
+            WITH matched AS (
+                SELECT NULLIF(headless_material, '') AS material,
+                       COALESCE(headless_is_sold, FALSE) AS is_sold,
+                       list_price,
+                       width_bucket(list_price, %(thresholds)s::numeric[]) AS price_bucket,
+                       NULLIF(dim_length, 0) AS dim_length,
+                       NULLIF(dim_width, 0) AS dim_width,
+                       NULLIF(dim_height, 0) AS dim_height
+                  FROM product_template
+                 WHERE id IN %(subquery)s
+            )
+            SELECT GROUPING(material), GROUPING(is_sold), GROUPING(price_bucket),
+                   material, is_sold, price_bucket,
+                   COUNT(*),
+                   MIN(list_price)::float, MAX(list_price)::float,
+                   MIN(dim_length)::float, MAX(dim_length)::float,
+                   MIN(dim_width)::float, MAX(dim_width)::float,
+                   MIN(dim_height)::float, MAX(dim_height)::float
+              FROM matched
+             GROUP BY GROUPING SETS ((material), (is_sold), (price_bucket), ())
+            """,
+            thresholds=thresholds,
+            subquery=subquery,
+        ))
+
+        total = 0
+        materials = []
+        availability = {'available': 0, 'sold': 0}
+        price_counts = {}
+        ranges = {}
+
+        for row in self.env.cr.fetchall():
+            no_material, no_sold, no_bucket, material, is_sold, bucket, count = row[:7]
+            if not no_material:
+                if material:
+                    materials.append({'value': material, 'count': count})
+            elif not no_sold:
+                availability['sold' if is_sold else 'available'] = count
+            elif not no_bucket:
+                price_counts[bucket] = count
+            else:
+                total = count
+                ranges = {
+                    name: {'min': row[index], 'max': row[index + 1]}
+                    for name, index in (('price', 7), ('length', 9), ('width', 11), ('height', 13))
+                }
+
+        materials.sort(key=lambda facet: (-facet['count'], facet['value']))
+
+        # width_bucket: 0 por debajo del primer límite, i en [t[i-1], t[i]).
+        bounds = [None, *thresholds, None]
+        price_buckets = [
+            {'min': bounds[bucket], 'max': bounds[bucket + 1], 'count': price_counts[bucket]}
+            for bucket in sorted(price_counts)
+        ]
+
+        return total, {
+            'material': materials[:SEARCH_MATERIAL_FACET_SIZE],
+            'availability': availability,
+            'price': price_buckets,
+            'price_range': ranges.get('price') or {'min': None, 'max': None},
+            'dimensions': {
+                name: ranges.get(name) or {'min': None, 'max': None}
+                for name in ('length', 'width', 'height')
+            },
+        }
+
+    @api.model
+    def _build_search_results(self, base_url, categories, query=None, materials=None, availability=None,
+                              price_min=None, price_max=None, field_groups=None,
+                              limit=SEARCH_DEFAULT_LIMIT, offset=0):
+        """
+        Payload de /api/collections/search.
+
+        Las facetas y el total se calculan sobre todos los productos que
+        cumplen la búsqueda y los filtros; ``products`` es la página
+        [offset, offset + limit), ordenada por relevancia si hay texto y
+        pg_trgm, o por (sequence, id) como en el detalle de colección.
+        """
+        field_groups = set(field_groups or SEARCH_DEFAULT_FIELDS)
+        ProductTemplate = self.env['product.template']
+
+        domain = self._get_search_domain(
+            categories,
+            query=query,
+            materials=materials,
+            availability=availability,
+            price_min=price_min,
+            price_max=price_max,
+        )
+
+        with phase('product_search'):
+            search_query = ProductTemplate._search(domain)
+            total, facets = self._get_search_facets(search_query.subselect())
+
+            table = ProductTemplate._table
+            order = [SQL.identifier(table, 'sequence'), SQL.identifier(table, 'id')]
+            relevance = self._get_search_relevance(query)
+            if relevance is not None:
+                order.insert(0, SQL("%s DESC", relevance))
+
+            search_query.order = SQL(", ").join(order)
+            search_query.limit = limit
+            search_query.offset = offset
+            self.env.cr.execute(search_query.select(SQL.identifier(table, 'id')))
+            product_ids = [row[0] for row in self.env.cr.fetchall()]
+
+        products = self._fetch_shape(ProductTemplate.browse(product_ids), 'detail', field_groups)
+
+        video_payloads = {}
+        if 'video' in field_groups or 'media' in field_groups:
+            video_payloads = self._get_product_video_payloads(base_url, products)
+        stock_map = self._get_stock_map(products.ids) if 'availability' in field_groups else {}
+
+        return {
+            'query': query or '',
+            'products': [
+                self._build_detail_product(
+                    product,
+                    base_url,
+                    field_groups,
+                    video_payload=video_payloads.get(product.id),
+                    stock=stock_map.get(product.id),
+                )
+                for product in products
+            ],
+            'facets': facets,
+            'pagination': {
+                'total': total,
+                'limit': limit,
+                'offset': offset,
+                'has_more': offset + len(product_ids) < total,
+            },
+        }
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import shutil
+import time
+
+from odoo import api, models
+from odoo.tools import config
+
+from .headless_catalog import compress_body, dump_payload
+
+_logger = logging.getLogger(__name__)
+
+
+# Parámetro de sistema con el directorio raíz de los snapshots.
+SNAPSHOT_DIR_PARAM = 'headless_collections.snapshot_dir'
+
+# Versiones anteriores que se conservan junto a la publicada.
+SNAPSHOT_KEEP_RELEASES = 3
+
+
+class HeadlessCatalog(models.AbstractModel):
+    """
+    Exportación de la API de colecciones a archivos estáticos.
+
+    Estructura del directorio raíz:
+
+        releases/<fecha>-<versión>/collections_data.json(.gz|.br)
+        releases/<fecha>-<versión>/collection/<key>.json(.gz|.br)
+        releases/<fecha>-<versión>/lang/<código>/collections_data.json(.gz|.br)
+        releases/<fecha>-<versión>/lang/<código>/collection/<key>.json(.gz|.br)
+        releases/<fecha>-<versión>/manifest.json
+        current -> releases/<fecha>-<versión>
+
+    Los endpoints responden en el idioma de la petición, así que se genera
+    un árbol por idioma instalado bajo ``lang/``; los archivos de la raíz
+    son los del idioma del usuario que exporta (el del cron, en_US por
+    defecto) y sirven de respaldo.
+
+    ``current`` es un enlace simbólico que se reemplaza de forma atómica, así
+    que Nginx nunca ve un snapshot a medio escribir. Ejemplo, con el idioma
+    en la cookie ``frontend_lang`` que usa Odoo:
+
+        location = /api/collections_data {
+            root /ruta/snapshots/current;
+            gzip_static on; brotli_static on;
+            try_files /lang/$cookie_frontend_lang/collections_data.json /collections_data.json @odoo;
+        }
+        location ~ ^/api/collection/([^/]+)$ {
+            root /ruta/snapshots/current;
+            gzip_static on; brotli_static on;
+            try_files /lang/$cookie_frontend_lang/collection/$1.json /collection/$1.json @odoo;
+        }
+    """
+    _inherit = 'headless.catalog'
+
+    @api.model
+    def _get_snapshot_root(self):
+        return (
+            self.env['ir.config_parameter'].sudo().get_param(SNAPSHOT_DIR_PARAM)
+            or os.path.join(config['data_dir'], 'headless_snapshots', self.env.cr.dbname)
+        )
+
+    @api.model
+    def _iter_snapshot_payloads(self, base_url):
+        """Genera (ruta relativa, payload) de cada archivo del snapshot."""
+        yield 'collections_data.json', self._build_collections_data(base_url)
+
+        categories = self._search_shape('collection', [
+            ('is_collection', '=', True),
+            ('collection_key', '!=', False),
+        ])
+
+        for category in categories:
+            key = category.collection_key
+            if key in ('.', '..') or '/' in key or '\\' in key:
+                _logger.warning("Skipping collection %s in snapshot: unsafe key %r", category.id, key)
+                continue
+
+            yield os.path.join('collection', f'{key}.json'), self._build_collection_details(category, base_url)
+
+    @api.model
+    def _write_snapshot_file(self, path, body):
+        """Escribe el JSON y sus hermanos precomprimidos .gz / .br."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, 'wb') as snapshot_file:
+            snapshot_file.write(body)
+
+        for encoding, extension in (('gzip', '.gz'), ('br', '.br')):
+            compressed = compress_body(body, encoding)
+            if compressed is not None:
+                with open(path + extension, 'wb') as snapshot_file:
+                    snapshot_file.write(compressed)
+
+    @api.model
+    def _read_snapshot_version(self, root):
+        manifest_path = os.path.join(root, 'current', 'manifest.json')
+        try:
+            with open(manifest_path, encoding='utf-8') as manifest_file:
+                return json.load(manifest_file).get('version')
+        except (OSError, ValueError):
+            return None
+
+    @api.model
+    def _publish_snapshot_release(self, root, release):
+        """Apunta ``current`` a ``release`` de forma atómica (rename)."""
+        current = os.path.join(root, 'current')
+        tmp_link = os.path.join(root, f'.current-{os.getpid()}')
+
+        if os.path.lexists(tmp_link):
+            os.unlink(tmp_link)
+
+        os.symlink(os.path.relpath(release, root), tmp_link)
+        os.replace(tmp_link, current)
+
+    @api.model
+    def _clean_snapshot_releases(self, root, release):
+        releases_dir = os.path.join(root, 'releases')
+        releases = sorted(
+            name for name in os.listdir(releases_dir)
+            if os.path.join(releases_dir, name) != release
+        )
+
+        for name in releases[:-SNAPSHOT_KEEP_RELEASES or None]:
+            shutil.rmtree(os.path.join(releases_dir, name), ignore_errors=True)
+
+    @api.model
+    def _export_static_snapshot(self, root=None, force=False):
+        """
+        Renderiza /api/collections_data y cada /api/collection/<key> en
+        archivos JSON, en cada idioma instalado, y publica el resultado.
+
+        Si el catálogo no cambió desde el último snapshot (mismo token de
+        _get_payload_version) no se regenera, salvo con ``force=True``.
+
+        Uso desde ``odoo-bin shell``:
+            env['headless.catalog']._export_static_snapshot(force=True)
+
+        Devuelve la ruta publicada (``<root>/current``).
+        """
+        root = root or self._get_snapshot_root()
+        base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
+
+        version, last_modified = self._get_payload_version('snapshot', base_url)
+        current = os.path.join(root, 'current')
+
+        if not force and self._read_snapshot_version(root) == version:
+            _logger.info("Headless snapshot %s is up to date", current)
+            return current
+
+        started = time.time()
+        release = os.path.join(root, 'releases', f"{time.strftime('%Y%m%d%H%M%S')}-{version[:8]}")
+        os.makedirs(release)
+
+        langs = [code for code, _name in self.env['res.lang'].get_installed()]
+        file_count = 0
+        for lang in langs:
+            Catalog = self.with_context(lang=lang)
+            for relative_path, data in Catalog._iter_snapshot_payloads(base_url):
+                body = dump_payload(data)
+                self._write_snapshot_file(os.path.join(release, 'lang', lang, relative_path), body)
+                if lang == self.env.lang:
+                    self._write_snapshot_file(os.path.join(release, relative_path), body)
+                file_count += 1
+            # Libera los productos leídos antes del siguiente idioma.
+            self.env.invalidate_all()
+
+        if self.env.lang not in langs:
+            for relative_path, data in self._iter_snapshot_payloads(base_url):
+                self._write_snapshot_file(os.path.join(release, relative_path), dump_payload(data))
+
+        with open(os.path.join(release, 'manifest.json'), 'w', encoding='utf-8') as manifest_file:
+            json.dump({
+                'version': version,
+                'last_modified': last_modified and last_modified.isoformat(),
+                'lang': self.env.lang,
+                'langs': langs,
+                'base_url': base_url,
+                'files': file_count,
+            }, manifest_file)
+
+        self._publish_snapshot_release(root, release)
+        self._clean_snapshot_releases(root, release)
+
+        _logger.info(
+            "Headless snapshot published in %s (%s files, %.2fs)",
+            release, file_count, time.time() - started,
+        )
+        return current
+
+    @api.model
+    def _cron_export_static_snapshot(self):
+        self._export_static_snapshot()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+
+# Días que se conservan las lápidas antes de limpiarlas.
+TOMBSTONE_RETENTION_DAYS = 90
+
+
+class HeadlessCatalogTombstone(models.Model):
+    """
+    Registro de productos y colecciones eliminados, para que el feed de
+    cambios (/api/collections/changes) pueda informar borrados.
+    """
+    _name = 'headless.catalog.tombstone'
+    _description = 'Elemento Eliminado del Catálogo Headless'
+    _order = 'deleted_at, id'
+
+    res_model = fields.Selection(
+        selection=[
+            ('product.template', 'Producto'),
+            ('product.category', 'Colección'),
+        ],
+        string="Modelo",
+        required=True,
+    )
+    res_id = fields.Integer(string="ID", required=True)
+    key = fields.Char(
+        string="Slug / Key",
+        help="headless_slug del producto o collection_key de la colección."
+    )
+    collection_keys = fields.Json(
+        string="Colecciones",
+        help="Keys de las colecciones que contenían el elemento."
+    )
+    deleted_at = fields.Datetime(
+        string="Eliminado el",
+        required=True,
+        index=True,
+        default=fields.Datetime.now,
+    )
+
+    @api.model
+    def _record_templates(self, templates):
+        Catalog = self.env['headless.catalog']
+        keys_by_category = Catalog._get_collection_keys_by_category(templates.categ_id)
+
+        self.sudo().create([
+            {
+                'res_model': 'product.template',
+                'res_id': template.id,
+                'key': template.headless_slug or str(template.id),
+                'collection_keys': keys_by_category.get(template.categ_id.id, []),
+            }
+            for template in templates
+        ])
+
+    @api.model
+    def _record_categories(self, categories):
+        Catalog = self.env['headless.catalog']
+        categories = categories.filtered(lambda category: category.is_collection or category.collection_key)
+        keys_by_category = Catalog._get_collection_keys_by_category(categories)
+
+        self.sudo().create([
+            {
+                'res_model': 'product.category',
+                'res_id': category.id,
+                'key': Catalog._get_collection_key(category),
+                'collection_keys': keys_by_category.get(category.id, []),
+            }
+            for category in categories
+        ])
+
+    @api.autovacuum
+    def _gc_tombstones(self):
+        limit_date = fields.Datetime.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+        self.sudo().search([('deleted_at', '<', limit_date)]).unlink()
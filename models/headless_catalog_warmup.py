@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import logging
+import os
+import threading
+import time
+
+from odoo import SUPERUSER_ID, api, models
+from odoo.modules.registry import Registry
+from odoo.tools import config, str2bool
+
+from .headless_catalog import dump_payload
+
+_logger = logging.getLogger(__name__)
+
+
+# Parámetro de sistema: número de colecciones más pedidas que se precalientan.
+WARMUP_TOP_KEYS_PARAM = 'headless_collections.warmup_top_keys'
+WARMUP_DEFAULT_TOP_KEYS = 20
+
+# Parámetro de sistema para desactivar el precalentado al cargar el registro
+# y tras invalidar (el cron sigue disponible).
+WARMUP_ENABLED_PARAM = 'headless_collections.warmup_enabled'
+
+# Segundos entre volcados de los contadores en memoria a headless.catalog.hit.
+HIT_FLUSH_INTERVAL = 60
+
+_hit_counters = {}
+_hit_last_flush = {}
+_hit_lock = threading.Lock()
+
+# Un solo precalentado en curso por proceso y base de datos, con llaves
+# (pid, dbname): un worker creado con fork no hereda el estado del padre.
+# Lo que se pide mientras tanto se acumula en _warmup_pending (None = todas
+# las colecciones) y se ejecuta en una única pasada al terminar la actual.
+# _warmup_started marca los procesos que ya sirvieron una petición; solo
+# ellos precalientan, así el proceso maestro de prefork nunca lanza hilos.
+_warmup_started = set()
+_warmup_running = set()
+_warmup_pending = {}
+_warmup_lock = threading.Lock()
+
+
+class HeadlessCatalog(models.AbstractModel):
+    """
+    Precalentado de la caché de payloads.
+
+    Calcula y guarda en la caché del proceso /api/collections_data y las
+    colecciones más pedidas, con las mismas llaves y ETags que usan los
+    endpoints, para que la primera petición tras un reinicio, una
+    actualización del módulo o una invalidación no pague el camino frío.
+
+    - En la primera petición de cada proceso se lanza en un hilo propio
+      (no al cargar el registro: en prefork eso ocurre en el maestro, cuya
+      caché no llega a los workers).
+    - Tras invalidar, las colecciones afectadas se recalientan en segundo
+      plano cuando la transacción hace commit, en los procesos que ya
+      sirven peticiones.
+    - El cron hace lo mismo bajo demanda. En modo multi-worker calienta las
+      cachés de PostgreSQL y del ORM; en modo con hilos comparte además la
+      caché de payloads con los hilos HTTP.
+    """
+    _inherit = 'headless.catalog'
+
+    # -------------------------------------------------------------------------
+    # CONTADORES DE PETICIONES
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _record_collection_hit(self, collection_key):
+        """
+        Cuenta una petición de ``collection_key`` en memoria y vuelca los
+        contadores a headless.catalog.hit cada HIT_FLUSH_INTERVAL segundos,
+        en un cursor aparte para no alargar la transacción de la petición.
+        """
+        dbname = self.env.cr.dbname
+        now = time.monotonic()
+
+        with _hit_lock:
+            _hit_counters.setdefault(dbname, collections.Counter())[collection_key] += 1
+            if now - _hit_last_flush.setdefault(dbname, now) < HIT_FLUSH_INTERVAL:
+                return
+            counts = _hit_counters.pop(dbname)
+            _hit_last_flush[dbname] = now
+
+        try:
+            with self.env.registry.cursor() as cr:
+                api.Environment(cr, SUPERUSER_ID, {})['headless.catalog.hit']._add_hits(counts)
+        except Exception:
+            _logger.warning("Could not store headless collection hits", exc_info=True)
+
+    @api.model
+    def _get_warmup_collection_keys(self):
+        limit = int(self.env['ir.config_parameter'].sudo().get_param(WARMUP_TOP_KEYS_PARAM, WARMUP_DEFAULT_TOP_KEYS))
+        return self.env['headless.catalog.hit']._get_top_keys(limit)
+
+    # -------------------------------------------------------------------------
+    # PRECALENTADO
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _warm_payload(self, cache_key, etag, build_payload):
+        if self._get_cached_payload(cache_key, etag) is None:
+            self._set_cached_payload(cache_key, etag, dump_payload(build_payload()))
+
+    @api.model
+    def _warm_payload_cache(self, collection_keys=None, affected_keys=None):
+        """
+        Precalienta /api/collections_data y el detalle completo de
+        ``collection_keys`` (por defecto, las más pedidas) en cada idioma
+        instalado. Con ``affected_keys`` solo se recalientan las que además
+        están en esa lista. Replica las llaves y ETags de los endpoints, así
+        que una entrada ya vigente no se recalcula.
+        """
+        started = time.perf_counter()
+        base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
+        if collection_keys is None:
+            collection_keys = self._get_warmup_collection_keys()
+        if affected_keys is not None:
+            collection_keys = [key for key in collection_keys if key in affected_keys]
+
+        for lang, _name in self.env['res.lang'].get_installed():
+            Catalog = self.sudo().with_context(lang=lang)
+
+            etag, _last_modified = Catalog._get_payload_version('collections_data', base_url)
+            Catalog._warm_payload(
+                Catalog._get_payload_cache_key('collections_data', None, base_url),
+                etag,
+                lambda: Catalog._build_collections_data(base_url),
+            )
+
+            categories = Catalog._search_shape('collection', [
+                ('collection_key', 'in', list(collection_keys)),
+                ('is_collection', '=', True),
+            ])
+            # Variante sin paginar, con todos los campos y sin tarifa
+            # (limit, after, fields, pricelist).
+            variant = (None, None, None, None)
+            for category in categories:
+                key = category.collection_key
+                etag, _last_modified = Catalog._get_payload_version(
+                    f'collection:{key}',
+                    base_url,
+                    category_ids=category.ids,
+                    extra=variant,
+                )
+                Catalog._warm_payload(
+                    Catalog._get_payload_cache_key('collection', key, base_url, extra=variant),
+                    etag,
+                    lambda: Catalog._build_collection_details(category, base_url),
+                )
+                # Libera los productos leídos antes de la siguiente colección.
+                Catalog.env.invalidate_all()
+
+        _logger.info(
+            "Headless payload cache warmed (%s collections) in %.2fs",
+            len(collection_keys), time.perf_counter() - started,
+        )
+
+    @api.model
+    def _cron_warm_payload_cache(self):
+        self._warm_payload_cache()
+
+    @api.model
+    def _warm_payload_cache_async(self, affected_keys=None):
+        """
+        Lanza _warm_payload_cache en un hilo con su propio cursor.
+
+        Como mucho hay un hilo por base de datos: si ya hay uno en curso, las
+        claves se suman a una sola pasada pendiente que el mismo hilo ejecuta
+        al terminar, así una ráfaga de escrituras no abre una conexión por
+        commit.
+        """
+        dbname = self.env.cr.dbname
+        state_key = (os.getpid(), dbname)
+
+        with _warmup_lock:
+            if state_key in _warmup_running:
+                if affected_keys is None or _warmup_pending.get(state_key, set()) is None:
+                    _warmup_pending[state_key] = None
+                else:
+                    _warmup_pending.setdefault(state_key, set()).update(affected_keys)
+                return
+            _warmup_running.add(state_key)
+
+        def warm(keys):
+            while True:
+                try:
+                    # Espera a que el registro termine de cargar si aún lo hace.
+                    registry = Registry(dbname)
+                    with registry.cursor() as cr:
+                        api.Environment(cr, SUPERUSER_ID, {})['headless.catalog']._warm_payload_cache(
+                            affected_keys=keys,
+                        )
+                except Exception:
+                    _logger.warning("Headless payload cache warm-up failed", exc_info=True)
+
+                with _warmup_lock:
+                    if state_key not in _warmup_pending:
+                        _warmup_running.discard(state_key)
+                        return
+                    keys = _warmup_pending.pop(state_key)
+
+        threading.Thread(
+            target=warm,
+            args=(None if affected_keys is None else set(affected_keys),),
+            name=f'headless-warmup-{dbname}',
+            daemon=True,
+        ).start()
+
+    @api.model
+    def _is_warmup_enabled(self):
+        if config['test_enable'] or config['stop_after_init']:
+            return False
+        return str2bool(
+            self.env['ir.config_parameter'].sudo().get_param(WARMUP_ENABLED_PARAM, 'True'),
+            default=True,
+        )
+
+    # -------------------------------------------------------------------------
+    # ENGANCHES
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _ensure_process_warmup(self):
+        """
+        Lanza el precalentado la primera vez que el proceso sirve una
+        petición de la API (ver CollectionsApiController._cached_json_response).
+        """
+        state_key = (os.getpid(), self.env.cr.dbname)
+        if state_key in _warmup_started:
+            return
+        with _warmup_lock:
+            first = state_key not in _warmup_started
+            _warmup_started.add(state_key)
+        if first and self._is_warmup_enabled():
+            self._warm_payload_cache_async()
+
+    @api.model
+    def _invalidate_payload_cache(self, collection_keys=None):
+        super()._invalidate_payload_cache(collection_keys)
+        # Solo recalientan los procesos que sirven peticiones (no el maestro
+        # de prefork ni un proceso de actualización de módulos).
+        if (os.getpid(), self.env.cr.dbname) not in _warmup_started or not self._is_warmup_enabled():
+            return
+
+        # Una sola pasada por transacción con todas las claves afectadas;
+        # solo se recalientan las que están entre las más pedidas.
+        postcommit = self.env.cr.postcommit
+        pending = postcommit.data.get('headless_warmup')
+        if pending is None:
+            pending = postcommit.data['headless_warmup'] = {'all': False, 'keys': set()}
+            postcommit.add(lambda: self._warm_payload_cache_async(
+                None if pending['all'] else set(pending['keys']),
+            ))
+
+        if collection_keys is None:
+            pending['all'] = True
+        else:
+            pending['keys'].update(collection_keys)
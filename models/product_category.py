@@ -1,4 +1,5 @@
 from odoo import models, fields, api
+from odoo.tools.sql import create_index
 
 class ProductCategory(models.Model):
     _inherit = 'product.category'
@@ -33,6 +34,37 @@ class ProductCategory(models.Model):
         translate=True
     )
 
+    # --- Invalidación de Caché Headless ---
+    @api.model_create_multi
+    def create(self, vals_list):
+        categories = super().create(vals_list)
+        self.env['headless.catalog']._invalidate_payload_cache_for_categories(categories)
+        return categories
+
+    def write(self, vals):
+        Catalog = self.env['headless.catalog']
+        collection_keys = Catalog._get_affected_collection_keys(self)
+        res = super().write(vals)
+        collection_keys |= Catalog._get_affected_collection_keys(self)
+        Catalog._invalidate_payload_cache(collection_keys)
+        return res
+
+    def unlink(self):
+        # parent_id ondelete='cascade': las subcategorías se borran en SQL sin
+        # pasar por unlink(), así que se registran aquí junto con las padres.
+        deleted = self.search([('id', 'child_of', self.ids)])
+        collection_keys = self.env['headless.catalog']._get_affected_collection_keys(deleted)
+        self.env['headless.catalog.tombstone']._record_categories(deleted)
+        res = super().unlink()
+        self.env['headless.catalog']._invalidate_payload_cache(collection_keys)
+        return res
+
+    def update_field_translations(self, field_name, translations, *args, **kwargs):
+        # Las traducciones no mueven write_date: se invalida por generación.
+        res = super().update_field_translations(field_name, translations, *args, **kwargs)
+        self.env['headless.catalog']._bump_cache_generation()
+        return res
+
     # --- Generación Automática de Slug ---
     @api.onchange('name')
     def _onchange_name_generate_slug(self):
@@ -41,4 +73,23 @@ class ProductCategory(models.Model):
 
     _sql_constraints = [
         ('collection_key_unique', 'unique(collection_key)', 'La Key (Slug) debe ser única.')
-    ]
\ No newline at end of file
+    ]
+
+    def init(self):
+        super().init()
+        # Índices parciales sobre las colecciones públicas: búsqueda por key
+        # y listado ordenado por complete_name sin recorrer product_category.
+        create_index(
+            self.env.cr,
+            'product_category_headless_collection_key_idx',
+            self._table,
+            ['collection_key'],
+            where='is_collection',
+        )
+        create_index(
+            self.env.cr,
+            'product_category_headless_collection_name_idx',
+            self._table,
+            ['complete_name'],
+            where='is_collection',
+        )
\ No newline at end of file
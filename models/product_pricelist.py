@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models
+
+
+class ProductPricelist(models.Model):
+    _inherit = 'product.pricelist'
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env['headless.catalog']._bump_pricelist_generation()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env['headless.catalog']._bump_pricelist_generation()
+        return res
+
+
+class ProductPricelistItem(models.Model):
+    _inherit = 'product.pricelist.item'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        items = super().create(vals_list)
+        self.env['headless.catalog']._bump_pricelist_generation()
+        return items
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env['headless.catalog']._bump_pricelist_generation()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env['headless.catalog']._bump_pricelist_generation()
+        return res
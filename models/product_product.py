@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+
+
+class ProductProduct(models.Model):
+    _inherit = 'product.product'
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'standard_price' in vals:
+            self.env['headless.catalog']._bump_cost_generation()
+        return res
@@ -1,9 +1,73 @@
 # -*- coding: utf-8 -*-
 
+import base64
+import binascii
+import functools
+import json
+import logging
 import mimetypes
 import re
+import struct
+
+import psycopg2
 
 from odoo import models, fields, api
+from odoo.tools import split_every
+from odoo.tools.sql import create_index
+
+from ..tools import mp4
+from .headless_catalog_search import SEARCH_TEXT_FIELDS
+
+_logger = logging.getLogger(__name__)
+
+
+# Campos multimedia headless cuya presencia/metadatos se guardan en
+# headless_media_meta para no leer binarios al construir payloads.
+HEADLESS_MEDIA_FIELDS = (
+    'headless_image_1',
+    'headless_image_2',
+    'headless_image_3',
+    'headless_image_4',
+    'headless_video_file',
+    'headless_video_poster',
+)
+
+# Columnas de product.template que necesita get_headless_video_payloads.
+HEADLESS_VIDEO_PAYLOAD_FIELDS = (
+    'headless_media_meta',
+    'headless_video_filename',
+    'headless_video_url_manual',
+    'headless_video_duration',
+    'headless_video_width',
+    'headless_video_height',
+    'headless_video_codec',
+)
+
+# Caracteres del checksum usados como versión (?v=) en la URL del video.
+HEADLESS_VIDEO_VERSION_LENGTH = 16
+
+# Metadatos que se extraen del video al subirlo (ver tools/mp4.py).
+HEADLESS_VIDEO_META_FIELDS = {
+    'headless_video_duration': 'duration',
+    'headless_video_width': 'width',
+    'headless_video_height': 'height',
+    'headless_video_codec': 'codec',
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def headless_safe_video_filename(filename):
+    filename = filename or 'product-video.mp4'
+    filename = filename.strip().replace(' ', '_')
+    filename = re.sub(r'[^A-Za-z0-9._-]', '', filename)
+
+    return filename or 'product-video.mp4'
+
+
+@functools.lru_cache(maxsize=256)
+def headless_video_mimetype(filename):
+    mimetype, _encoding = mimetypes.guess_type(filename or 'product-video.mp4')
+    return mimetype or 'video/mp4'
 
 
 class ProductTemplate(models.Model):
@@ -78,6 +142,36 @@ class ProductTemplate(models.Model):
         help="Imagen de portada para mostrar antes de reproducir el video."
     )
 
+    headless_video_duration = fields.Float(
+        string="Duración del Video (s)",
+        readonly=True,
+        digits=(16, 3),
+    )
+
+    headless_video_width = fields.Integer(
+        string="Ancho del Video (px)",
+        readonly=True,
+    )
+
+    headless_video_height = fields.Integer(
+        string="Alto del Video (px)",
+        readonly=True,
+    )
+
+    headless_video_codec = fields.Char(
+        string="Códec del Video",
+        readonly=True,
+        help="Cadena RFC 6381 (p. ej. avc1.64001F) cuando se puede determinar."
+    )
+
+    headless_media_meta = fields.Json(
+        string="Metadatos Multimedia",
+        readonly=True,
+        copy=False,
+        help="Presencia, tamaño, checksum y mimetype de cada campo multimedia "
+             "headless. Se sincroniza al escribir los archivos."
+    )
+
     # -------------------------------------------------------------------------
     # DIMENSIONES ESPECÍFICAS
     # -------------------------------------------------------------------------
@@ -108,6 +202,19 @@ class ProductTemplate(models.Model):
         string="Meta Descripción"
     )
 
+    # -------------------------------------------------------------------------
+    # DISPONIBILIDAD
+    # -------------------------------------------------------------------------
+
+    headless_is_sold = fields.Boolean(
+        string="Vendido (Web)",
+        readonly=True,
+        copy=False,
+        index=True,
+        help="Se actualiza automáticamente cuando una orden de venta con este "
+             "producto se confirma, se cancela o se modifican sus líneas."
+    )
+
     # -------------------------------------------------------------------------
     # HELPERS VIDEO
     # -------------------------------------------------------------------------
@@ -128,22 +235,34 @@ class ProductTemplate(models.Model):
 
         return url
 
-    def _get_headless_safe_video_filename(self):
+    def _get_headless_media_meta(self, field_name):
+        """
+        Metadatos guardados de un campo multimedia:
+            {'has_file': bool, 'size': int, 'checksum': str, 'mimetype': str}
+        """
         self.ensure_one()
+        return (self.headless_media_meta or {}).get(field_name) or {}
 
-        filename = self.headless_video_filename or 'product-video.mp4'
-        filename = filename.strip().replace(' ', '_')
-        filename = re.sub(r'[^A-Za-z0-9._-]', '', filename)
+    def _headless_has_media(self, field_name):
+        self.ensure_one()
+        return bool(self._get_headless_media_meta(field_name).get('has_file'))
 
-        return filename or 'product-video.mp4'
+    def _get_headless_safe_video_filename(self):
+        self.ensure_one()
+        return headless_safe_video_filename(self.headless_video_filename)
 
     def _get_headless_video_mimetype(self):
         self.ensure_one()
+        return headless_video_mimetype(self.headless_video_filename)
 
-        filename = self.headless_video_filename or 'product-video.mp4'
-        mimetype, _encoding = mimetypes.guess_type(filename)
-
-        return mimetype or 'video/mp4'
+    @api.model
+    def _get_headless_video_version_query(self, video_meta):
+        """
+        Sufijo ``?v=<checksum>`` para la URL del video. Cambia con cada
+        archivo nuevo, así que la respuesta puede cachearse como inmutable.
+        """
+        checksum = (video_meta or {}).get('checksum')
+        return f"?v={checksum[:HEADLESS_VIDEO_VERSION_LENGTH]}" if checksum else ''
 
     def get_headless_video_src(self, base_url=None):
         """
@@ -155,9 +274,10 @@ class ProductTemplate(models.Model):
         """
         self.ensure_one()
 
-        if self.headless_video_file:
+        if self._headless_has_media('headless_video_file'):
             safe_filename = self._get_headless_safe_video_filename()
             relative_url = f"/api/collections/product-video/{self.id}/{safe_filename}"
+            relative_url += self._get_headless_video_version_query(self._get_headless_media_meta('headless_video_file'))
             return self._headless_absolute_url(relative_url, base_url=base_url)
 
         if self.headless_video_url_manual:
@@ -171,7 +291,7 @@ class ProductTemplate(models.Model):
     def get_headless_video_poster_src(self, base_url=None):
         self.ensure_one()
 
-        if self.headless_video_poster:
+        if self._headless_has_media('headless_video_poster'):
             relative_url = f"/web/image/product.template/{self.id}/headless_video_poster"
             return self._headless_absolute_url(relative_url, base_url=base_url)
 
@@ -184,36 +304,300 @@ class ProductTemplate(models.Model):
         Ejemplo:
         {
             "has_video": true,
-            "url": "https://erp.../api/collections/product-video/10/video.mp4",
+            "url": "https://erp.../api/collections/product-video/10/video.mp4?v=3f2a...",
             "poster": "https://erp.../web/image/...",
             "source": "uploaded",
             "filename": "video.mp4",
-            "mimetype": "video/mp4"
+            "mimetype": "video/mp4",
+            "duration": 12.5,
+            "width": 1920,
+            "height": 1080,
+            "codec": "avc1.64001F"
         }
         """
         self.ensure_one()
+        return self.get_headless_video_payloads(
+            base_url=base_url,
+            fallback_posters={self.id: fallback_poster},
+        )[self.id]
 
-        video_url = self.get_headless_video_src(base_url=base_url)
-        has_video = bool(video_url)
-
-        source = None
-        if self.headless_video_file:
-            source = 'uploaded'
-        elif self.headless_video_url_manual:
-            source = 'external'
-
-        poster = ''
-        if has_video:
-            poster = self.get_headless_video_poster_src(base_url=base_url) or fallback_poster or ''
-
-        return {
-            'has_video': has_video,
-            'url': video_url,
-            'poster': poster,
-            'source': source,
-            'filename': self.headless_video_filename or '',
-            'mimetype': self._get_headless_video_mimetype() if self.headless_video_file else '',
-        }
+    def get_headless_video_payloads(self, base_url=None, fallback_posters=None):
+        """
+        Variante por lote de get_headless_video_payload.
+
+        Lee los campos de video de todo el recordset en una sola consulta y
+        devuelve {product_template_id: payload}. ``fallback_posters`` es un
+        diccionario opcional {product_template_id: url}.
+        """
+        fallback_posters = fallback_posters or {}
+        base_url = (base_url or '').rstrip('/')
+
+        self.fetch(list(HEADLESS_VIDEO_PAYLOAD_FIELDS))
+
+        payloads = {}
+
+        for template in self:
+            media_meta = template.headless_media_meta or {}
+            video_meta = media_meta.get('headless_video_file') or {}
+            has_uploaded_video = bool(video_meta.get('has_file'))
+            has_poster = bool((media_meta.get('headless_video_poster') or {}).get('has_file'))
+            filename = template.headless_video_filename
+
+            video_url = ''
+            source = None
+            if has_uploaded_video:
+                safe_filename = headless_safe_video_filename(filename)
+                video_url = f"{base_url}/api/collections/product-video/{template.id}/{safe_filename}"
+                video_url += self._get_headless_video_version_query(video_meta)
+                source = 'uploaded'
+            elif template.headless_video_url_manual:
+                video_url = template._headless_absolute_url(template.headless_video_url_manual, base_url=base_url)
+                source = 'external'
+
+            poster = ''
+            if video_url:
+                if has_poster:
+                    poster = f"{base_url}/web/image/product.template/{template.id}/headless_video_poster"
+                else:
+                    poster = fallback_posters.get(template.id) or ''
+
+            payloads[template.id] = {
+                'has_video': bool(video_url),
+                'url': video_url,
+                'poster': poster,
+                'source': source,
+                'filename': filename or '',
+                'mimetype': headless_video_mimetype(filename) if has_uploaded_video else '',
+                'duration': template.headless_video_duration if has_uploaded_video else 0.0,
+                'width': template.headless_video_width if has_uploaded_video else 0,
+                'height': template.headless_video_height if has_uploaded_video else 0,
+                'codec': (template.headless_video_codec or '') if has_uploaded_video else '',
+            }
+
+        return payloads
+
+    # -------------------------------------------------------------------------
+    # INVALIDACIÓN DE CACHÉ HEADLESS
+    # -------------------------------------------------------------------------
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        vals_list = [self._headless_prepare_video_vals(vals) for vals in vals_list]
+        templates = super().create(vals_list)
+        if any(field_name in vals for vals in vals_list for field_name in HEADLESS_MEDIA_FIELDS):
+            templates._headless_sync_media_meta()
+        self.env['headless.catalog']._invalidate_payload_cache_for_categories(templates.categ_id)
+        self.env['headless.catalog.outbox']._enqueue(product_slugs=templates._get_headless_slugs())
+        return templates
+
+    def write(self, vals):
+        vals = self._headless_prepare_video_vals(vals)
+        categories = self.categ_id
+        slugs = self._get_headless_slugs() if 'headless_slug' in vals else set()
+        res = super().write(vals)
+        if any(field_name in vals for field_name in HEADLESS_MEDIA_FIELDS):
+            self._headless_sync_media_meta()
+        if 'categ_id' in vals:
+            categories |= self.categ_id
+        self.env['headless.catalog']._invalidate_payload_cache_for_categories(categories)
+        self.env['headless.catalog.outbox']._enqueue(product_slugs=slugs | self._get_headless_slugs())
+        return res
+
+    def unlink(self):
+        categories = self.categ_id
+        slugs = self._get_headless_slugs()
+        self.env['headless.catalog.tombstone']._record_templates(self)
+        res = super().unlink()
+        self.env['headless.catalog']._invalidate_payload_cache_for_categories(categories)
+        self.env['headless.catalog.outbox']._enqueue(product_slugs=slugs)
+        return res
+
+    def _get_headless_slugs(self):
+        """Slugs públicos del recordset (el id si no hay headless_slug)."""
+        return {template.headless_slug or str(template.id) for template in self}
+
+    def update_field_translations(self, field_name, translations, *args, **kwargs):
+        # Las traducciones no mueven write_date: se invalida por generación.
+        res = super().update_field_translations(field_name, translations, *args, **kwargs)
+        self.env['headless.catalog']._bump_cache_generation()
+        return res
+
+    # -------------------------------------------------------------------------
+    # METADATOS MULTIMEDIA
+    # -------------------------------------------------------------------------
+
+    def _headless_sync_media_meta(self):
+        """
+        Recalcula headless_media_meta desde los ir.attachment de los campos
+        multimedia, sin leer su contenido.
+
+        Agrupa las plantillas por valor y escribe cada grupo una vez con el
+        write() base: la invalidación de caché y la revalidación las hace
+        quien llama (create/write, o el backfill por lote).
+        """
+        templates = self.exists()
+        if not templates:
+            return
+
+        attachments = self.env['ir.attachment'].sudo().search_read(
+            [
+                ('res_model', '=', self._name),
+                ('res_id', 'in', templates.ids),
+                ('res_field', 'in', list(HEADLESS_MEDIA_FIELDS)),
+            ],
+            ['res_id', 'res_field', 'file_size', 'checksum', 'mimetype'],
+        )
+
+        meta_by_template = {template.id: {} for template in templates}
+        for attachment in attachments:
+            meta_by_template[attachment['res_id']][attachment['res_field']] = {
+                'has_file': True,
+                'size': attachment['file_size'],
+                'checksum': attachment['checksum'],
+                'mimetype': attachment['mimetype'],
+            }
+
+        groups = {}
+        for template in templates:
+            media_meta = meta_by_template[template.id] or False
+            if template.headless_media_meta != media_meta:
+                key = json.dumps(media_meta, sort_keys=True)
+                groups.setdefault(key, (media_meta, []))[1].append(template.id)
+
+        for media_meta, template_ids in groups.values():
+            super(ProductTemplate, self.browse(template_ids)).write({'headless_media_meta': media_meta})
+
+    @api.model
+    def _headless_sync_media_meta_all(self, batch_size=1000):
+        """
+        Backfill de headless_media_meta para las plantillas con archivos
+        multimedia headless.
+        """
+        attachments = self.env['ir.attachment'].sudo().search_read(
+            [
+                ('res_model', '=', self._name),
+                ('res_field', 'in', list(HEADLESS_MEDIA_FIELDS)),
+            ],
+            ['res_id'],
+        )
+        template_ids = sorted({attachment['res_id'] for attachment in attachments})
+
+        Catalog = self.env['headless.catalog']
+        for batch in split_every(batch_size, template_ids, self.with_context(active_test=False).browse):
+            batch._headless_sync_media_meta()
+            Catalog._invalidate_payload_cache_for_categories(batch.categ_id)
+            batch.invalidate_recordset()
+
+    # -------------------------------------------------------------------------
+    # PROCESADO DE VIDEO
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _headless_process_video(self, data):
+        """
+        Reescribe un MP4/MOV con ``moov`` al inicio (fast-start) y extrae sus
+        metadatos. ``data`` son los bytes del archivo.
+
+        Devuelve ``(data, meta)``; ``data`` es None si no hubo que
+        reescribir y ``meta`` es None si el formato no es MP4/MOV (WebM...).
+        """
+        try:
+            relocated = mp4.faststart(data)
+            meta = mp4.probe(relocated or data)
+        except (mp4.MP4Error, struct.error) as e:
+            _logger.info("Headless video not processed as MP4: %s", e)
+            return None, None
+        return relocated, meta
+
+    @api.model
+    def _headless_prepare_video_vals(self, vals):
+        """Aplica _headless_process_video al video incluido en ``vals``."""
+        if 'headless_video_file' not in vals:
+            return vals
+
+        vals = dict(vals, **{field_name: False for field_name in HEADLESS_VIDEO_META_FIELDS})
+        if not vals['headless_video_file']:
+            return vals
+
+        try:
+            data = base64.b64decode(vals['headless_video_file'], validate=True)
+        except (binascii.Error, ValueError):
+            return vals
+
+        relocated, meta = self._headless_process_video(data)
+        if relocated:
+            vals['headless_video_file'] = base64.b64encode(relocated)
+        if meta:
+            for field_name, key in HEADLESS_VIDEO_META_FIELDS.items():
+                vals[field_name] = meta[key]
+        return vals
+
+    @api.model
+    def _headless_process_video_all(self):
+        """
+        Aplica fast-start y extrae metadatos de los videos ya subidos.
+        Lee cada archivo por separado para no cargar todos en memoria.
+        """
+        attachments = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'headless_video_file'),
+        ])
+
+        for attachment in attachments:
+            template = self.with_context(active_test=False).browse(attachment.res_id).exists()
+            if not template:
+                continue
+
+            relocated, meta = self._headless_process_video(attachment.raw)
+            if relocated:
+                # write() vuelve a extraer los metadatos del archivo nuevo.
+                template.write({'headless_video_file': base64.b64encode(relocated)})
+            elif meta:
+                template.write({
+                    field_name: meta[key]
+                    for field_name, key in HEADLESS_VIDEO_META_FIELDS.items()
+                })
+            attachment.invalidate_recordset(['raw'])
+
+    # -------------------------------------------------------------------------
+    # ESTADO DE VENTA
+    # -------------------------------------------------------------------------
+
+    def _headless_recompute_sold(self):
+        """
+        Recalcula headless_is_sold a partir de las órdenes de venta.
+
+        Solo escribe los registros cuyo estado cambió, agrupados en dos
+        escrituras (vendidos / disponibles).
+        """
+        templates = self.exists()
+        if not templates:
+            return
+
+        sold_map = self.env['headless.catalog']._compute_sold_map_from_orders(templates.ids)
+
+        to_sold = templates.filtered(lambda t: sold_map[t.id] and not t.headless_is_sold)
+        to_available = templates.filtered(lambda t: not sold_map[t.id] and t.headless_is_sold)
+
+        if to_sold:
+            to_sold.write({'headless_is_sold': True})
+        if to_available:
+            to_available.write({'headless_is_sold': False})
+
+    @api.model
+    def _headless_recompute_sold_all(self, batch_size=1000):
+        """
+        Recalcula el estado de venta de todo el catálogo (backfill).
+
+        Uso desde ``odoo-bin shell``:
+            env['product.template']._headless_recompute_sold_all()
+            env.cr.commit()
+        """
+        template_ids = self.with_context(active_test=False).search([]).ids
+
+        for batch in split_every(batch_size, template_ids, self.with_context(active_test=False).browse):
+            batch._headless_recompute_sold()
+            batch.invalidate_recordset()
 
     # -------------------------------------------------------------------------
     # GENERACIÓN AUTOMÁTICA DE SLUG
@@ -228,4 +612,55 @@ class ProductTemplate(models.Model):
 
     _sql_constraints = [
         ('headless_slug_unique', 'unique(headless_slug)', 'El Slug del producto debe ser único.')
-    ]
\ No newline at end of file
+    ]
+
+    @api.model
+    def _headless_has_trigram(self):
+        return self.env.registry.has_trigram
+
+    def init(self):
+        super().init()
+        # La restricción única ya indexa headless_slug. Este índice parcial
+        # cubre la expansión de colecciones (categ_id child_of + sale_ok).
+        create_index(
+            self.env.cr,
+            'product_template_headless_sellable_categ_idx',
+            self._table,
+            ['categ_id'],
+            where='sale_ok AND active',
+        )
+        # Paginación por keyset del feed de cambios (/api/collections/changes).
+        create_index(
+            self.env.cr,
+            'product_template_headless_write_date_idx',
+            self._table,
+            ['write_date', 'id'],
+        )
+        self._headless_init_search_indexes()
+
+    def _headless_init_search_indexes(self):
+        """
+        Índices GIN de trigramas para /api/collections/search. ``name`` ya
+        tiene índice trigram en product. Si pg_trgm no está disponible ni
+        se puede crear (sin permisos), la búsqueda sigue funcionando con
+        ILIKE secuencial y orden por (sequence, id).
+        """
+        cr = self.env.cr
+        cr.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        if not cr.fetchone():
+            try:
+                with cr.savepoint(flush=False):
+                    cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            except psycopg2.Error as e:
+                _logger.warning("pg_trgm is not available, headless search will not use trigram indexes: %s", e)
+                return
+            self.env.registry.has_trigram = True
+
+        for field_name in SEARCH_TEXT_FIELDS:
+            create_index(
+                cr,
+                f'{self._table}_{field_name}_trgm_idx',
+                self._table,
+                [f'{field_name} gin_trgm_ops'],
+                method='gin',
+            )
\ No newline at end of file
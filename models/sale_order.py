@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+
+from .headless_catalog import SOLD_ORDER_STATES
+
+
+class SaleOrder(models.Model):
+    _inherit = 'sale.order'
+
+    def _get_headless_templates(self):
+        return self.order_line.product_id.product_tmpl_id
+
+    def write(self, vals):
+        """
+        Mantiene product.template.headless_is_sold cuando una orden entra o
+        sale de los estados de venta (confirmar, cancelar, desbloquear,
+        volver a cotización).
+        """
+        if 'state' not in vals:
+            return super().write(vals)
+
+        becomes_sold = vals['state'] in SOLD_ORDER_STATES
+        changed_orders = self.filtered(lambda order: (order.state in SOLD_ORDER_STATES) != becomes_sold)
+
+        res = super().write(vals)
+
+        if changed_orders:
+            changed_orders._get_headless_templates()._headless_recompute_sold()
+
+        return res
+
+
+class SaleOrderLine(models.Model):
+    _inherit = 'sale.order.line'
+
+    def _get_headless_sold_templates(self):
+        """Plantillas de las líneas que pertenecen a órdenes confirmadas."""
+        lines = self.filtered(lambda line: line.product_id and line.order_id.state in SOLD_ORDER_STATES)
+        return lines.product_id.product_tmpl_id
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        lines._get_headless_sold_templates()._headless_recompute_sold()
+        return lines
+
+    def write(self, vals):
+        if 'product_id' not in vals and 'order_id' not in vals:
+            return super().write(vals)
+
+        templates = self._get_headless_sold_templates()
+        res = super().write(vals)
+        (templates | self._get_headless_sold_templates())._headless_recompute_sold()
+        return res
+
+    def unlink(self):
+        templates = self._get_headless_sold_templates()
+        res = super().unlink()
+        templates._headless_recompute_sold()
+        return res
@@ -0,0 +1,7 @@
+from . import test_mp4
+from . import test_performance
+from . import test_product_lookup
+from . import test_revalidation
+from . import test_serialization
+from . import test_stock_availability
+from . import test_video_ranges
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+import odoo.sql_db
+from odoo import Command
+from odoo.tests import HttpCase
+
+_logger = logging.getLogger(__name__)
+
+
+# PNG 1x1 transparente.
+TINY_PNG = base64.b64encode(base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+))
+
+# Cabecera ftyp mínima de un MP4 seguida de relleno, suficiente para probar Range.
+TINY_MP4 = base64.b64encode(
+    b'\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isomiso2' + b'\x00' * 4096
+)
+
+
+class HeadlessCatalogCase(HttpCase):
+    """
+    Base de las pruebas de rendimiento: genera un catálogo sintético y mide
+    consultas SQL y tiempo de cada llamada.
+
+    Variables de entorno:
+        - HEADLESS_PERF_SCALE: multiplica el tamaño del catálogo (1.0 por
+          defecto; 0.1 para una corrida rápida).
+        - HEADLESS_PERF_TIME_FACTOR: multiplica los presupuestos de tiempo
+          (máquinas lentas / CI).
+        - HEADLESS_PERF_REPORT: ruta de un archivo JSON donde se guardan las
+          mediciones, para comparar entre versiones.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.scale = float(os.environ.get('HEADLESS_PERF_SCALE', '1.0'))
+        cls.time_factor = float(os.environ.get('HEADLESS_PERF_TIME_FACTOR', '1.0'))
+        cls.perf_results = []
+
+        started = time.perf_counter()
+        cls._generate_catalog()
+        _logger.info("Headless synthetic catalog generated in %.2fs", time.perf_counter() - started)
+
+    @classmethod
+    def tearDownClass(cls):
+        report_path = os.environ.get('HEADLESS_PERF_REPORT')
+        if report_path and cls.perf_results:
+            with open(report_path, 'w', encoding='utf-8') as report_file:
+                json.dump({
+                    'scale': cls.scale,
+                    'results': cls.perf_results,
+                }, report_file, indent=2)
+        super().tearDownClass()
+
+    # -------------------------------------------------------------------------
+    # CATÁLOGO SINTÉTICO
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def _scaled(cls, count):
+        return max(int(count * cls.scale), 1)
+
+    @classmethod
+    def _generate_catalog(cls):
+        """
+        Colecciones anidadas en tres niveles (raíz > sección > serie),
+        miles de plantillas repartidas en las series, imágenes y videos
+        adjuntos, y decenas de miles de líneas de venta en varios estados.
+        """
+        env = cls.env(context=dict(cls.env.context, tracking_disable=True, mail_notrack=True))
+        Category = env['product.category']
+
+        cls.root_collections = Category.create([
+            {
+                'name': f'Perf Root {index}',
+                'is_collection': True,
+                'collection_key': f'perf-root-{index}',
+                'collection_description': 'Colección raíz sintética',
+            }
+            for index in range(20)
+        ])
+        cls.section_collections = Category.create([
+            {
+                'name': f'{root.name} / Section {index}',
+                'parent_id': root.id,
+                'is_collection': True,
+                'collection_key': f'{root.collection_key}-section-{index}',
+            }
+            for root in cls.root_collections
+            for index in range(5)
+        ])
+        cls.leaf_collections = Category.create([
+            {
+                'name': f'{section.name} / Series {index}',
+                'parent_id': section.id,
+                'is_collection': True,
+                'collection_key': f'{section.collection_key}-series-{index}',
+            }
+            for section in cls.section_collections
+            for index in range(3)
+        ])
+
+        long_description = '<p>' + 'Pieza única de colección. ' * 80 + '</p>'
+        template_count = cls._scaled(3000)
+        leaves = cls.leaf_collections
+
+        template_vals = []
+        for index in range(template_count):
+            vals = {
+                'name': f'Perf Product {index:05d}',
+                'categ_id': leaves[index % len(leaves)].id,
+                'sale_ok': True,
+                'list_price': 100 + index % 900,
+                'headless_slug': f'perf-product-{index:05d}',
+                'headless_short_description': f'Producto sintético {index}',
+                'headless_long_description': long_description,
+                'headless_material': ('Bronce', 'Acero', 'Madera', 'Vidrio')[index % 4],
+                'dim_length': 10 + index % 90,
+                'dim_width': 10 + index % 50,
+                'dim_height': 10 + index % 120,
+            }
+            if index % 10 == 0:
+                vals['headless_image_1'] = TINY_PNG
+            if index % 25 == 0:
+                vals['headless_video_file'] = TINY_MP4
+                vals['headless_video_filename'] = 'clip.mp4'
+            template_vals.append(vals)
+
+        ProductTemplate = env['product.template']
+        cls.templates = ProductTemplate.browse()
+        for start in range(0, template_count, 500):
+            cls.templates |= ProductTemplate.create(template_vals[start:start + 500])
+
+        cls.video_template = cls.templates[0]
+        cls.big_collection = cls.root_collections[0]
+
+        partner = env['res.partner'].create({'name': 'Perf Customer'})
+        variants = cls.templates.product_variant_id
+        line_count = cls._scaled(20000)
+        lines_per_order = 10
+
+        SaleOrder = env['sale.order']
+        orders = SaleOrder.browse()
+        order_vals = []
+        for order_index in range(line_count // lines_per_order):
+            order_vals.append({
+                'partner_id': partner.id,
+                'order_line': [
+                    Command.create({
+                        'product_id': variants[(order_index * 7 + line_index * 13) % len(variants)].id,
+                        'product_uom_qty': 1,
+                    })
+                    for line_index in range(lines_per_order)
+                ],
+            })
+            if len(order_vals) == 200:
+                orders |= SaleOrder.create(order_vals)
+                order_vals = []
+        if order_vals:
+            orders |= SaleOrder.create(order_vals)
+
+        # Escritura directa del estado: ejercita el mantenimiento del flag
+        # vendido sin generar albaranes.
+        orders.filtered(lambda order: order.id % 4 == 0).write({'state': 'sale'})
+        orders.filtered(lambda order: order.id % 4 == 1).write({'state': 'cancel'})
+
+        env.flush_all()
+
+    # -------------------------------------------------------------------------
+    # MEDICIÓN
+    # -------------------------------------------------------------------------
+
+    @contextmanager
+    def assertBudget(self, label, queries, seconds):
+        """
+        Mide el bloque y falla si supera ``queries`` consultas SQL o
+        ``seconds`` segundos (multiplicado por HEADLESS_PERF_TIME_FACTOR).
+
+        Cuenta con odoo.sql_db.sql_counter para incluir las consultas del
+        hilo del servidor HTTP de la prueba.
+        """
+        queries_before = odoo.sql_db.sql_counter
+        started = time.perf_counter()
+
+        yield
+
+        elapsed = time.perf_counter() - started
+        query_count = odoo.sql_db.sql_counter - queries_before
+
+        self.perf_results.append({
+            'label': label,
+            'queries': query_count,
+            'query_budget': queries,
+            'seconds': round(elapsed, 4),
+            'time_budget': seconds * self.time_factor,
+        })
+        _logger.info("HEADLESS_PERF %s queries=%s time=%.4fs", label, query_count, elapsed)
+
+        self.assertLessEqual(
+            query_count, queries,
+            f"{label}: {query_count} queries exceed the budget of {queries}",
+        )
+        self.assertLessEqual(
+            elapsed, seconds * self.time_factor,
+            f"{label}: {elapsed:.3f}s exceeds the budget of {seconds * self.time_factor:.3f}s",
+        )
+
+    @contextmanager
+    def countQueries(self):
+        """Cuenta las consultas SQL del bloque (incluido el hilo HTTP) en ``counter['count']``."""
+        counter = {'count': 0}
+        queries_before = odoo.sql_db.sql_counter
+        yield counter
+        counter['count'] = odoo.sql_db.sql_counter - queries_before
+
+    def assertServedFromCache(self, url, etag, extra_queries=2):
+        """
+        Un acierto de la caché de payloads no debe consultar más que una
+        revalidación 304 de la misma URL: ambos pagan el despacho HTTP y el
+        token de versión, y nada más. ``extra_queries`` cubre el volcado
+        periódico de los contadores de peticiones.
+        """
+        with self.countQueries() as revalidation:
+            self.get_json(url, headers={'If-None-Match': etag}, expected_status=304)
+
+        with self.countQueries() as cached:
+            response = self.get_json(url)
+
+        self.assertLessEqual(
+            cached['count'] - revalidation['count'], extra_queries,
+            f"{url}: cache hit ran {cached['count']} queries, a 304 ran {revalidation['count']}",
+        )
+        return response
+
+    def clear_payload_cache(self):
+        self.env['headless.catalog']._invalidate_payload_cache()
+
+    def get_json(self, url, headers=None, expected_status=200):
+        response = self.url_open(url, headers=headers)
+        self.assertEqual(response.status_code, expected_status, f"{url}: {response.text[:200]}")
+        return response
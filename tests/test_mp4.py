@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import struct
+
+from odoo.tests import BaseCase, tagged
+
+from ..tools import mp4
+
+
+def atom(atom_type, *children):
+    body = b''.join(children)
+    return struct.pack('>I4s', 8 + len(body), atom_type) + body
+
+
+def full_atom(atom_type, body, version=0):
+    return atom(atom_type, bytes([version, 0, 0, 0]), body)
+
+
+def chunk_offset_table(table_type, offsets):
+    fmt = '>I' if table_type == b'stco' else '>Q'
+    return full_atom(table_type, struct.pack('>I', len(offsets)) + b''.join(struct.pack(fmt, value) for value in offsets))
+
+
+def video_trak(table):
+    avcc = atom(b'avcC', bytes([1, 0x64, 0x00, 0x1F, 0xFF]))
+    stsd = full_atom(b'stsd', struct.pack('>I', 1) + atom(b'avc1', b'\x00' * mp4.VISUAL_SAMPLE_ENTRY_SIZE, avcc))
+    return atom(
+        b'trak',
+        full_atom(b'tkhd', b'\x00' * 72 + struct.pack('>II', 640 << 16, 360 << 16)),
+        atom(
+            b'mdia',
+            full_atom(b'hdlr', b'\x00' * 4 + b'vide' + b'\x00' * 13),
+            atom(b'minf', atom(b'stbl', stsd, table)),
+        ),
+    )
+
+
+def build_mp4(table_type=b'stco', moov_first=False):
+    """
+    ftyp + mdat + moov (o moov antes de mdat). Los offsets de chunk apuntan
+    a los dos bloques de muestras de mdat. Devuelve (archivo, muestras).
+    """
+    ftyp = atom(b'ftyp', b'isom\x00\x00\x02\x00isomiso2')
+    samples = (b'A' * 32, b'B' * 48)
+    mdat = atom(b'mdat', *samples)
+
+    def moov(mdat_offset):
+        offsets = [mdat_offset + 8, mdat_offset + 8 + len(samples[0])]
+        mvhd = full_atom(b'mvhd', struct.pack('>IIII', 0, 0, 1000, 2500) + b'\x00' * 80)
+        return atom(b'moov', mvhd, video_trak(chunk_offset_table(table_type, offsets)))
+
+    if moov_first:
+        moov_size = len(moov(0))
+        return ftyp + moov(len(ftyp) + moov_size) + mdat, samples
+    return ftyp + mdat + moov(len(ftyp)), samples
+
+
+def chunk_offsets(data):
+    moov = next(found for found in mp4.iter_atoms(data) if found[0] == b'moov')
+    moov_data = data[moov[1]:moov[1] + moov[3]]
+    offsets = []
+    for table_type, body, _end in mp4._iter_chunk_offset_tables(moov_data, 8, len(moov_data)):
+        count = struct.unpack_from('>I', moov_data, body + 4)[0]
+        fmt, width = ('>I', 4) if table_type == b'stco' else ('>Q', 8)
+        offsets += [struct.unpack_from(fmt, moov_data, body + 8 + index * width)[0] for index in range(count)]
+    return offsets
+
+
+@tagged('post_install', '-at_install')
+class TestMP4(BaseCase):
+
+    def assertFaststart(self, table_type):
+        data, samples = build_mp4(table_type)
+
+        relocated = mp4.faststart(data)
+
+        self.assertEqual(len(relocated), len(data))
+        self.assertEqual([found[0] for found in mp4.iter_atoms(relocated)], [b'ftyp', b'moov', b'mdat'])
+        for offset, sample in zip(chunk_offsets(relocated), samples):
+            self.assertEqual(relocated[offset:offset + len(sample)], sample)
+
+        # Una segunda pasada no tiene nada que mover.
+        self.assertIsNone(mp4.faststart(relocated))
+
+    def test_faststart_shifts_stco(self):
+        self.assertFaststart(b'stco')
+
+    def test_faststart_shifts_co64(self):
+        self.assertFaststart(b'co64')
+
+    def test_faststart_keeps_moov_first_file(self):
+        data, _samples = build_mp4(moov_first=True)
+        self.assertIsNone(mp4.faststart(data))
+
+    def test_probe(self):
+        data, _samples = build_mp4()
+        self.assertEqual(mp4.probe(data), {
+            'duration': 2.5,
+            'width': 640,
+            'height': 360,
+            'codec': 'avc1.64001F',
+        })
+
+    def test_probe_without_moov(self):
+        with self.assertRaises(mp4.MP4Error):
+            mp4.probe(atom(b'ftyp', b'isom') + atom(b'mdat', b'\x00' * 16))
+
+    def test_truncated_boxes_raise_mp4_error(self):
+        ftyp = atom(b'ftyp', b'isom')
+        mdat = atom(b'mdat', b'\x00' * 16)
+        short_tkhd = atom(b'trak', atom(b'tkhd', b'\x00' * 10), atom(
+            b'mdia', full_atom(b'hdlr', b'\x00' * 4 + b'vide'),
+        ))
+        short_stco = atom(b'trak', atom(b'stco', b'\x00' * 4))
+        # (archivo, funciones que deben lanzar MP4Error); las demás no deben
+        # lanzar nada.
+        cases = {
+            'empty mvhd at end of file': (ftyp + atom(b'moov', atom(b'mvhd')), {'probe'}),
+            'empty mvhd after mdat': (ftyp + mdat + atom(b'moov', atom(b'mvhd')), {'probe'}),
+            'short tkhd': (ftyp + mdat + atom(b'moov', short_tkhd), {'probe'}),
+            'short stco': (ftyp + mdat + atom(b'moov', short_stco), {'faststart'}),
+            'short tkhd and stco': (ftyp + mdat + atom(b'moov', short_tkhd, short_stco), {'faststart', 'probe'}),
+        }
+        for name, (data, raising) in cases.items():
+            for function in (mp4.faststart, mp4.probe):
+                with self.subTest(name, function=function.__name__):
+                    if function.__name__ in raising:
+                        with self.assertRaises(mp4.MP4Error):
+                            function(data)
+                    else:
+                        function(data)
+
+    def test_truncated_file_never_raises_other_errors(self):
+        data, _samples = build_mp4()
+        for length in range(len(data)):
+            with self.subTest(length=length):
+                try:
+                    mp4.faststart(data[:length])
+                    mp4.probe(data[:length])
+                except mp4.MP4Error:
+                    pass
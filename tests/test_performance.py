@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+from odoo import Command
+from odoo.tests import tagged
+
+from ..models.headless_catalog import PAYLOAD_CACHE_PARTITIONS
+from .common import HeadlessCatalogCase
+
+
+# Presupuestos por llamada. Los de consultas detectan regresiones N+1: con
+# cientos de colecciones y miles de productos, una consulta por registro
+# los supera por órdenes de magnitud. Incluyen el costo fijo del despacho
+# HTTP de Odoo (sesión, usuario público, idioma).
+QUERY_BUDGETS = {
+    'collections_data': 40,
+    'collections_data_cached': 25,
+    'collections_data_304': 25,
+    'collection_details': 40,
+    'collection_details_page': 40,
+    'collection_details_cached': 25,
+    'collection_details_pricelist': 50,
+    'collections_tree': 30,
+    'collections_changes': 40,
+    'collections_search': 40,
+    'collections_batch': 45,
+    'collections_search_cached': 25,
+    'product_details': 35,
+    'product_video_range': 25,
+    'sold_map': 3,
+    'sold_map_from_orders': 8,
+}
+
+TIME_BUDGETS = {
+    'collections_data': 3.0,
+    'collections_data_cached': 0.5,
+    'collections_data_304': 0.5,
+    'collection_details': 5.0,
+    'collection_details_page': 1.0,
+    'collection_details_cached': 0.5,
+    'collection_details_pricelist': 5.0,
+    'collections_tree': 1.0,
+    'collections_changes': 5.0,
+    'collections_search': 2.0,
+    'collections_batch': 3.0,
+    'collections_search_cached': 0.5,
+    'product_details': 0.5,
+    'product_video_range': 0.5,
+    'sold_map': 0.5,
+    'sold_map_from_orders': 1.0,
+}
+
+
+# Fuera de la corrida estándar: genera un catálogo grande y mide tiempos.
+# Se ejecuta con --test-tags headless_perf.
+@tagged('post_install', '-at_install', '-standard', 'headless_perf')
+class TestHeadlessPerformance(HeadlessCatalogCase):
+
+    def assertRouteBudget(self, label):
+        return self.assertBudget(label, QUERY_BUDGETS[label], TIME_BUDGETS[label])
+
+    def test_collections_data(self):
+        self.clear_payload_cache()
+
+        with self.assertRouteBudget('collections_data'):
+            response = self.get_json('/api/collections_data')
+
+        data = response.json()
+        self.assertIn(self.big_collection.collection_key, data)
+        self.assertLessEqual(len(data[self.big_collection.collection_key]['products_preview']), 10)
+
+        with self.assertRouteBudget('collections_data_cached'):
+            cached = self.get_json('/api/collections_data')
+        self.assertEqual(cached.content, response.content)
+
+        cached = self.assertServedFromCache('/api/collections_data', response.headers['ETag'])
+        self.assertEqual(cached.content, response.content)
+
+        with self.assertRouteBudget('collections_data_304'):
+            self.get_json(
+                '/api/collections_data',
+                headers={'If-None-Match': response.headers['ETag']},
+                expected_status=304,
+            )
+
+    def test_collection_details(self):
+        self.clear_payload_cache()
+        url = f'/api/collection/{self.big_collection.collection_key}'
+
+        with self.assertRouteBudget('collection_details'):
+            response = self.get_json(url)
+
+        products = response.json()['products']
+        expected = self.templates.filtered(lambda t: t.categ_id.parent_path.startswith(self.big_collection.parent_path))
+        self.assertEqual(len(products), len(expected))
+
+        # Vendidos según las órdenes, sin pasar por el flag almacenado.
+        sold_lines = self.env['sale.order.line'].search([
+            ('order_id.state', 'in', ('sale', 'done')),
+            ('product_id.product_tmpl_id', 'in', expected.ids),
+        ])
+        sold_ids = {product['id'] for product in products if product['is_sold']}
+        self.assertEqual(sold_ids, set(sold_lines.product_id.product_tmpl_id.ids))
+
+        with self.assertRouteBudget('collection_details_cached'):
+            self.get_json(url)
+
+        self.assertServedFromCache(url, response.headers['ETag'])
+
+        with self.assertRouteBudget('collection_details_page'):
+            page = self.get_json(f'{url}?limit=50&fields=id,name,slug,image,availability').json()
+
+        self.assertEqual(len(page['products']), 50)
+        self.assertEqual(set(page['products'][0]), {'id', 'name', 'slug', 'image', 'is_sold', 'availability_status', 'sold_source'})
+        self.assertTrue(page['pagination']['has_more'])
+
+    def test_collection_details_pricelist(self):
+        self.clear_payload_cache()
+        pricelist = self.env['product.pricelist'].create({
+            'name': 'Perf Pricelist',
+            'item_ids': [Command.create({
+                'applied_on': '3_global',
+                'compute_price': 'percentage',
+                'percent_price': 10,
+            })],
+        })
+        private = self.env['product.pricelist'].create({'name': 'Perf Private Pricelist'})
+        self.env['ir.config_parameter'].sudo().set_param('headless_collections.public_pricelist_ids', str(pricelist.id))
+        collection_url = f'/api/collection/{self.big_collection.collection_key}'
+        url = f'{collection_url}?pricelist={pricelist.id}&fields=id,price,currency'
+
+        # Solo las tarifas públicas se pueden pedir.
+        self.get_json(f'{collection_url}?pricelist={private.id}', expected_status=400)
+        self.get_json(f'{collection_url}?pricelist={private.id + 1000}', expected_status=400)
+
+        with self.assertRouteBudget('collection_details_pricelist'):
+            data = self.get_json(url).json()
+
+        self.assertEqual(data['pricelist']['id'], pricelist.id)
+        list_prices = dict(zip(self.templates.ids, self.templates.mapped('list_price')))
+        for product in data['products']:
+            self.assertAlmostEqual(product['price'], list_prices[product['id']] * 0.9)
+
+        # Cambiar una regla invalida los precios memorizados y el ETag.
+        pricelist.item_ids.percent_price = 20
+        data = self.get_json(url).json()
+        for product in data['products']:
+            self.assertAlmostEqual(product['price'], list_prices[product['id']] * 0.8)
+
+        # Un cambio de costo también invalida: la regla pasa a basarse en él.
+        pricelist.item_ids.write({'base': 'standard_price'})
+        product = self.templates.filtered(lambda t: t.categ_id.parent_path.startswith(self.big_collection.parent_path))[0]
+        product.product_variant_id.standard_price = 40
+        data = self.get_json(url).json()
+        prices = {item['id']: item['price'] for item in data['products']}
+        self.assertAlmostEqual(prices[product.id], 40 * 0.8)
+
+    def test_collections_tree(self):
+        self.clear_payload_cache()
+
+        with self.assertRouteBudget('collections_tree'):
+            tree = self.get_json('/api/collections/tree').json()['collections']
+
+        roots = {node['key']: node for node in tree}
+        big = roots[self.big_collection.collection_key]
+        self.assertEqual(len(big['children']), 5)
+        self.assertEqual(big['product_count'], sum(child['product_count'] for child in big['children']))
+
+    def test_collections_changes(self):
+        with self.assertRouteBudget('collections_changes'):
+            changes = self.get_json('/api/collections/changes').json()
+
+        self.assertTrue(changes['watermark'])
+        product_ids = {product['id'] for product in changes['products']}
+
+        while changes['pagination']['has_more']:
+            self.assertLessEqual(len(changes['products']), changes['pagination']['limit'])
+            cursor = changes['pagination']['next_cursor']
+            page = self.get_json(f'/api/collections/changes?after={cursor}').json()
+            self.assertEqual(page['watermark'], changes['watermark'])
+            self.assertFalse(page['collections'])
+            product_ids.update(product['id'] for product in page['products'])
+            changes = page
+
+        self.assertLessEqual(set(self.templates.ids), product_ids)
+
+    def test_collections_search(self):
+        self.clear_payload_cache()
+        url = f'/api/collections/search?q=Perf%20Product&collection={self.big_collection.collection_key}&material=Bronce'
+
+        with self.assertRouteBudget('collections_search'):
+            response = self.get_json(url)
+
+        data = response.json()
+        expected = self.templates.filtered(
+            lambda t: t.categ_id.parent_path.startswith(self.big_collection.parent_path)
+            and t.headless_material == 'Bronce'
+        )
+        self.assertEqual(data['pagination']['total'], len(expected))
+        self.assertLessEqual({product['id'] for product in data['products']}, set(expected.ids))
+
+        with self.assertRouteBudget('collections_search_cached'):
+            cached = self.get_json(url)
+        self.assertEqual(cached.content, response.content)
+
+        # Las búsquedas usan su propia caché: llenarla con textos distintos
+        # no desaloja los payloads de colecciones.
+        Catalog = self.env['headless.catalog']
+        collections = self.get_json('/api/collections_data')
+        general_cache = Catalog._get_payload_cache()
+        keys_before = list(general_cache._entries)
+        for index in range(100):
+            self.get_json(f'/api/collections/search?q=noise-{index}')
+        self.assertEqual(list(general_cache._entries), keys_before)
+        self.assertLessEqual(len(Catalog._get_payload_cache('search')._entries), PAYLOAD_CACHE_PARTITIONS['search'][0])
+        self.assertServedFromCache('/api/collections_data', collections.headers['ETag'])
+
+    def test_collections_batch(self):
+        self.clear_payload_cache()
+        unpublished = self.env['product.category'].create({
+            'name': 'Perf Unpublished',
+            'is_collection': False,
+            'collection_key': 'perf-unpublished',
+        })
+        requested = [
+            self.section_collections[1].collection_key,
+            'perf-does-not-exist',
+            self.root_collections[2].collection_key,
+            unpublished.collection_key,
+        ]
+        url = f'/api/collections/batch?keys={",".join(requested)}&limit=20'
+
+        with self.assertRouteBudget('collections_batch'):
+            response = self.get_json(url)
+
+        data = response.json()
+        self.assertEqual(list(data['collections']), [requested[0], requested[2]])
+        self.assertEqual(data['missing'], [requested[1], requested[3]])
+        for payload in data['collections'].values():
+            self.assertLessEqual(len(payload['products']), 20)
+
+        self.assertServedFromCache(url, response.headers['ETag'])
+
+    def test_product_details(self):
+        product = self.templates[1]
+
+        with self.assertRouteBudget('product_details'):
+            data = self.get_json(f'/api/product/{product.headless_slug}').json()
+
+        self.assertEqual(data['product']['id'], product.id)
+        self.assertEqual(data['collections'], [
+            self.root_collections[0].collection_key,
+            self.section_collections[0].collection_key,
+            product.categ_id.collection_key,
+        ])
+
+    def test_product_video_range(self):
+        with self.assertRouteBudget('product_video_range'):
+            response = self.url_open(
+                f'/api/collections/product-video/{self.video_template.id}/clip.mp4',
+                headers={'Range': 'bytes=0-99'},
+            )
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(len(response.content), 100)
+
+    def test_sold_map(self):
+        """
+        CollectionsApiController._get_sold_map_by_template delega en
+        headless.catalog._get_sold_map, que es lo que se mide aquí; el
+        agregado sobre órdenes solo se usa para mantener el flag almacenado.
+        """
+        Catalog = self.env['headless.catalog']
+        self.env.invalidate_all()
+
+        with self.assertRouteBudget('sold_map'):
+            sold_map = Catalog._get_sold_map(self.templates.ids)
+
+        with self.assertRouteBudget('sold_map_from_orders'):
+            sold_map_from_orders = Catalog._compute_sold_map_from_orders(self.templates.ids)
+
+        self.assertEqual(sold_map, sold_map_from_orders)
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestFindProduct(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Catalog = cls.env['headless.catalog']
+        cls.collection = cls.env['product.category'].create({
+            'name': 'Lookup Collection',
+            'is_collection': True,
+            'collection_key': 'lookup-collection',
+        })
+        cls.product = cls.env['product.template'].create({
+            'name': 'Lookup Product',
+            'headless_slug': 'lookup-product',
+            'categ_id': cls.collection.id,
+            'sale_ok': True,
+        })
+
+    def test_slug_and_numeric_id(self):
+        self.assertEqual(self.Catalog._find_product('lookup-product'), self.product)
+        self.assertEqual(self.Catalog._find_product(str(self.product.id)), self.product)
+
+    def test_unicode_digits_are_not_ids(self):
+        for slug in ('²', '١٢', '𝟙'):
+            with self.subTest(slug=slug):
+                self.assertFalse(self.Catalog._find_product(slug))
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import hmac
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from odoo.tests import TransactionCase, tagged
+
+
+class WebhookStandIn(BaseHTTPRequestHandler):
+    """Frontend de prueba: guarda cada POST y responde con ``status``."""
+
+    requests = []
+    status = 200
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.requests.append((dict(self.headers), body))
+        self.send_response(self.status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@tagged('post_install', '-at_install')
+class TestRevalidationOutbox(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        WebhookStandIn.requests = []
+        cls.server = HTTPServer(('127.0.0.1', 0), WebhookStandIn)
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+
+        ICP = cls.env['ir.config_parameter'].sudo()
+        ICP.set_param('headless_collections.revalidation_url', f'http://127.0.0.1:{cls.server.server_port}/revalidate')
+        ICP.set_param('headless_collections.revalidation_secret', 'test-secret')
+        ICP.set_param('headless_collections.revalidation_window', '30')
+
+        cls.collection = cls.env['product.category'].create({
+            'name': 'Outbox Collection',
+            'is_collection': True,
+            'collection_key': 'outbox-collection',
+        })
+        cls.product = cls.env['product.template'].create({
+            'name': 'Outbox Product',
+            'headless_slug': 'outbox-product',
+            'categ_id': cls.collection.id,
+            'sale_ok': True,
+        })
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        WebhookStandIn.requests = []
+        WebhookStandIn.status = 200
+        self.Outbox = self.env['headless.catalog.outbox']
+        self._commit_outbox()
+        self.Outbox.search([]).unlink()
+
+    def _commit_outbox(self):
+        """Ejecuta los precommit como lo haría el commit de la transacción."""
+        self.env.cr.precommit.run()
+        self.env.flush_all()
+
+    def _age_entries(self, seconds):
+        self.env.cr.execute(
+            "UPDATE headless_catalog_outbox SET create_date = create_date - %s * INTERVAL '1 second'",
+            [seconds],
+        )
+        self.env.invalidate_all()
+
+    def test_writes_coalesce_into_one_entry_per_transaction(self):
+        self.product.write({'list_price': 10.0})
+        self.product.write({'headless_slug': 'outbox-product-renamed'})
+        self.collection.write({'collection_description': 'Nueva descripción'})
+        self._commit_outbox()
+
+        entry = self.Outbox.search([])
+        self.assertEqual(len(entry), 1)
+        self.assertIn('outbox-collection', entry.collection_keys)
+        self.assertEqual(
+            set(entry.product_slugs),
+            {'outbox-product', 'outbox-product-renamed'},
+        )
+
+    def test_batch_is_sent_once_after_window(self):
+        self.product.write({'list_price': 20.0})
+        self._commit_outbox()
+
+        # Dentro de la ventana no se envía nada.
+        self.Outbox._cron_send_revalidation()
+        self.assertFalse(WebhookStandIn.requests)
+
+        self.product.write({'list_price': 30.0})
+        self._commit_outbox()
+        self._age_entries(60)
+
+        self.Outbox._cron_send_revalidation()
+
+        self.assertEqual(len(WebhookStandIn.requests), 1)
+        headers, body = WebhookStandIn.requests[0]
+        payload = json.loads(body)
+        self.assertEqual(payload['products'], ['outbox-product'])
+        self.assertIn('outbox-collection', payload['collections'])
+        self.assertFalse(payload['all'])
+
+        signature = hmac.new(b'test-secret', body, hashlib.sha256).hexdigest()
+        self.assertEqual(headers['X-Headless-Signature'], f'sha256={signature}')
+        self.assertFalse(self.Outbox.search([]))
+
+    def test_failed_batch_is_retried_with_backoff(self):
+        WebhookStandIn.status = 503
+        self.product.write({'list_price': 40.0})
+        self._commit_outbox()
+        self._age_entries(60)
+
+        self.Outbox._cron_send_revalidation()
+
+        entry = self.Outbox.search([])
+        self.assertEqual(entry.state, 'pending')
+        self.assertEqual(entry.attempts, 1)
+        self.assertGreaterEqual(entry.next_attempt_at, self.env.cr.now() + timedelta(seconds=59))
+
+        # El reintento no sale antes de tiempo.
+        self.Outbox._cron_send_revalidation()
+        self.assertEqual(len(WebhookStandIn.requests), 1)
+
+        WebhookStandIn.status = 200
+        entry.next_attempt_at = self.env.cr.now() - timedelta(seconds=1)
+        self.Outbox._cron_send_revalidation()
+
+        self.assertEqual(len(WebhookStandIn.requests), 2)
+        self.assertFalse(self.Outbox.search([]))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+from markupsafe import Markup
+
+from odoo.tests import BaseCase, tagged
+
+from ..models import headless_catalog
+from ..models.headless_catalog import dump_payload
+
+
+@tagged('post_install', '-at_install')
+class TestDumpPayload(BaseCase):
+
+    PAYLOAD = {
+        'updated_at': datetime(2026, 10, 18, 8, 48, 2, 123456),
+        'deleted_at': datetime(2026, 10, 18, 8, 48, 2),
+        'day': date(2026, 10, 18),
+        'name': 'Sofá «Milano» 日本',
+        'description': Markup('<p>Pieza única</p>'),
+        'price': 1234.5,
+        'quantity': 3,
+        'amount': Decimal('1.50'),
+        'is_sold': False,
+        'poster': None,
+        'collections': ('sofas', 'sofas-cuero'),
+        'counts': {1: 'a', 2: {'nested': [1.0, 0.1, -7]}},
+    }
+
+    # Floats que cada librería escribe distinto (1e-6 / 1e-06, 1e16 / 1e+16)
+    # o que JSON no admite.
+    EXPONENT_PAYLOAD = {
+        'volume': 0.000001,
+        'tiny': 0.00001,
+        'big': 1e16,
+        'huge': -1.2345e300,
+        'nan': float('nan'),
+        'dimensions': [float('inf'), float('-inf'), 2.5e-7],
+        'nested': {'weight': (1e-5, float('nan'))},
+    }
+
+    def dump_both(self, payload):
+        if not headless_catalog.orjson:
+            self.skipTest("orjson is not installed")
+
+        with_orjson = dump_payload(payload)
+        with patch.object(headless_catalog, 'orjson', None):
+            with_stdlib = dump_payload(payload)
+        return with_orjson, with_stdlib
+
+    def test_orjson_and_stdlib_produce_the_same_bytes(self):
+        with_orjson, with_stdlib = self.dump_both(self.PAYLOAD)
+        self.assertEqual(with_orjson, with_stdlib)
+
+    def test_orjson_and_stdlib_produce_the_same_json(self):
+        payload = {**self.PAYLOAD, **self.EXPONENT_PAYLOAD}
+        with_orjson, with_stdlib = self.dump_both(payload)
+
+        def strict_loads(body):
+            return json.loads(body, parse_constant=lambda constant: self.fail(f"invalid JSON constant {constant}"))
+
+        self.assertEqual(strict_loads(with_orjson), strict_loads(with_stdlib))
+        self.assertIsNone(strict_loads(with_stdlib)['nan'])
+        self.assertEqual(strict_loads(with_stdlib)['dimensions'], [None, None, 2.5e-7])
+
+    def test_datetime_format(self):
+        body = dump_payload({'updated_at': datetime(2026, 10, 18, 8, 48, 2, 123456)})
+        self.assertEqual(body, b'{"updated_at":"2026-10-18 08:48:02.123456"}')
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestStockAvailability(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Catalog = cls.env['headless.catalog']
+        cls.ICP = cls.env['ir.config_parameter'].sudo()
+
+        Warehouse = cls.env['stock.warehouse']
+        cls.warehouse = Warehouse.create({'name': 'Headless Stock In', 'code': 'HLIN'})
+        cls.other_warehouse = Warehouse.create({'name': 'Headless Stock Out', 'code': 'HLOT'})
+        cls.stock = cls.warehouse.lot_stock_id
+        cls.shelf = cls.env['stock.location'].create({
+            'name': 'Shelf',
+            'location_id': cls.stock.id,
+            'usage': 'internal',
+        })
+        cls.other_stock = cls.other_warehouse.lot_stock_id
+        cls.customers = cls.env.ref('stock.stock_location_customers')
+        cls.suppliers = cls.env.ref('stock.stock_location_suppliers')
+
+        ProductTemplate = cls.env['product.template']
+        cls.plenty = ProductTemplate.create({'name': 'Plenty', 'is_storable': True})
+        cls.low = ProductTemplate.create({'name': 'Low', 'is_storable': True})
+        cls.elsewhere = ProductTemplate.create({'name': 'Elsewhere', 'is_storable': True})
+        cls.service = ProductTemplate.create({'name': 'Service', 'type': 'service'})
+
+        Quant = cls.env['stock.quant']
+        Quant._update_available_quantity(cls.plenty.product_variant_id, cls.stock, 6)
+        Quant._update_available_quantity(cls.plenty.product_variant_id, cls.shelf, 4)
+        Quant._update_available_quantity(cls.low.product_variant_id, cls.stock, 2)
+        Quant._update_available_quantity(cls.elsewhere.product_variant_id, cls.other_stock, 10)
+
+        # Movimientos pendientes: salida del almacén configurado, entrada al
+        # almacén configurado y uno ajeno que no debe contar.
+        cls.env['stock.move'].create([
+            {
+                'product_id': cls.plenty.product_variant_id.id,
+                'product_uom_qty': 9,
+                'location_id': cls.stock.id,
+                'location_dest_id': cls.customers.id,
+            },
+            {
+                'product_id': cls.elsewhere.product_variant_id.id,
+                'product_uom_qty': 5,
+                'location_id': cls.suppliers.id,
+                'location_dest_id': cls.stock.id,
+            },
+            {
+                'product_id': cls.low.product_variant_id.id,
+                'product_uom_qty': 2,
+                'location_id': cls.other_stock.id,
+                'location_dest_id': cls.customers.id,
+            },
+        ])._action_confirm()
+
+        cls.ICP.set_param('headless_collections.stock_availability', 'True')
+        cls.ICP.set_param('headless_collections.stock_warehouse_ids', str(cls.warehouse.id))
+        cls.ICP.set_param('headless_collections.low_stock_threshold', '3')
+        cls.ICP.set_param('headless_collections.stock_include_moves', 'False')
+
+    def get_statuses(self):
+        templates = self.plenty | self.low | self.elsewhere | self.service
+        stock_map = self.Catalog._get_stock_map(templates.ids)
+        return stock_map, {
+            template: self.Catalog._get_stock_status(False, stock_map[template.id])
+            for template in templates
+        }
+
+    def test_on_hand(self):
+        stock_map, statuses = self.get_statuses()
+
+        self.assertEqual(stock_map[self.plenty.id]['on_hand'], 10)
+        self.assertIsNone(stock_map[self.plenty.id]['forecast'])
+        self.assertEqual(statuses[self.plenty], 'in_stock')
+        self.assertEqual(statuses[self.low], 'low_stock')
+        # Todo su stock está en otro almacén.
+        self.assertEqual(stock_map[self.elsewhere.id]['on_hand'], 0)
+        self.assertEqual(statuses[self.elsewhere], 'sold')
+        self.assertIsNone(stock_map[self.service.id]['on_hand'])
+        self.assertEqual(statuses[self.service], 'in_stock')
+
+        self.assertEqual(self.Catalog._get_stock_status(True, stock_map[self.plenty.id]), 'sold')
+
+    def test_forecast_with_pending_moves(self):
+        self.ICP.set_param('headless_collections.stock_include_moves', 'True')
+        stock_map, statuses = self.get_statuses()
+
+        self.assertEqual(stock_map[self.plenty.id]['on_hand'], 10)
+        self.assertEqual(stock_map[self.plenty.id]['forecast'], 1)
+        self.assertEqual(statuses[self.plenty], 'low_stock')
+        # La salida desde el otro almacén no cuenta.
+        self.assertEqual(stock_map[self.low.id]['forecast'], 2)
+        self.assertEqual(statuses[self.low], 'low_stock')
+        self.assertEqual(stock_map[self.elsewhere.id]['forecast'], 5)
+        self.assertEqual(statuses[self.elsewhere], 'in_stock')
+
+    def test_unknown_warehouse_falls_back_to_all_internal_locations(self):
+        self.ICP.set_param('headless_collections.stock_warehouse_ids', '999999999')
+        stock_map, statuses = self.get_statuses()
+
+        self.assertEqual(stock_map[self.elsewhere.id]['on_hand'], 10)
+        self.assertEqual(statuses[self.elsewhere], 'in_stock')
+
+    def test_new_location_is_counted_without_invalidation(self):
+        self.Catalog._get_stock_map(self.low.ids)
+        bin_location = self.env['stock.location'].create({
+            'name': 'Bin',
+            'location_id': self.shelf.id,
+            'usage': 'internal',
+        })
+        self.env['stock.quant']._update_available_quantity(self.low.product_variant_id, bin_location, 5)
+
+        stock_map, statuses = self.get_statuses()
+        self.assertEqual(stock_map[self.low.id]['on_hand'], 7)
+        self.assertEqual(statuses[self.low], 'in_stock')
+
+    def test_quant_change_moves_stock_version(self):
+        version = self.Catalog._get_stock_version()
+
+        self.env['stock.quant']._update_available_quantity(self.elsewhere.product_variant_id, self.other_stock, 1)
+        self.assertEqual(self.Catalog._get_stock_version(), version)
+
+        self.env['stock.quant']._update_available_quantity(self.low.product_variant_id, self.stock, 1)
+        self.assertNotEqual(self.Catalog._get_stock_version(), version)
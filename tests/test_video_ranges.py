@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+import base64
+
+from odoo.tests import BaseCase, HttpCase, tagged
+
+from ..controllers.main import CollectionsApiController
+
+
+# ftyp seguido de bytes con patrón conocido: no es un MP4 completo, así que
+# se guarda tal cual y cada rango se puede comprobar contra VIDEO_DATA.
+VIDEO_DATA = b'\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isomiso2' + bytes(range(256)) * 8
+
+
+@tagged('post_install', '-at_install')
+class TestParseByteRanges(BaseCase):
+
+    def parse(self, header, total_size=1000):
+        return CollectionsApiController()._parse_byte_ranges(header, total_size)
+
+    def test_single_ranges(self):
+        self.assertEqual(self.parse('bytes=0-99'), [(0, 99)])
+        self.assertEqual(self.parse('bytes=-500'), [(500, 999)])
+        self.assertEqual(self.parse('bytes=500-'), [(500, 999)])
+        self.assertEqual(self.parse('bytes=-5000'), [(0, 999)])
+        self.assertEqual(self.parse('bytes=900-5000'), [(900, 999)])
+
+    def test_multiple_ranges_are_sorted_and_merged(self):
+        self.assertEqual(self.parse('bytes=500-599, 0-9'), [(0, 9), (500, 599)])
+        self.assertEqual(self.parse('bytes=0-9,5-14'), [(0, 14)])
+        self.assertEqual(self.parse('bytes=0-9,10-19'), [(0, 19)])
+        self.assertEqual(self.parse('bytes=0-9,2000-2100'), [(0, 9)])
+
+    def test_unsatisfiable_or_malformed(self):
+        for header in ('bytes=1000-', 'bytes=2000-3000', 'bytes=-0', 'bytes=5-1', 'bytes=abc', 'bytes=-', 'bytes='):
+            with self.subTest(header=header):
+                self.assertEqual(self.parse(header), [])
+
+    def test_other_units_are_ignored(self):
+        self.assertIsNone(self.parse('items=0-9'))
+
+
+@tagged('post_install', '-at_install')
+class TestVideoRangeRequests(HttpCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.product = cls.env['product.template'].create({
+            'name': 'Range Video Product',
+            'headless_video_file': base64.b64encode(VIDEO_DATA),
+            'headless_video_filename': 'clip.mp4',
+        })
+        cls.url = f'/api/collections/product-video/{cls.product.id}/clip.mp4'
+        cls.size = len(VIDEO_DATA)
+
+    def get_range(self, range_header, **headers):
+        return self.url_open(self.url, headers={'Range': range_header, **headers})
+
+    def test_suffix_range(self):
+        response = self.get_range('bytes=-500')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], f'bytes {self.size - 500}-{self.size - 1}/{self.size}')
+        self.assertEqual(response.content, VIDEO_DATA[-500:])
+
+    def test_open_range(self):
+        response = self.get_range('bytes=500-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], f'bytes 500-{self.size - 1}/{self.size}')
+        self.assertEqual(response.content, VIDEO_DATA[500:])
+
+    def test_range_past_eof_is_clipped(self):
+        response = self.get_range(f'bytes=100-{self.size * 10}')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Length'], str(self.size - 100))
+        self.assertEqual(response.content, VIDEO_DATA[100:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get_range(f'bytes={self.size}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['Content-Range'], f'bytes */{self.size}')
+
+    def test_multiple_ranges(self):
+        response = self.get_range('bytes=0-9,100-149')
+        self.assertEqual(response.status_code, 206)
+
+        content_type = response.headers['Content-Type']
+        self.assertTrue(content_type.startswith('multipart/byteranges; boundary='))
+        boundary = content_type.split('boundary=')[1]
+        self.assertEqual(response.headers['Content-Length'], str(len(response.content)))
+
+        expected = b''.join(
+            (
+                f'--{boundary}\r\n'
+                f'Content-Type: video/mp4\r\n'
+                f'Content-Range: bytes {start}-{end}/{self.size}\r\n\r\n'
+            ).encode() + VIDEO_DATA[start:end + 1] + b'\r\n'
+            for start, end in ((0, 9), (100, 149))
+        ) + f'--{boundary}--\r\n'.encode()
+        self.assertEqual(response.content, expected)
+
+    def test_overlapping_ranges_are_merged(self):
+        response = self.get_range('bytes=0-9,5-14')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], f'bytes 0-14/{self.size}')
+        self.assertEqual(response.content, VIDEO_DATA[:15])
+
+    def test_if_range(self):
+        etag = self.url_open(self.url).headers['ETag']
+
+        response = self.get_range('bytes=0-9', **{'If-Range': etag})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, VIDEO_DATA[:10])
+
+        # Validador distinto: el archivo cambió, se envía completo.
+        response = self.get_range('bytes=0-9', **{'If-Range': '"stale-checksum"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, VIDEO_DATA)
@@ -0,0 +1,2 @@
+from . import mp4
+from . import timing
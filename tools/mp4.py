@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Lectura mínima de átomos MP4/MOV (ISO BMFF) en Python puro.
+
+- ``faststart(data)``: mueve el átomo ``moov`` delante de ``mdat`` y
+  corrige los offsets de ``stco``/``co64`` para que el navegador pueda
+  empezar a reproducir sin pedir el final del archivo.
+- ``probe(data)``: duración, dimensiones y códec de la primera pista de
+  video.
+"""
+
+import struct
+
+
+# Átomos contenedores que hay que recorrer para llegar a stco/co64/stsd.
+CONTAINER_ATOMS = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'edts'}
+
+# Entradas de muestra AVC: cabecera fija de VisualSampleEntry antes de avcC.
+VISUAL_SAMPLE_ENTRY_SIZE = 78
+
+UINT32_MAX = 0xFFFFFFFF
+
+
+class MP4Error(ValueError):
+    """Archivo que no se puede interpretar como MP4/MOV."""
+
+
+def _unpack(fmt, data, offset, end):
+    """
+    struct.unpack_from limitado a ``[offset, end)``: un átomo truncado
+    lanza MP4Error en lugar de leer del átomo vecino o fallar con
+    struct.error / IndexError.
+    """
+    if offset < 0 or offset + struct.calcsize(fmt) > min(end, len(data)):
+        raise MP4Error(f"Lectura fuera de rango en el offset {offset}")
+    return struct.unpack_from(fmt, data, offset)
+
+
+def iter_atoms(data, start=0, end=None):
+    """
+    Genera ``(tipo, offset, cabecera, tamaño)`` de los átomos entre
+    ``start`` y ``end``. ``tamaño`` incluye la cabecera.
+    """
+    end = len(data) if end is None else min(end, len(data))
+    offset = start
+    while offset + 8 <= end:
+        size, atom_type = _unpack('>I4s', data, offset, end)
+        header = 8
+        if size == 1:
+            size = _unpack('>Q', data, offset + 8, end)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise MP4Error(f"Átomo {atom_type!r} con tamaño inválido")
+        yield atom_type, offset, header, size
+        offset += size
+
+
+def _find_child(data, atom_type, start, end):
+    for child_type, offset, header, size in iter_atoms(data, start, end):
+        if child_type == atom_type:
+            return offset + header, offset + size
+    return None
+
+
+def _iter_chunk_offset_tables(data, start, end):
+    for atom_type, offset, header, size in iter_atoms(data, start, end):
+        if atom_type in CONTAINER_ATOMS:
+            yield from _iter_chunk_offset_tables(data, offset + header, offset + size)
+        elif atom_type in (b'stco', b'co64'):
+            yield atom_type, offset + header, offset + size
+
+
+def _shift_chunk_offsets(moov, shift, first, last):
+    """
+    Suma ``shift`` a los offsets de chunk de ``moov`` que caen en
+    [first, last). Devuelve una copia modificada.
+    """
+    moov = bytearray(moov)
+    for atom_type, body, end in _iter_chunk_offset_tables(moov, 0, len(moov)):
+        count = _unpack('>I', moov, body + 4, end)[0]
+        position = body + 8
+        fmt, width = ('>I', 4) if atom_type == b'stco' else ('>Q', 8)
+        if position + count * width > end:
+            raise MP4Error(f"Tabla {atom_type!r} truncada")
+        for _index in range(count):
+            value = struct.unpack_from(fmt, moov, position)[0]
+            if first <= value < last:
+                value += shift
+                if atom_type == b'stco' and value > UINT32_MAX:
+                    # Habría que convertir stco en co64 y cambiaría el
+                    # tamaño de moov; no compensa para videos web.
+                    raise MP4Error("Offset fuera de rango para stco")
+                struct.pack_into(fmt, moov, position, value)
+            position += width
+    return bytes(moov)
+
+
+def faststart(data):
+    """
+    Devuelve el archivo con ``moov`` antes de ``mdat``, o ``None`` si ya
+    estaba así (o no hay nada que mover).
+    """
+    atoms = list(iter_atoms(data))
+    moov = next((atom for atom in atoms if atom[0] == b'moov'), None)
+    mdat = next((atom for atom in atoms if atom[0] == b'mdat'), None)
+    if not moov or not mdat or moov[1] < mdat[1]:
+        return None
+
+    moov_offset, moov_size = moov[1], moov[3]
+    moov_data = data[moov_offset:moov_offset + moov_size]
+    if _find_child(moov_data, b'cmov', 8, moov_size):
+        raise MP4Error("moov comprimido no soportado")
+
+    insert_at = mdat[1]
+    moov_data = _shift_chunk_offsets(moov_data, moov_size, insert_at, moov_offset)
+
+    return b''.join((
+        data[:insert_at],
+        moov_data,
+        data[insert_at:moov_offset],
+        data[moov_offset + moov_size:],
+    ))
+
+
+def _read_track_dimensions(data, tkhd_start, tkhd_end):
+    version = _unpack('>B', data, tkhd_start, tkhd_end)[0]
+    offset = tkhd_start + (88 if version == 1 else 76)
+    width, height = _unpack('>II', data, offset, tkhd_end)
+    return width >> 16, height >> 16
+
+
+def _read_codec(data, stsd_start, stsd_end):
+    entry_start = stsd_start + 8
+    if entry_start + 8 > stsd_end:
+        return ''
+    entry_size, fourcc = _unpack('>I4s', data, entry_start, stsd_end)
+    entry_end = entry_start + entry_size
+    if entry_size < 8 or entry_end > stsd_end:
+        raise MP4Error("Entrada de stsd con tamaño inválido")
+    codec = fourcc.decode('latin-1').strip()
+
+    if fourcc in (b'avc1', b'avc3'):
+        children = entry_start + 8 + VISUAL_SAMPLE_ENTRY_SIZE
+        avcc = _find_child(data, b'avcC', children, entry_end)
+        if avcc and avcc[0] + 4 <= avcc[1]:
+            profile, compat, level = data[avcc[0] + 1:avcc[0] + 4]
+            codec = f'{codec}.{profile:02X}{compat:02X}{level:02X}'
+
+    return codec
+
+
+def probe(data):
+    """
+    Metadatos del video:
+        {'duration': float (s), 'width': int, 'height': int, 'codec': str}
+
+    Lanza MP4Error si no hay átomo ``moov``.
+    """
+    moov = next((atom for atom in iter_atoms(data) if atom[0] == b'moov'), None)
+    if not moov:
+        raise MP4Error("Sin átomo moov")
+    moov_start, moov_end = moov[1] + moov[2], moov[1] + moov[3]
+
+    result = {'duration': 0.0, 'width': 0, 'height': 0, 'codec': ''}
+
+    mvhd = _find_child(data, b'mvhd', moov_start, moov_end)
+    if mvhd:
+        if _unpack('>B', data, mvhd[0], mvhd[1])[0] == 1:
+            timescale, duration = _unpack('>IQ', data, mvhd[0] + 20, mvhd[1])
+        else:
+            timescale, duration = _unpack('>II', data, mvhd[0] + 12, mvhd[1])
+        if timescale:
+            result['duration'] = round(duration / timescale, 3)
+
+    for atom_type, offset, header, size in iter_atoms(data, moov_start, moov_end):
+        if atom_type != b'trak':
+            continue
+        trak_start, trak_end = offset + header, offset + size
+        mdia = _find_child(data, b'mdia', trak_start, trak_end)
+        hdlr = mdia and _find_child(data, b'hdlr', *mdia)
+        if not hdlr or hdlr[0] + 12 > hdlr[1] or data[hdlr[0] + 8:hdlr[0] + 12] != b'vide':
+            continue
+
+        tkhd = _find_child(data, b'tkhd', trak_start, trak_end)
+        if tkhd:
+            result['width'], result['height'] = _read_track_dimensions(data, *tkhd)
+
+        minf = _find_child(data, b'minf', *mdia)
+        stbl = minf and _find_child(data, b'stbl', *minf)
+        stsd = stbl and _find_child(data, b'stsd', *stbl)
+        if stsd:
+            result['codec'] = _read_codec(data, *stsd)
+        break
+
+    return result
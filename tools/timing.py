@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentación de la API headless.
+
+Cada petición instrumentada abre un RequestTimer (ver request_timer); el
+código de controladores y modelos marca sus fases con ``phase(nombre)``,
+que no hace nada si no hay un timer activo (crons, shell, pruebas).
+
+Las métricas agregadas viven en memoria del proceso: con workers prefork
+cada proceso reporta las suyas, distinguidas por la etiqueta ``worker``.
+"""
+
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Límites (segundos) del histograma de latencia por ruta.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_timer = contextvars.ContextVar('headless_request_timer', default=None)
+
+
+class RequestTimer:
+    """Tiempos y número de consultas SQL por fase de una petición."""
+
+    def __init__(self, cr):
+        self.cr = cr
+        self.phases = {}
+        self.started = time.perf_counter()
+        self.queries_start = cr.sql_log_count
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        queries_start = self.cr.sql_log_count
+        try:
+            yield
+        finally:
+            duration, queries = self.phases.get(name, (0.0, 0))
+            self.phases[name] = (
+                duration + time.perf_counter() - started,
+                queries + self.cr.sql_log_count - queries_start,
+            )
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def query_count(self):
+        return self.cr.sql_log_count - self.queries_start
+
+    def server_timing(self):
+        """Valor de la cabecera Server-Timing (duraciones en milisegundos)."""
+        entries = [
+            f'{name};dur={duration * 1000:.1f};desc="{queries} sql"'
+            for name, (duration, queries) in self.phases.items()
+        ]
+        entries.append(f'total;dur={self.elapsed * 1000:.1f};desc="{self.query_count} sql"')
+        return ', '.join(entries)
+
+
+@contextmanager
+def request_timer(cr):
+    timer = RequestTimer(cr)
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _current_timer.reset(token)
+
+
+@contextmanager
+def phase(name):
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+
+    with timer.phase(name):
+        yield
+
+
+def timed(name):
+    """Decorador: registra la función completa como la fase ``name``."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class MetricsRegistry:
+    """Histogramas de latencia y contadores por ruta, en memoria del proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, timer, bytes_out):
+        elapsed = timer.elapsed
+
+        with self._lock:
+            route_metrics = self._routes.setdefault(route, {
+                'buckets': [0] * len(LATENCY_BUCKETS),
+                'count': 0,
+                'seconds': 0.0,
+                'queries': 0,
+                'bytes': 0,
+                'phases': {},
+            })
+
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    route_metrics['buckets'][index] += 1
+
+            route_metrics['count'] += 1
+            route_metrics['seconds'] += elapsed
+            route_metrics['queries'] += timer.query_count
+            route_metrics['bytes'] += bytes_out
+
+            for name, (duration, _queries) in timer.phases.items():
+                route_metrics['phases'][name] = route_metrics['phases'].get(name, 0.0) + duration
+
+    def render(self):
+        """Exposición en formato de texto de Prometheus."""
+        worker = os.getpid()
+
+        with self._lock:
+            routes = {
+                route: {**metrics, 'buckets': list(metrics['buckets']), 'phases': dict(metrics['phases'])}
+                for route, metrics in self._routes.items()
+            }
+
+        lines = [
+            '# HELP headless_api_request_duration_seconds Latencia de las rutas de la API headless.',
+            '# TYPE headless_api_request_duration_seconds histogram',
+        ]
+        for route, metrics in routes.items():
+            labels = f'route="{route}",worker="{worker}"'
+            for bound, count in zip(LATENCY_BUCKETS, metrics['buckets']):
+                lines.append(f'headless_api_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'headless_api_request_duration_seconds_bucket{{{labels},le="+Inf"}} {metrics["count"]}')
+            lines.append(f'headless_api_request_duration_seconds_sum{{{labels}}} {metrics["seconds"]:.6f}')
+            lines.append(f'headless_api_request_duration_seconds_count{{{labels}}} {metrics["count"]}')
+
+        counters = (
+            ('headless_api_sql_queries_total', 'Consultas SQL ejecutadas por ruta.', 'queries'),
+            ('headless_api_response_bytes_total', 'Bytes de respuesta enviados por ruta.', 'bytes'),
+        )
+        for metric, help_text, key in counters:
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} counter')
+            for route, metrics in routes.items():
+                lines.append(f'{metric}{{route="{route}",worker="{worker}"}} {metrics[key]}')
+
+        lines.append('# HELP headless_api_phase_duration_seconds_total Tiempo acumulado por fase de cada ruta.')
+        lines.append('# TYPE headless_api_phase_duration_seconds_total counter')
+        for route, metrics in routes.items():
+            for name, seconds in metrics['phases'].items():
+                lines.append(
+                    f'headless_api_phase_duration_seconds_total{{route="{route}",phase="{name}",worker="{worker}"}} {seconds:.6f}'
+                )
+
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = MetricsRegistry()
+